@@ -0,0 +1,111 @@
+"""Cost of building subject study artifacts from scratch vs incrementally, and of serving them.
+
+    python -m benchmarks.artifacts --notes 40 --llm-latency 0.3
+    python -m benchmarks.artifacts --notes 200 --edits 5 --chunk-tokens 300
+
+Seeds one subject with --notes notes on a fake LLM that waits --llm-latency seconds per call, then
+measures:
+
+- build: the first POST /subjects/{id}/artifacts/build, every step reaches the LLM
+- rebuild_unchanged: the same build again, every step is served from ArtifactParts
+- rebuild_after_edit: a build after --edits notes were edited
+- get: p50/p99 of GET /subjects/{id}/artifacts, which never calls the LLM
+
+Each build reports its wall time and how many map/reduce steps were generated vs reused. A chat
+request that regenerates the material from scratch costs about as much as `build`.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.common import BASE_ENV, percentile
+
+PARAGRAPH = "Enzymes lower the activation energy of a reaction without being consumed by it. "
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notes", type=int, default=40)
+    parser.add_argument("--paragraphs", type=int, default=6, help="paragraphs per note")
+    parser.add_argument("--edits", type=int, default=1, help="notes edited before the incremental build")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="seconds per fake LLM call")
+    parser.add_argument("--chunk-tokens", type=int, default=600)
+    parser.add_argument("--reads", type=int, default=200, help="GET requests for the read latency")
+    parser.add_argument("--database-url", help="defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    env = {
+        **BASE_ENV,
+        "DATABASE_URL": args.database_url or f"sqlite:///{Path(tmp.name) / 'artifacts.db'}",
+        "LLM_PROVIDER": "fake",
+        "LLM_FAKE_LATENCY": str(args.llm_latency),
+        "LLM_RATE_LIMIT": "0",
+        "CHAT_TOKENS_PER_HOUR": "0",
+        "CHAT_TOKENS_PER_DAY": "0",
+        "RAG_ENABLED": "false",
+        "ARTIFACT_CHUNK_TOKENS": str(args.chunk_tokens),
+    }
+    for name, value in env.items():
+        os.environ.setdefault(name, value)
+
+    # imported late: the settings are read on import
+    from src.notes import controller
+    from src.notes.dtos import NotesSchema
+    from src.subject import artifacts
+    from src.subject.models import SubjectModel
+    from src.users.auth import Principal
+    from src.utils.db import SessionLocal
+    from src.utils.schema import create_schema
+
+    create_schema()
+    user = Principal(id=1, name="bench", username="bench", email="bench@bench.local")
+
+    def body(index: int, revision: int = 0) -> str:
+        return "\n\n".join(f"Note {index} rev {revision} part {part}. {PARAGRAPH * 8}" for part in range(args.paragraphs))
+
+    with SessionLocal() as db:
+        subject = SubjectModel(title="bench artifacts", user_id=user.id)
+        db.add(subject)
+        db.commit()
+        subject_id = subject.id
+        note_ids = [
+            controller.create_note(NotesSchema(title=f"note {index}", content=body(index), subject_id=subject_id), db, user).id
+            for index in range(args.notes)
+        ]
+
+    def build():
+        start = time.perf_counter()
+        result = asyncio.run(artifacts.build_artifacts(subject_id, user))
+        return {"seconds": round(time.perf_counter() - start, 3), "chunks": result["chunks"], **result["build"]}
+
+    results = {"build": build(), "rebuild_unchanged": build()}
+
+    # spread over the subject, so the edits land in different merge groups
+    step = max(len(note_ids) // max(args.edits, 1), 1)
+    with SessionLocal() as db:
+        for index in range(0, len(note_ids), step)[: args.edits]:
+            controller.update_note(
+                note_ids[index], NotesSchema(title=f"note {index}", content=body(index, 1), subject_id=subject_id), db, user
+            )
+    with SessionLocal() as db:
+        stale = [artifact["stale"] for artifact in artifacts.get_artifacts(subject_id, db, user)["artifacts"]]
+    results["rebuild_after_edit"] = {**build(), "stale_before": all(stale)}
+
+    latencies = []
+    for _ in range(args.reads):
+        start = time.perf_counter()
+        with SessionLocal() as db:
+            artifacts.get_artifacts(subject_id, db, user)
+        latencies.append((time.perf_counter() - start) * 1000)
+    results["get"] = {"p50_ms": round(percentile(latencies, 50), 2), "p99_ms": round(percentile(latencies, 99), 2)}
+
+    print(json.dumps({"notes": args.notes, "llm_latency": args.llm_latency, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Compare requests/s and tail latency of the sync (threadpool) and async (AsyncSession) stacks.
+
+    python -m benchmarks.async_vs_sync --concurrency 200 --duration 15
+
+Both modes run against the same seeded SQLite file; the async mode uses aiosqlite as a stand-in
+for asyncpg, so absolute numbers are only meaningful relative to each other.
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+from pathlib import Path
+
+import httpx
+
+from benchmarks.common import free_port, login, run_load, seed_user, start_server, stop_server
+
+
+def bench_mode(db_path: Path, async_mode: bool, seed: bool, args) -> dict:
+    port = free_port()
+    env = {"DATABASE_URL": f"sqlite:///{db_path}", "DB_ASYNC": str(async_mode).lower()}
+    server = start_server(env, port)
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        with httpx.Client(base_url=base_url, timeout=60) as client:
+            headers = seed_user(client, "bench", args.subjects, args.notes) if seed else login(client, "bench")
+        return {
+            route: asyncio.run(run_load(base_url, "GET", route, args.concurrency, args.duration, headers=headers))
+            for route in ("/subjects/get", "/notes/list?limit=20")
+        }
+    finally:
+        stop_server(server)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--subjects", type=int, default=5)
+    parser.add_argument("--notes", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "bench.db"
+        results = {
+            "sync": bench_mode(db_path, False, True, args),
+            "async": bench_mode(db_path, True, False, args),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Time and peak memory of set-based bulk operations vs the per-note ORM paths they replace.
+
+    python -m benchmarks.bulk_operations --notes 10000
+    python -m benchmarks.bulk_operations --notes 50000 --skip-orm
+    python -m benchmarks.bulk_operations --database-url postgresql://localhost/smartnotes_bench
+
+Seeds one subject with --notes notes for every operation and measures:
+
+- delete_subject: the ORM cascade (every note loaded, then deleted one by one) vs DELETE /subjects/delete
+- move: one update_note per note vs POST /notes/bulk_move
+- delete_filter: one delete_note per note vs POST /notes/bulk_delete
+
+Peak memory is the tracemalloc peak during the operation; tracing slows both modes alike. The
+database is emptied between runs, so point --database-url at a scratch database. The per-note
+paths take minutes at 10k notes; --skip-orm leaves them out.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.common import BASE_ENV
+
+BODY = "Mitosis is the division of one cell into two identical daughter cells. " * 20
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": round(elapsed, 3), "peak_mb": round(peak / 1024 / 1024, 2), "result": result}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notes", type=int, default=10000, help="notes in the subject each operation works on")
+    parser.add_argument("--database-url", help="defaults to a temporary SQLite file")
+    parser.add_argument("--skip-orm", action="store_true", help="only run the set-based operations")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    database_url = args.database_url or f"sqlite:///{Path(tmp.name) / 'bulk.db'}"
+    for name, value in {**BASE_ENV, "DATABASE_URL": database_url, "RAG_ENABLED": "false"}.items():
+        os.environ.setdefault(name, value)
+
+    # imported late: the settings are read on import
+    from sqlalchemy import delete, select
+
+    from src.notes import bulk, controller, revisions
+    from src.notes.dtos import NotesBulkDelete, NotesMove, NotesSchema
+    from src.notes.models import NoteContentModel, NoteRevisionModel, NotesModel
+    from src.notes import search
+    from src.subject import controller as subject_controller
+    from src.subject.models import SubjectModel
+    from src.users.auth import Principal
+    from src.utils.db import SessionLocal
+    from src.utils.schema import create_schema
+
+    create_schema()
+    user = Principal(id=1, name="bench", username="bench", email="bench@bench.local")
+
+    def reset():
+        with SessionLocal() as db:
+            search.remove_many(db, select(NotesModel.id))
+            for model in (NoteRevisionModel, NotesModel, NoteContentModel, SubjectModel):
+                db.execute(delete(model))
+            db.commit()
+
+    def seed(title: str, count: int) -> int:
+        with SessionLocal() as db:
+            subject = SubjectModel(title=title, user_id=user.id)
+            db.add(subject)
+            db.commit()
+            subject_id = subject.id
+            report = bulk.ImportReport()
+            batch = []
+            for index in range(count):
+                # distinct bodies, so the content tier cannot collapse them
+                batch.append((index, NotesSchema(title=f"note {index}", content=f"{index} {BODY}", subject_id=subject_id)))
+                if len(batch) == 500:
+                    bulk.insert_batch(db, batch, user, report)
+                    batch = []
+            if batch:
+                bulk.insert_batch(db, batch, user, report)
+        return subject_id
+
+    def note_ids(subject_id: int):
+        with SessionLocal() as db:
+            return [row.id for row in db.query(NotesModel.id).filter(NotesModel.subject_id == subject_id)]
+
+    def orm_delete_subject(subject_id: int):
+        # what delete_subject did before: the delete-orphan cascade loads and deletes each note
+        with SessionLocal() as db:
+            subject = db.get(SubjectModel, subject_id)
+            ids = select(NotesModel.id).where(NotesModel.subject_id == subject_id)
+            search.remove_many(db, ids)
+            revisions.purge(db, ids)
+            db.delete(subject)
+            db.commit()
+        return args.notes
+
+    def sql_delete_subject(subject_id: int):
+        with SessionLocal() as db:
+            subject_controller.delete_subject(subject_id, db, user)
+        return args.notes
+
+    def orm_move(subject_id: int, target_id: int):
+        ids = note_ids(subject_id)
+        with SessionLocal() as db:
+            for note_id in ids:
+                note = db.get(NotesModel, note_id)
+                controller.update_note(note_id, NotesSchema(title=note.title, content=note.content, subject_id=target_id), db, user)
+        return len(ids)
+
+    def sql_move(subject_id: int, target_id: int):
+        with SessionLocal() as db:
+            return bulk.move_notes(db, NotesMove(subject_id=target_id, from_subject_id=subject_id), user)["moved"]
+
+    def orm_delete_filter(subject_id: int):
+        ids = note_ids(subject_id)
+        with SessionLocal() as db:
+            for note_id in ids:
+                controller.delete_note(note_id, db, user)
+        return len(ids)
+
+    def sql_delete_filter(subject_id: int):
+        with SessionLocal() as db:
+            return bulk.delete_notes(db, NotesBulkDelete(subject_id=subject_id), user)["deleted"]
+
+    operations = {
+        "delete_subject": (orm_delete_subject, sql_delete_subject, False),
+        "move": (orm_move, sql_move, True),
+        "delete_filter": (orm_delete_filter, sql_delete_filter, False),
+    }
+    results = {"notes": args.notes}
+    try:
+        for name, (orm_fn, sql_fn, needs_target) in operations.items():
+            results[name] = {}
+            modes = [("sql", sql_fn)] if args.skip_orm else [("orm", orm_fn), ("sql", sql_fn)]
+            for mode, fn in modes:
+                reset()
+                subject_id = seed(f"{name}-{mode}", args.notes)
+                target = (seed(f"{name}-{mode}-target", 0),) if needs_target else ()
+                results[name][mode] = measure(lambda: fn(subject_id, *target))
+                print(name, mode, results[name][mode], flush=True)
+            if not args.skip_orm:
+                results[name]["speedup"] = round(results[name]["orm"]["seconds"] / max(results[name]["sql"]["seconds"], 1e-6), 1)
+    finally:
+        reset()
+        tmp.cleanup()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+
+BASE_ENV = {
+    "EXP_TIME": "60",
+    "ALGORITHM": "HS256",
+    "SECRET_KEY": "benchmark-secret-key-0123456789abcdef",
+    "GROQ_API_KEY": "benchmark",
+}
+
+
+def percentile(samples, pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(env: dict, port: int, workers: int = 1):
+    command = [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"]
+    if workers > 1:
+        command += ["--workers", str(workers)]
+    process = subprocess.Popen(command, cwd=ROOT, env={**os.environ, **BASE_ENV, **env})
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("server did not start")
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def login(client: httpx.Client, username: str) -> dict:
+    token = client.post("/users/login", json={"username": username, "password": "benchmark"}).json()["token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def seed_user(client: httpx.Client, username: str, subjects: int, notes_per_subject: int, note_size: int = 2000):
+    client.post(
+        "/users/register",
+        json={"name": username, "username": username, "email": f"{username}@bench.local", "password": "benchmark"},
+    )
+    headers = login(client, username)
+    body = ("lorem ipsum dolor sit amet " * (note_size // 27 + 1))[:note_size]
+    for subject_index in range(subjects):
+        subject = client.post("/subjects/create", json={"title": f"{username}-subject-{subject_index}"}, headers=headers).json()
+        for note_index in range(notes_per_subject):
+            client.post(
+                "/notes/create",
+                json={"title": f"note {note_index}", "content": body, "subject_id": subject["id"]},
+                headers=headers,
+            )
+    return headers
+
+
+async def run_load(base_url: str, method: str, path: str, concurrency: int, duration: float, headers=None, json=None):
+    latencies = []
+    errors = 0
+    deadline = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=60) as client:
+
+        async def worker():
+            nonlocal errors
+            while time.monotonic() < deadline:
+                # json may be a callable of the request number, to vary bodies between requests
+                body = json(len(latencies)) if callable(json) else json
+                start = time.perf_counter()
+                try:
+                    response = await client.request(method, path, json=body)
+                    if response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        started = time.monotonic()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.monotonic() - started
+
+    return summarize(latencies, errors, elapsed)
+
+
+def summarize(latencies, errors: int, elapsed: float) -> dict:
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
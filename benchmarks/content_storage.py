@@ -0,0 +1,130 @@
+"""Database size and read latency with note bodies stored plain vs in the compressed content tier.
+
+    python -m benchmarks.content_storage --notes 5000 --duplicates 0.2
+
+Seeds the same synthetic AI-style Markdown notes into two SQLite files, one per NOTE_CONTENT_TIER
+setting, through create_note, so each file also holds the search index and the revision snapshots
+the app writes, and reports the file size after VACUUM,
+p50/p99 of a summary page, a single note and a search, and the time to read every body (what
+building the chatbot retrieval index does).
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.common import BASE_ENV, percentile
+
+for name, value in {**BASE_ENV, "DATABASE_URL": "sqlite://"}.items():
+    os.environ.setdefault(name, value)
+
+from sqlalchemy import create_engine, text  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from src.notes import controller, search  # noqa: E402
+from src.notes.content import body_columns, join_bodies, read_body  # noqa: E402
+from src.notes.dtos import NotesSchema  # noqa: E402
+from src.notes.models import NotesModel  # noqa: E402
+from src.subject.models import SubjectModel  # noqa: E402
+from src.users.auth import Principal  # noqa: E402
+from src.utils.db import Base  # noqa: E402
+from src.utils.settings import settings  # noqa: E402
+
+TOPICS = "photosynthesis mitosis gravity momentum integrals derivatives the french revolution supply and demand".split(" ")
+PHRASES = [
+    "This is an important concept for your exam.",
+    "Remember the key definition and one real-world example.",
+    "Step by step, the process works as follows.",
+    "A common mistake is to confuse cause and effect here.",
+    "Practice this with a short question before moving on.",
+]
+
+
+def make_note(rng: random.Random, size: int) -> str:
+    topic = rng.choice(TOPICS)
+    parts = [f"Hi Student!\n\n# {topic.title()}\n"]
+    while sum(len(part) for part in parts) < size:
+        parts.append(f"## {rng.choice(TOPICS).title()} point {rng.randint(1, 20)}\n")
+        parts.extend(f"- **{topic}**: {rng.choice(PHRASES)} ({rng.randint(1, 999)})\n" for _ in range(rng.randint(2, 5)))
+    return "".join(parts)[:size]
+
+
+def seed(session_factory, user: Principal, args):
+    rng = random.Random(42)
+    bodies = []
+    with session_factory() as db:
+        subject = SubjectModel(title="bench", user_id=user.id)
+        db.add(subject)
+        db.commit()
+        for index in range(args.notes):
+            if bodies and rng.random() < args.duplicates:
+                body = rng.choice(bodies)
+            else:
+                body = make_note(rng, rng.randint(args.note_size // 2, args.note_size * 2))
+                bodies.append(body)
+            # the write path the API takes: note, revision 1 snapshot and search row in one commit
+            controller.create_note(NotesSchema(title=f"note {index}", content=body, subject_id=subject.id), db, user)
+
+
+def timed(fn, runs: int):
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return {"p50_ms": round(percentile(latencies, 50) * 1000, 3), "p99_ms": round(percentile(latencies, 99) * 1000, 3)}
+
+
+def bench_mode(tier: str, directory: Path, args) -> dict:
+    settings.NOTE_CONTENT_TIER = tier
+    path = directory / f"{tier}.db"
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    # the search index is part of the on-disk cost, and its snippets read the bodies back
+    search.setup(engine)
+    user = Principal(id=1, name="bench", username="bench", email="bench@bench.local")
+    seed(session_factory, user, args)
+    with engine.connect() as conn:
+        conn.execute(text("VACUUM"))
+    rng = random.Random(7)
+
+    with session_factory() as db:
+        def read_all():
+            query = join_bodies(db.query(NotesModel.id, *body_columns())).yield_per(500)
+            return sum(len(read_body(row) or "") for row in query)
+
+        result = {
+            "file_bytes": path.stat().st_size,
+            "list_summary": timed(lambda: controller.get_notes_page(db, user, 20), args.runs),
+            "list_full": timed(lambda: controller.get_notes_page(db, user, 20, view="full"), args.runs),
+            "get_note": timed(lambda: controller.get_notebyId(rng.randint(1, args.notes), db, user), args.runs),
+            "search": timed(lambda: controller.search_notes(rng.choice(TOPICS), 10, None, db, user), args.runs),
+        }
+        start = time.perf_counter()
+        characters = read_all()
+        result["read_all_bodies_s"] = round(time.perf_counter() - start, 3)
+        result["characters"] = characters
+    engine.dispose()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notes", type=int, default=5000)
+    parser.add_argument("--note-size", type=int, default=3000, help="typical body length in characters")
+    parser.add_argument("--duplicates", type=float, default=0.2, help="share of notes repeating an earlier body")
+    parser.add_argument("--runs", type=int, default=300)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {tier: bench_mode(tier, Path(tmp), args) for tier in ("off", "on")}
+    results["size_ratio"] = round(results["on"]["file_bytes"] / results["off"]["file_bytes"], 3)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
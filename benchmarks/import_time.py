@@ -0,0 +1,88 @@
+"""Cold-start cost of `import main`, checked against a budget.
+
+    python -m benchmarks.import_time --runs 5 --budget-ms 1200
+
+Each run imports the app in a fresh interpreter with no GROQ_API_KEY and a database URL that cannot
+be opened, so the import itself must not need either. Exits with status 1 when the median import
+time is over --budget-ms or a module that should load lazily (LangChain, the provider client,
+sentence-transformers) was imported; meant to run in CI next to the route benchmarks.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from benchmarks.common import BASE_ENV, ROOT
+
+LAZY_MODULES = ("langchain_core", "langchain_groq", "groq", "sentence_transformers")
+BUDGET_MS = 1200
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+print(json.dumps({"ms": elapsed * 1000, "modules": sorted({name.split(".")[0] for name in sys.modules})}))
+"""
+
+
+def environment() -> dict:
+    env = {**os.environ, **BASE_ENV, "DATABASE_URL": "sqlite:////nonexistent/smartnotes/bench.db"}
+    env.pop("GROQ_API_KEY", None)
+    return env
+
+
+def probe() -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=ROOT, env=environment(), capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(count: int) -> list:
+    # -X importtime writes "self | cumulative | name" to stderr, indenting two spaces per level;
+    # keep what main imports directly
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT, env=environment(), capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        parts = line.removeprefix("import time:").split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        if len(name) - len(name.lstrip()) == 3:
+            rows.append((int(parts[1]) / 1000, name.strip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=BUDGET_MS)
+    parser.add_argument("--top", type=int, default=10, help="show the slowest top-level imports")
+    args = parser.parse_args()
+
+    runs = [probe() for _ in range(args.runs)]
+    timings = [run["ms"] for run in runs]
+    eager = sorted(set(LAZY_MODULES) & set(runs[-1]["modules"]))
+    report = {
+        "median_ms": round(statistics.median(timings), 1),
+        "min_ms": round(min(timings), 1),
+        "max_ms": round(max(timings), 1),
+        "budget_ms": args.budget_ms,
+        "eager_modules": eager,
+        "slowest": [{"module": name, "ms": round(ms, 1)} for ms, name in slowest_imports(args.top)],
+    }
+    print(json.dumps(report, indent=2))
+
+    if report["median_ms"] > args.budget_ms or eager:
+        print("import budget exceeded" if not eager else f"imported at startup: {', '.join(eager)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
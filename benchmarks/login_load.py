@@ -0,0 +1,59 @@
+"""Login throughput and CRUD tail latency while a login burst is running.
+
+    python -m benchmarks.login_load --workers 0 2 4 --logins 32 --crud 32 --duration 15
+
+HASH_WORKERS=0 hashes on the shared thread executor (the old behaviour); N>0 uses the process pool.
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+from pathlib import Path
+
+import httpx
+
+from benchmarks.common import free_port, run_load, seed_user, start_server, stop_server
+
+
+async def mixed_load(base_url: str, headers: dict, args):
+    credentials = {"username": "bench", "password": "benchmark"}
+    logins, crud = await asyncio.gather(
+        run_load(base_url, "POST", "/users/login", args.logins, args.duration, json=credentials),
+        run_load(base_url, "GET", "/subjects/get", args.crud, args.duration, headers=headers),
+    )
+    return {"login": logins, "crud": crud}
+
+
+def bench_workers(workers: int, args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        port = free_port()
+        env = {
+            "DATABASE_URL": f"sqlite:///{Path(tmp) / 'bench.db'}",
+            "HASH_WORKERS": str(workers),
+            "HASH_MAX_PENDING": str(args.max_pending),
+        }
+        server = start_server(env, port)
+        try:
+            base_url = f"http://127.0.0.1:{port}"
+            with httpx.Client(base_url=base_url, timeout=60) as client:
+                headers = seed_user(client, "bench", 2, 5)
+            return asyncio.run(mixed_load(base_url, headers, args))
+        finally:
+            stop_server(server)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 2])
+    parser.add_argument("--logins", type=int, default=32, help="concurrent login clients")
+    parser.add_argument("--crud", type=int, default=32, help="concurrent CRUD clients")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--max-pending", type=int, default=64)
+    args = parser.parse_args()
+
+    results = {f"HASH_WORKERS={workers}": bench_workers(workers, args) for workers in args.workers}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Measure index build time and per-query latency of the chatbot's note retrieval stage.
+
+    python -m benchmarks.retrieval --notes 5000 --queries 500
+
+Runs in-process against a synthetic vocabulary; the target is a p99 lookup under 20 ms
+for users with thousands of notes.
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+from benchmarks.common import BASE_ENV, percentile
+
+for name, value in {**BASE_ENV, "DATABASE_URL": "sqlite://"}.items():
+    os.environ.setdefault(name, value)
+
+from src.chatbot.retrieval import UserIndex  # noqa: E402
+
+
+def make_text(rng: random.Random, vocabulary, words: int) -> str:
+    sentences = []
+    while words > 0:
+        size = min(words, rng.randint(8, 20))
+        sentences.append(" ".join(rng.choice(vocabulary) for _ in range(size)).capitalize() + ".")
+        words -= size
+    return " ".join(sentences)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notes", type=int, default=5000)
+    parser.add_argument("--words", type=int, default=300)
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    # Zipf-ish word frequencies so common words behave like real stopwords
+    vocabulary = [f"term{i}" for i in range(args.vocabulary) for _ in range(max(1, 50 // (i + 1)))]
+
+    index = UserIndex()
+    start = time.perf_counter()
+    for note_id in range(args.notes):
+        index.add_note(note_id, make_text(rng, vocabulary, 4), make_text(rng, vocabulary, args.words))
+    build_seconds = time.perf_counter() - start
+
+    latencies = []
+    for _ in range(args.queries):
+        question = make_text(rng, vocabulary, rng.randint(4, 12))
+        start = time.perf_counter()
+        index.query(question, args.top_k)
+        latencies.append(time.perf_counter() - start)
+
+    print(
+        json.dumps(
+            {
+                "notes": args.notes,
+                "chunks": len(index.chunks),
+                "features": len(index.postings),
+                "build_seconds": round(build_seconds, 3),
+                "query_ms_p50": round(percentile(latencies, 50) * 1000, 3),
+                "query_ms_p99": round(percentile(latencies, 99) * 1000, 3),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
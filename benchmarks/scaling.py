@@ -0,0 +1,126 @@
+"""Throughput as the number of API worker processes grows, and stale reads across workers.
+
+    python -m benchmarks.scaling --workers 1 2 4 8 --load-procs 4 --duration 15
+    python -m benchmarks.scaling --workers 4 --bus memory   # shows the stale reads the bus prevents
+
+Each run starts `uvicorn main:app --workers N` (the same process model as gunicorn.conf.py) on a
+fresh SQLite database with the sqlite invalidation bus, seeds a user, and drives --route from
+--load-procs load generator processes. Throughput should grow close to linearly with N up to the
+number of free cores; the load generators need cores too, so on a small machine run them elsewhere
+or keep --load-procs low.
+
+After the load, a note is created and /dashboard/summary is read --reads times on fresh
+connections, spread over the workers. A read that still shows the old note count after the bus
+poll interval is counted as stale.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from benchmarks.common import BASE_ENV, ROOT, free_port, run_load, seed_user, start_server, stop_server
+
+
+def load_process(options):
+    base_url, path, concurrency, duration, headers = options
+    return asyncio.run(run_load(base_url, "GET", path, concurrency, duration, headers=headers))
+
+
+def drive(base_url: str, headers: dict, args) -> dict:
+    options = [(base_url, args.route, args.concurrency, args.duration, headers)] * args.load_procs
+    with multiprocessing.Pool(args.load_procs) as pool:
+        parts = pool.map(load_process, options)
+    # per-process latency summaries cannot be merged exactly; report the worst of them
+    return {
+        "requests": sum(part["requests"] for part in parts),
+        "errors": sum(part["errors"] for part in parts),
+        "rps": round(sum(part["rps"] for part in parts), 2),
+        "p50_ms": max(part["p50_ms"] for part in parts),
+        "p99_ms": max(part["p99_ms"] for part in parts),
+    }
+
+
+def stale_reads(base_url: str, headers: dict, args) -> int:
+    def summary_notes():
+        # a new connection each time, so the reads land on different workers
+        with httpx.Client(base_url=base_url, headers=headers, timeout=30) as fresh:
+            return fresh.get("/dashboard/summary").json()["totals"]["notes"]
+
+    with httpx.Client(base_url=base_url, headers=headers, timeout=30) as client:
+        subject_id = client.get("/subjects/get").json()[0]["id"]
+        # every worker caches the summary before the write
+        before = max(summary_notes() for _ in range(args.reads))
+        client.post("/notes/create", json={"title": "fresh", "content": "fresh", "subject_id": subject_id})
+    time.sleep(args.poll_interval * 3)
+    return sum(summary_notes() != before + 1 for _ in range(args.reads))
+
+
+def bench_workers(workers: int, args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            "DATABASE_URL": args.database_url or f"sqlite:///{Path(tmp) / 'bench.db'}",
+            "INVALIDATION_BUS": args.bus,
+            "INVALIDATION_SQLITE_PATH": str(Path(tmp) / "bus.db"),
+            "INVALIDATION_POLL_INTERVAL": str(args.poll_interval),
+            "INVALIDATION_REDIS_URL": args.redis_url or "",
+            "DB_CREATE_SCHEMA": "false",
+            "JOBS_WORKERS": "0",
+            "HASH_WORKERS": "0",
+            "LLM_PROVIDER": "fake",
+            "METRICS_ENABLED": "false",
+        }
+        # once, before the workers start, as gunicorn.conf.py does
+        subprocess.run([sys.executable, "-m", "src.utils.schema"], cwd=ROOT, env={**os.environ, **BASE_ENV, **env}, check=True)
+        port = free_port()
+        server = start_server(env, port, workers)
+        try:
+            base_url = f"http://127.0.0.1:{port}"
+            with httpx.Client(base_url=base_url, timeout=60) as client:
+                headers = seed_user(client, "bench", args.subjects, args.notes)
+            result = drive(base_url, headers, args)
+            result["stale_reads"] = stale_reads(base_url, headers, args)
+            return result
+        finally:
+            stop_server(server)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--route", default="/notes/list?limit=20", help="GET route driven with the seeded user's token")
+    parser.add_argument("--load-procs", type=int, default=2, help="load generator processes")
+    parser.add_argument("--concurrency", type=int, default=32, help="connections per load generator")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--subjects", type=int, default=2)
+    parser.add_argument("--notes", type=int, default=25, help="notes per subject")
+    parser.add_argument("--bus", default="sqlite", choices=["memory", "sqlite", "redis"])
+    parser.add_argument("--redis-url", help="for --bus redis")
+    parser.add_argument("--poll-interval", type=float, default=0.2)
+    parser.add_argument("--reads", type=int, default=40, help="summary reads for the stale-read check")
+    parser.add_argument("--database-url", help="defaults to a temporary SQLite file per run")
+    args = parser.parse_args()
+    if args.bus == "redis" and not args.redis_url:
+        parser.error("--bus redis needs --redis-url")
+
+    results = {}
+    for workers in args.workers:
+        results[f"workers={workers}"] = bench_workers(workers, args)
+        print(workers, results[f"workers={workers}"], flush=True)
+    base = results[f"workers={args.workers[0]}"]["rps"] or 1
+    for workers in args.workers:
+        result = results[f"workers={workers}"]
+        result["speedup"] = round(result["rps"] / base, 2)
+        result["efficiency"] = round(result["speedup"] * args.workers[0] / workers, 2)
+    print(json.dumps({"cpu_count": os.cpu_count(), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
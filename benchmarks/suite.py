@@ -0,0 +1,220 @@
+"""Throughput and p50/p95/p99 latency of every main route, at several data scales.
+
+    python -m benchmarks.suite --scales small medium --output results.json
+    python -m benchmarks.suite --scales small --compare baseline.json
+    python -m benchmarks.suite --input results.json --compare baseline.json
+
+Each scale starts `main:app` under uvicorn against a fresh SQLite file (or --database-url, e.g. a
+local Postgres; rows are then namespaced per run instead of wiped), seeds synthetic users, subjects
+and notes through the API, then loads each route in turn. The chatbot runs on the local fake LLM
+(LLM_PROVIDER=fake) with a fixed --llm-latency and the response cache off, so no key or network is
+needed and every run sees the same upstream.
+
+--compare prints the change against a saved run and exits with status 1 when a route's p95/p99
+grew, or its throughput fell, by more than --threshold percent.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+from benchmarks.common import ROOT, free_port, login, run_load, start_server, stop_server
+
+SCALES = {
+    "small": {"users": 2, "subjects": 3, "notes": 20},
+    "medium": {"users": 5, "subjects": 5, "notes": 200},
+    "large": {"users": 10, "subjects": 10, "notes": 500},
+}
+
+VOCABULARY = (
+    "cell membrane protein enzyme energy atom molecule reaction force velocity momentum vector matrix "
+    "integral derivative function limit theorem proof history empire treaty revolution economy market "
+    "demand supply language grammar poem novel climate ocean river mountain photosynthesis gravity"
+).split()
+
+SEARCH_TERM = "photosynthesis"
+
+
+def make_note(rng: random.Random, size: int) -> str:
+    words = []
+    while sum(len(word) + 1 for word in words) < size:
+        words.append(rng.choice(VOCABULARY))
+    return " ".join(words)
+
+
+def seed(client: httpx.Client, prefix: str, scale: dict, note_size: int) -> list:
+    # notes go through /notes/bulk_import so the large scale seeds in seconds, not minutes
+    rng = random.Random(42)
+    users = []
+    for user_index in range(scale["users"]):
+        username = f"{prefix}-user-{user_index}"
+        client.post(
+            "/users/register",
+            json={"name": username, "username": username, "email": f"{username}@bench.local", "password": "benchmark"},
+        )
+        headers = login(client, username)
+        subject_ids = []
+        for subject_index in range(scale["subjects"]):
+            subject = client.post("/subjects/create", json={"title": f"{username} subject {subject_index}"}, headers=headers).json()
+            subject_ids.append(subject["id"])
+            lines = (
+                json.dumps({"title": f"note {note_index}", "content": make_note(rng, note_size), "subject_id": subject["id"]})
+                for note_index in range(scale["notes"])
+            )
+            response = client.post(
+                "/notes/bulk_import",
+                content="\n".join(lines).encode(),
+                headers={**headers, "Content-Type": "application/x-ndjson"},
+            )
+            response.raise_for_status()
+        users.append({"username": username, "headers": headers, "subject_ids": subject_ids})
+    return users
+
+
+def routes(user: dict, note_id: int) -> list:
+    # (name, method, path, body); the name is the stable key used by --compare
+    subject_id = user["subject_ids"][0]
+    create = lambda number: {"title": f"bench {number}", "content": "written under load", "subject_id": subject_id}
+    question = lambda number: {"query": f"Explain topic number {number}", "user_name": "bench"}
+    batch = lambda number: {"topics": [f"Revision topic {number}.{index}" for index in range(5)]}
+    return [
+        ("POST /users/login", "POST", "/users/login", {"username": user["username"], "password": "benchmark"}),
+        ("GET /users/is_auth", "GET", "/users/is_auth", None),
+        ("GET /subjects/get", "GET", "/subjects/get", None),
+        ("GET /subjects/get_subject/{id}", "GET", f"/subjects/get_subject/{subject_id}", None),
+        ("GET /notes/list", "GET", "/notes/list?limit=20", None),
+        ("GET /notes/get?subject_id", "GET", f"/notes/get?subject_id={subject_id}", None),
+        ("GET /notes/get_note/{id}", "GET", f"/notes/get_note/{note_id}", None),
+        ("GET /notes/search", "GET", f"/notes/search?q={SEARCH_TERM}&limit=20", None),
+        ("POST /notes/create", "POST", "/notes/create", create),
+        ("GET /dashboard/summary", "GET", "/dashboard/summary", None),
+        ("POST /chatbot/generate", "POST", "/chatbot/generate", question),
+        ("POST /chatbot/generate/batch", "POST", "/chatbot/generate/batch", batch),
+    ]
+
+
+def bench_scale(name: str, args, database_url: str) -> dict:
+    scale = SCALES[name]
+    port = free_port()
+    env = {
+        "DATABASE_URL": database_url,
+        "DB_ASYNC": str(args.use_async).lower(),
+        "LLM_PROVIDER": "fake",
+        "LLM_FAKE_LATENCY": str(args.llm_latency),
+        "LLM_RATE_LIMIT": "0",
+        "CHAT_CACHE_BACKEND": "none",
+        "JOBS_WORKERS": "0",
+    }
+    server = start_server(env, port, args.workers)
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        with httpx.Client(base_url=base_url, timeout=300) as client:
+            started = time.monotonic()
+            users = seed(client, f"{name}-{int(time.time())}", scale, args.note_size)
+            seed_seconds = time.monotonic() - started
+            note_id = client.get("/notes/list?limit=1", headers=users[0]["headers"]).json()["items"][0]["id"]
+
+        results = {}
+        for route, method, path, body in routes(users[0], note_id):
+            if args.routes and not any(part in route for part in args.routes):
+                continue
+            results[route] = asyncio.run(
+                run_load(base_url, method, path, args.concurrency, args.duration, headers=users[0]["headers"], json=body)
+            )
+            print(f"{name:>7} {route:<32} {json.dumps(results[route])}", file=sys.stderr)
+        return {
+            "seed": {**scale, "note_size": args.note_size, "seconds": round(seed_seconds, 2)},
+            "routes": results,
+        }
+    finally:
+        stop_server(server)
+
+
+def run(args) -> dict:
+    meta = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "commit": subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip(),
+        "python": platform.python_version(),
+        "database": args.database_url.split(":", 1)[0] if args.database_url else "sqlite",
+        "async": args.use_async,
+        "workers": args.workers,
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "llm_latency": args.llm_latency,
+    }
+    scales = {}
+    for name in args.scales:
+        if args.database_url:
+            scales[name] = bench_scale(name, args, args.database_url)
+            continue
+        with tempfile.TemporaryDirectory() as tmp:
+            scales[name] = bench_scale(name, args, f"sqlite:///{Path(tmp) / 'bench.db'}")
+    return {"meta": meta, "scales": scales}
+
+
+def change(new: float, old: float) -> float:
+    return round((new - old) / old * 100, 1) if old else 0.0
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    regressions = []
+    print(f"{'scale':>7} {'route':<32} {'rps':>16} {'p95 ms':>18} {'p99 ms':>18}")
+    for name, scale in results["scales"].items():
+        for route, new in scale["routes"].items():
+            old = baseline.get("scales", {}).get(name, {}).get("routes", {}).get(route)
+            if old is None:
+                print(f"{name:>7} {route:<32} (not in baseline)")
+                continue
+            deltas = {key: change(new[key], old[key]) for key in ("rps", "p95_ms", "p99_ms")}
+            worse = deltas["rps"] < -threshold or deltas["p95_ms"] > threshold or deltas["p99_ms"] > threshold
+            cells = " ".join(f"{new[key]:>9} ({deltas[key]:+6.1f}%)" for key in ("rps", "p95_ms", "p99_ms"))
+            print(f"{name:>7} {route:<32} {cells}{'  REGRESSION' if worse else ''}")
+            if worse:
+                regressions.append((name, route))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", nargs="+", choices=list(SCALES), default=["small"])
+    parser.add_argument("--routes", nargs="+", help="only run routes whose name contains one of these")
+    parser.add_argument("--database-url", help="run against this database instead of a temporary SQLite file")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="serve with DB_ASYNC=true")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--note-size", type=int, default=1500, help="characters per seeded note")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="seconds the fake LLM takes per answer")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--input", help="compare a saved run instead of running the suite")
+    parser.add_argument("--compare", help="baseline results to compare against")
+    parser.add_argument("--threshold", type=float, default=15, help="allowed change in percent")
+    args = parser.parse_args()
+
+    if args.input:
+        results = json.loads(Path(args.input).read_text())
+    else:
+        results = run(args)
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+    elif not args.input:
+        print(json.dumps(results, indent=2))
+
+    if args.compare:
+        regressions = compare(results, json.loads(Path(args.compare).read_text()), args.threshold)
+        if regressions:
+            print(f"{len(regressions)} route(s) regressed by more than {args.threshold}%", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
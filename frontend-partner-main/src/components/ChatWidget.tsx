@@ -195,9 +195,14 @@ export default function ChatWidget() {
     setSending(true);
 
     try {
+      // signed-in users get answers grounded in their own notes
+      const token = localStorage.getItem("token");
       const res = await fetch(`${API_BASE}/chatbot/generate`, {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
+        headers: {
+          "Content-Type": "application/json",
+          ...(token ? { Authorization: `Bearer ${token}` } : {}),
+        },
         body: JSON.stringify({ query: text, user_name: user?.name ?? "Student" }),
       });
 
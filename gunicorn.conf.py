@@ -0,0 +1,27 @@
+# gunicorn -c gunicorn.conf.py main:app
+#
+# One worker process per core. Each worker has its own event loop, database pool, hashing pool,
+# caches and job workers, so per-process settings multiply: keep workers * (DB_POOL_SIZE +
+# DB_MAX_OVERFLOW) under the database's connection limit, and set INVALIDATION_BUS=sqlite (one
+# host) or redis (several hosts) so a write in one worker evicts the cached copies in the others.
+import multiprocessing
+import os
+import subprocess
+import sys
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+# the app is imported in each worker, after the fork, so no pool, thread or connection is shared
+preload_app = False
+# chatbot streams and batches stay open for a while; a worker is only killed when it stops responding
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+
+
+def on_starting(server):
+    # create the schema once, in a separate interpreter, instead of racing in every worker's lifespan
+    if os.environ.get("DB_CREATE_SCHEMA", "true").lower() not in ("0", "false", "no"):
+        subprocess.run([sys.executable, "-m", "src.utils.schema"], check=True)
+        os.environ["DB_CREATE_SCHEMA"] = "false"
@@ -1,21 +1,57 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI
 from fastapi.responses import FileResponse
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
-from src.utils.db import engine,Base
-from src.users.models import UserModel
-from src.subject.models import SubjectModel
-from src.notes.models import NotesModel
-from src.subject.router import subject_routes
-from src.users.router import userrouter
-from src.notes.router import notes_routes
+from src.utils.db import pool_stats
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from src.chatbot.router import chat_router
-Base.metadata.create_all(engine)
+from src.chatbot.usage import usage_meter
+from src.notes.bulk_router import notes_bulk_routes
+from src.notes.router import get_current_user
+from src.subject.artifacts_router import subject_artifact_routes
+from src.dashboard.router import dashboard_routes
+from src.jobs.router import jobs_routes
+from src.jobs.worker import workers
+from src.metrics.instrumentation import MetricsMiddleware
+from src.metrics.router import metrics_router
+from src.utils.bus import bus
+from src.utils.schema import create_schema
+from src.utils.settings import settings
+from src.users import hashing
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    BrotliMiddleware = None
+if settings.DB_ASYNC:
+    from src.subject.async_router import subject_routes
+    from src.users.async_router import userrouter
+    from src.notes.async_router import notes_routes
+else:
+    from src.subject.router import subject_routes
+    from src.users.router import userrouter
+    from src.notes.router import notes_routes
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # schema work needs the database, so it happens here rather than when the module is imported
+    if settings.DB_CREATE_SCHEMA:
+        create_schema()
+    # per worker process: every worker receives the other workers' invalidation events
+    bus.start()
+    workers.start()
+    usage_meter.start()
+    yield
+    # running jobs go back to the queue instead of waiting for their leases to expire
+    await workers.stop()
+    await usage_meter.stop()
+    bus.stop()
+    hashing.pool.shutdown()
 
-app=FastAPI(title="AI-Based Notes Management System")
+
+app=FastAPI(title="AI-Based Notes Management System", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -31,6 +67,17 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# server-sent event streams are left uncompressed so every event reaches the client as it is sent
+if BrotliMiddleware is not None:
+    app.add_middleware(
+        BrotliMiddleware,
+        minimum_size=settings.HTTP_COMPRESSION_MIN_SIZE,
+        excluded_handlers=[r"/stream$", r"/events$", r"/batch$"],
+    )
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=settings.HTTP_COMPRESSION_MIN_SIZE)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
 
 frontend_dir = Path(__file__).parent / "frontend-partner-main" / "dist"
 if frontend_dir.exists():
@@ -44,7 +91,17 @@ def home():
         "message": "Backend is running. Frontend dev server expected at http://127.0.0.1:8080"
     }
 
+# pool sizes and replica lag describe the deployment, so only signed-in users see them
+@app.get("/health/db", dependencies=[Depends(get_current_user)])
+def db_health():
+    return pool_stats()
+
 app.include_router(subject_routes)
+app.include_router(subject_artifact_routes)
 app.include_router(userrouter)
 app.include_router(notes_routes)
+app.include_router(notes_bulk_routes)
+app.include_router(dashboard_routes)
 app.include_router(chat_router)
+app.include_router(jobs_routes)
+app.include_router(metrics_router)
@@ -0,0 +1,174 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+from src.utils import redis_client
+from src.utils.cache import TTLCache
+from src.utils.embeddings import cosine, load_embedder
+from src.utils.settings import settings
+
+# Responses are generated for this placeholder name and personalised after the lookup,
+# so the greeting never becomes part of the cache key.
+STUDENT_PLACEHOLDER = "[[student_name]]"
+
+
+def normalize_question(question: str) -> str:
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.rstrip(" ?!.")
+
+
+def cache_key(question: str, version: str, context: str = "") -> str:
+    # answers grounded in a user's notes are only reusable for the same retrieved context
+    context_digest = hashlib.sha256(context.encode()).hexdigest() if context else ""
+    return hashlib.sha256(f"{version}:{context_digest}:{normalize_question(question)}".encode()).hexdigest()
+
+
+def personalize(response: str, user_name: str) -> str:
+    return response.replace(STUDENT_PLACEHOLDER, user_name)
+
+
+def split_pending(text: str):
+    # hold back a trailing partial placeholder so a streamed "[[stud" + "ent_name]]" still gets replaced
+    for size in range(min(len(text), len(STUDENT_PLACEHOLDER) - 1), 0, -1):
+        if STUDENT_PLACEHOLDER.startswith(text[-size:]):
+            return text[:-size], text[-size:]
+    return text, ""
+
+
+class MemoryResponseCache:
+    def __init__(self, max_entries: int, ttl: int, max_bytes: int):
+        self.store = TTLCache(
+            max_entries=max_entries,
+            ttl=ttl,
+            max_bytes=max_bytes,
+            sizeof=lambda value: len(value.encode()),
+        )
+
+    def get(self, key: str):
+        return self.store.get(key)
+
+    def set(self, key: str, value: str):
+        self.store.set(key, value)
+
+    def stats(self):
+        return self.store.stats()
+
+
+class RedisResponseCache:
+    # Shared between workers; eviction beyond the TTL is left to the server's maxmemory-policy (allkeys-lru).
+
+    def __init__(self, url: str, ttl: int, max_bytes: int, prefix: str = "chatcache:"):
+        self.client = redis_client.connect(url)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        value = self.client.get(self.prefix + key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value.decode()
+
+    def set(self, key: str, value: str):
+        data = value.encode()
+        if len(data) <= self.max_bytes:
+            self.client.set(self.prefix + key, data, ex=self.ttl)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+
+class SemanticIndex:
+    # Maps question embeddings to exact cache keys so paraphrases resolve to an existing entry.
+
+    def __init__(self, embed, threshold: float, max_entries: int):
+        self.embed = embed
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.hits = 0
+        self._vectors = OrderedDict()
+        self._lock = threading.Lock()
+
+    def nearest(self, question: str):
+        vector = self.embed(normalize_question(question))
+        with self._lock:
+            scored = ((cosine(vector, other), key) for key, other in self._vectors.items())
+            score, key = max(scored, default=(0.0, None))
+        if key is not None and score >= self.threshold:
+            self.hits += 1
+            return key
+        return None
+
+    def add(self, question: str, key: str):
+        vector = self.embed(normalize_question(question))
+        with self._lock:
+            self._vectors[key] = vector
+            self._vectors.move_to_end(key)
+            while len(self._vectors) > self.max_entries:
+                self._vectors.popitem(last=False)
+
+
+class ResponseCache:
+    def __init__(self, backend, version: str, semantic: SemanticIndex = None):
+        self.backend = backend
+        self.version = version
+        self.semantic = semantic
+
+    def lookup(self, question: str, context: str = ""):
+        key = cache_key(question, self.version, context)
+        response = self.backend.get(key)
+        if response is None and self.semantic is not None and not context:
+            similar = self.semantic.nearest(question)
+            if similar is not None:
+                response = self.backend.get(similar)
+        return response
+
+    def store(self, question: str, response: str, context: str = ""):
+        key = cache_key(question, self.version, context)
+        self.backend.set(key, response)
+        if self.semantic is not None and not context:
+            self.semantic.add(question, key)
+
+    def stats(self):
+        stats = {"backend": settings.CHAT_CACHE_BACKEND, **self.backend.stats()}
+        if self.semantic is not None:
+            stats["semantic_hits"] = self.semantic.hits
+        return stats
+
+
+class NullBackend:
+    def get(self, key: str):
+        return None
+
+    def set(self, key: str, value: str):
+        return None
+
+    def stats(self):
+        return {}
+
+
+def build_response_cache(version: str) -> ResponseCache:
+    if settings.CHAT_CACHE_BACKEND == "redis":
+        if not settings.CHAT_CACHE_REDIS_URL:
+            raise RuntimeError("CHAT_CACHE_BACKEND=redis needs CHAT_CACHE_REDIS_URL")
+        backend = RedisResponseCache(settings.CHAT_CACHE_REDIS_URL, settings.CHAT_CACHE_TTL, settings.CHAT_CACHE_MAX_BYTES)
+    elif settings.CHAT_CACHE_BACKEND == "none":
+        backend = NullBackend()
+    else:
+        backend = MemoryResponseCache(
+            settings.CHAT_CACHE_MAX_ENTRIES,
+            settings.CHAT_CACHE_TTL,
+            settings.CHAT_CACHE_MAX_BYTES,
+        )
+
+    semantic = None
+    if settings.CHAT_CACHE_SEMANTIC:
+        embed = load_embedder(settings.CHAT_CACHE_EMBEDDING_MODEL)
+        if embed is not None:
+            semantic = SemanticIndex(embed, settings.CHAT_CACHE_SIMILARITY, settings.CHAT_CACHE_MAX_ENTRIES)
+    return ResponseCache(backend, version, semantic)
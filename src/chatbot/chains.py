@@ -0,0 +1,120 @@
+from functools import lru_cache
+
+from fastapi import HTTPException, status
+
+from src.utils.settings import settings
+
+# bump whenever the prompt changes so cached responses from the old prompt are not served
+PROMPT_VERSION = "3"
+
+NOTES_PROMPT = """
+You are Smart Notes Assistant for students.
+
+Student name: {user_name}
+Requested question: {question}
+
+Excerpts from the student's own notes (may be empty):
+{context}
+
+Conversation so far (may be empty):
+{history}
+
+Your task:
+1. Start with a short greeting to the student using their name.
+2. Write clear, exam-oriented notes. When the excerpts are relevant, build on them,
+   keep the student's terminology and only add what they are missing.
+   Do not repeat what was already explained earlier in the conversation.
+3. Keep explanations step-by-step and practical.
+4. Include real-world examples.
+5. End with short Q&A revision points.
+
+Formatting rules (strict):
+- Respond in Markdown.
+- Use headings: `#`, `##`, `###`
+- Use short paragraphs.
+- Use bullet points where useful.
+- Use **bold** only for important terms.
+- Keep language simple and concise.
+"""
+
+SUMMARY_PROMPT = """
+Summarize this conversation between a student and a study assistant so the assistant can continue it.
+Keep the topics asked about, key facts given and anything the student said they struggle with.
+Write at most {max_words} words of plain text.
+
+Previous summary (may be empty):
+{summary}
+
+New turns:
+{transcript}
+"""
+
+# bump whenever an artifact task changes so stored map and reduce outputs are regenerated
+ARTIFACT_PROMPT_VERSION = "1"
+
+ARTIFACT_PROMPT = """
+You are Smart Notes Assistant, preparing revision material from a student's notes.
+
+{task}
+
+Formatting rules (strict):
+- Respond in Markdown.
+- Use only what the text below says; do not add outside facts.
+- Keep language simple and concise.
+
+Text:
+{text}
+"""
+
+# "condense" is the map step over one chunk of notes, "merge" combines condensed chunks when there
+# are too many for one prompt; the rest build the artifact of that kind from the condensed text
+ARTIFACT_TASKS = {
+    "condense": "List the key facts, definitions, formulas and examples in this excerpt as short bullet points.",
+    "merge": "Merge these bullet points into one list. Drop duplicates, keep every distinct fact.",
+    "summary": "Write a structured summary of the subject with `##` headings per topic and short paragraphs.",
+    "flashcards": "Write up to 20 flashcards, one per line, formatted as `Q: <question> | A: <answer>`.",
+    "qa": "Write 10 exam-style revision questions, each followed by a model answer of 2-4 sentences.",
+}
+
+
+# LangChain and the provider client are imported on the first chatbot call rather than at startup:
+# they are most of the app's import time, and a missing key should only break the chatbot.
+@lru_cache(maxsize=None)
+def get_llm():
+    if settings.LLM_PROVIDER != "fake" and not settings.GROQ_API_KEY:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Chatbot is not configured")
+    from src.chatbot.llm import build_llm
+
+    return build_llm()
+
+
+@lru_cache(maxsize=None)
+def notes_chain():
+    # no output parser: the chat model's message carries the provider's token usage, see message_text()
+    from langchain_core.prompts import PromptTemplate
+
+    template = PromptTemplate(input_variables=["question", "user_name", "context", "history"], template=NOTES_PROMPT)
+    return template | get_llm()
+
+
+def message_text(output) -> str:
+    # a completion LLM (the fake provider) returns text, a chat model a message or message chunk
+    return output if isinstance(output, str) else output.content
+
+
+@lru_cache(maxsize=None)
+def summary_chain():
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.prompts import PromptTemplate
+
+    template = PromptTemplate(input_variables=["summary", "transcript", "max_words"], template=SUMMARY_PROMPT)
+    return template | get_llm() | StrOutputParser()
+
+
+@lru_cache(maxsize=None)
+def artifact_chain():
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.prompts import PromptTemplate
+
+    template = PromptTemplate(input_variables=["task", "text"], template=ARTIFACT_PROMPT)
+    return template | get_llm() | StrOutputParser()
@@ -1,12 +1,55 @@
+from datetime import date
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 
 class ChatMessage(BaseModel):
     query: str
     user_name: Optional[str] = None
+    # continue a conversation created with POST /chatbot/sessions
+    session_id: Optional[str] = None
+
+class ChatBatchRequest(BaseModel):
+    topics: List[str]
+    user_name: Optional[str] = None
+    # when set, every generated answer is saved as a note in this subject
+    subject_id: Optional[int] = None
 
 class ChatResponse(BaseModel):
     response: str
+    session_id: Optional[str] = None
+
+class ChatTurn(BaseModel):
+    role: str
+    content: str
+
+class ChatSessionStats(BaseModel):
+    turns: int
+    summarized_turns: int
+    history_tokens: int
+    summary_tokens: int
+    bytes: int
+    last_prompt_tokens: int
+    prompt_tokens_total: int
 
 class ChatHistory(BaseModel):
-    history: list[ChatMessage]
+    session_id: str
+    summary: str
+    history: list[ChatTurn]
+    stats: ChatSessionStats
+
+class ChatUsageWindow(BaseModel):
+    seconds: int
+    limit: int
+    used: int
+    remaining: int
+    retry_after: int
+
+class ChatUsageDay(BaseModel):
+    day: date
+    requests: int
+    prompt_tokens: int
+    completion_tokens: int
+
+class ChatUsage(BaseModel):
+    windows: List[ChatUsageWindow]
+    days: List[ChatUsageDay]
@@ -0,0 +1,76 @@
+import asyncio
+import re
+import time
+from typing import Any, Optional
+
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
+
+from src.utils.settings import settings
+
+
+class FakeNotesLLM(LLM):
+    # Local stand-in for the provider: answers after `latency` seconds, streams in small chunks,
+    # and never touches the network. Selected with LLM_PROVIDER=fake for tests and benchmarks.
+
+    latency: float = 0.5
+    chunk_size: int = 24
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-notes"
+
+    def answer(self, prompt: str) -> str:
+        question = re.search(r"Requested question: (.*)", prompt)
+        if question is None:
+            # summary and artifact prompts: the first lines of the input, so different inputs give different answers
+            lines = [line.strip() for line in prompt.split("Text:")[-1].splitlines() if line.strip()]
+            return "\n".join(f"- {line[:80]}" for line in lines[:12])
+        name = re.search(r"Student name: (.*)", prompt)
+        topic = question.group(1).strip()
+        return (
+            f"Hi {name.group(1).strip() if name else 'Student'}!\n\n"
+            f"# {topic}\n\n"
+            f"## Key points\n\n- **{topic}** explained step by step.\n- A real-world example.\n\n"
+            "## Revision Q&A\n\n- Q: What is it? A: See above."
+        )
+
+    def _call(self, prompt: str, stop: Optional[list] = None, run_manager: Any = None, **kwargs: Any) -> str:
+        time.sleep(self.latency)
+        return self.answer(prompt)
+
+    async def _acall(self, prompt: str, stop: Optional[list] = None, run_manager: Any = None, **kwargs: Any) -> str:
+        await asyncio.sleep(self.latency)
+        return self.answer(prompt)
+
+    def _pieces(self, prompt: str):
+        text = self.answer(prompt)
+        return [text[i: i + self.chunk_size] for i in range(0, len(text), self.chunk_size)]
+
+    def _stream(self, prompt: str, stop: Optional[list] = None, run_manager: Any = None, **kwargs: Any):
+        pieces = self._pieces(prompt)
+        for piece in pieces:
+            time.sleep(self.latency / len(pieces))
+            yield GenerationChunk(text=piece)
+
+    async def _astream(self, prompt: str, stop: Optional[list] = None, run_manager: Any = None, **kwargs: Any):
+        pieces = self._pieces(prompt)
+        for piece in pieces:
+            await asyncio.sleep(self.latency / len(pieces))
+            yield GenerationChunk(text=piece)
+
+
+def build_llm():
+    if settings.LLM_PROVIDER == "fake":
+        return FakeNotesLLM(latency=settings.LLM_FAKE_LATENCY)
+
+    from langchain_groq import ChatGroq
+
+    # retries are done in src/chatbot/upstream.py so they queue behind the rate limiter
+    return ChatGroq(
+        model="llama-3.3-70b-versatile",
+        api_key=settings.GROQ_API_KEY,
+        temperature=0.7,
+        max_tokens=500,
+        max_retries=0,
+    )
@@ -0,0 +1,20 @@
+from sqlalchemy import Column,Integer,String,DateTime,UniqueConstraint
+from src.utils.db import Base
+
+class ChatUsageModel(Base):
+    # LLM tokens per client and minute, written in batches from the in-memory counters in usage.py;
+    # client is "user:<id>" for signed-in users and "ip:<address>" for anonymous visitors
+    __tablename__="ChatUsage"
+
+    id=Column(Integer,primary_key=True)
+    client=Column(String,nullable=False)
+    user_id=Column(Integer,index=True)
+    period_start=Column(DateTime,nullable=False)
+    requests=Column(Integer,nullable=False,default=0)
+    prompt_tokens=Column(Integer,nullable=False,default=0)
+    completion_tokens=Column(Integer,nullable=False,default=0)
+
+    # flushes add to the row of their (client, minute); also serves the per-client range scans
+    __table_args__=(
+        UniqueConstraint("client","period_start",name="uq_chat_usage_client_period"),
+    )
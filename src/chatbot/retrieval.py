@@ -0,0 +1,177 @@
+import math
+import re
+import threading
+from collections import OrderedDict
+
+from src.notes.content import body_columns, join_bodies, read_body
+from src.notes.models import NotesModel
+from src.subject.models import SubjectModel
+from src.utils.bus import DATA_CHANGED, bus
+from src.utils.db import read_session
+from src.utils.embeddings import hash_features
+from src.utils.settings import settings
+from src.utils.tokens import CHARS_PER_TOKEN, estimate_tokens
+
+# features present in more than this share of a user's chunks carry no signal and are skipped
+MAX_DOCUMENT_FREQUENCY = 0.5
+
+
+def chunk_text(text: str, max_tokens: int):
+    # pack paragraphs (then sentences, for long paragraphs) into chunks of at most max_tokens
+    pieces = []
+    for paragraph in re.split(r"\n\s*\n", text or ""):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if estimate_tokens(paragraph) <= max_tokens:
+            pieces.append(paragraph)
+        else:
+            pieces.extend(sentence for sentence in re.split(r"(?<=[.!?])\s+", paragraph) if sentence)
+
+    chunks, current = [], ""
+    for piece in pieces:
+        candidate = f"{current}\n\n{piece}" if current else piece
+        if current and estimate_tokens(candidate) > max_tokens:
+            chunks.append(current)
+            candidate = piece
+        # a single run-on sentence is cut rather than allowed to blow the budget
+        current = candidate[: max_tokens * CHARS_PER_TOKEN]
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class UserIndex:
+    # Sparse inverted index over hashed features; a query only touches the postings of its own terms.
+    # Each chunk keeps its feature keys, so removing a note drops exactly its postings.
+
+    def __init__(self):
+        self.chunks = {}
+        self.postings = {}
+        self.note_chunks = {}
+        self.lock = threading.Lock()
+        self._next_id = 0
+
+    def add_note(self, note_id: int, title: str, content: str):
+        with self.lock:
+            self._remove(note_id)
+            ids = []
+            for text in chunk_text(content, settings.RAG_CHUNK_TOKENS):
+                chunk_id = self._next_id
+                self._next_id += 1
+                vector = hash_features(f"{title}\n{text}")
+                self.chunks[chunk_id] = (note_id, title, text, tuple(vector))
+                for feature, weight in vector.items():
+                    self.postings.setdefault(feature, {})[chunk_id] = weight
+                ids.append(chunk_id)
+            self.note_chunks[note_id] = ids
+
+    def remove_note(self, note_id: int):
+        with self.lock:
+            self._remove(note_id)
+
+    def _remove(self, note_id: int):
+        for chunk_id in self.note_chunks.pop(note_id, ()):
+            _, _, _, features = self.chunks.pop(chunk_id)
+            for feature in features:
+                posting = self.postings[feature]
+                del posting[chunk_id]
+                if not posting:
+                    del self.postings[feature]
+
+    def query(self, text: str, k: int):
+        vector = hash_features(text)
+        with self.lock:
+            total = max(len(self.chunks), 1)
+            scores = {}
+            for feature, query_weight in vector.items():
+                posting = self.postings.get(feature)
+                if not posting:
+                    continue
+                if len(posting) > MAX_DOCUMENT_FREQUENCY * total and total > 4:
+                    continue
+                idf = math.log(1 + total / len(posting)) if posting else 0.0
+                for chunk_id, weight in posting.items():
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + query_weight * weight * idf
+            best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+            return [(score, *self.chunks[chunk_id][:3]) for chunk_id, score in best]
+
+
+class RetrievalIndex:
+    # per-user indexes are built lazily from the database and kept current by the note write paths
+
+    def __init__(self, max_users: int):
+        self.max_users = max_users
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> UserIndex:
+        with self._lock:
+            index = self._users.get(user_id)
+            if index is not None:
+                self._users.move_to_end(user_id)
+                return index
+        index = self._build(user_id)
+        with self._lock:
+            self._users[user_id] = index
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        return index
+
+    def _build(self, user_id: int) -> UserIndex:
+        index = UserIndex()
+        with read_session() as db:
+            rows = (
+                join_bodies(db.query(NotesModel.id, NotesModel.title, *body_columns()))
+                .join(SubjectModel, NotesModel.subject_id == SubjectModel.id)
+                .filter(SubjectModel.user_id == user_id)
+                .yield_per(500)
+            )
+            for row in rows:
+                index.add_note(row.id, row.title, read_body(row))
+        return index
+
+    def loaded(self, user_id: int):
+        with self._lock:
+            return self._users.get(user_id)
+
+    def note_written(self, user_id: int, note_id: int, title: str, content: str):
+        index = self.loaded(user_id)
+        if index is not None:
+            index.add_note(note_id, title, content)
+
+    def note_deleted(self, user_id: int, note_id: int):
+        index = self.loaded(user_id)
+        if index is not None:
+            index.remove_note(note_id)
+
+    def forget_user(self, user_id: int):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+
+retrieval_index = RetrievalIndex(settings.RAG_MAX_USERS)
+
+
+def notes_changed(data: dict, local: bool):
+    # the writing process updates its index in place; other processes rebuild theirs on the next question
+    if not local and data.get("notes"):
+        retrieval_index.forget_user(data["user_id"])
+
+
+bus.subscribe(DATA_CHANGED, notes_changed)
+
+
+def build_context(user_id: int, question: str) -> str:
+    # top-k chunks, most relevant first, until the token budget is spent
+    if not settings.RAG_ENABLED:
+        return ""
+    parts, used = [], 0
+    for score, note_id, title, text in retrieval_index.get(user_id).query(question, settings.RAG_TOP_K):
+        block = f"### {title}\n{text}"
+        cost = estimate_tokens(block)
+        if used + cost > settings.RAG_CONTEXT_TOKENS:
+            break
+        parts.append(block)
+        used += cost
+    return "\n\n".join(parts)
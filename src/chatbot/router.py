@@ -1,47 +1,214 @@
-from fastapi import APIRouter, HTTPException, status
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.prompts import PromptTemplate
-from langchain_groq import ChatGroq
-from src.chatbot.dtos import ChatMessage, ChatResponse
+import asyncio
+import json
+from typing import Optional
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from src.chatbot import upstream
+from src.chatbot.cache import STUDENT_PLACEHOLDER, build_response_cache, cache_key, personalize, split_pending
+from src.chatbot.chains import NOTES_PROMPT, PROMPT_VERSION, message_text, notes_chain, summary_chain
+from src.chatbot.dtos import ChatBatchRequest, ChatHistory, ChatMessage, ChatResponse, ChatUsage
+from src.chatbot.retrieval import build_context
+from src.chatbot.sessions import ChatSession, session_store
+from src.chatbot.upstream import inflight, llm_coalesced
+from src.chatbot.usage import anonymous_client, client_address, reported_usage, usage_meter, user_client
+from src.metrics.instrumentation import span, timed
+from src.notes import bulk
+from src.notes.dtos import NotesSchema
+from src.metrics.registry import registry
+from src.subject.models import SubjectModel
+from src.users.auth import Principal, resolve_principal
+from src.utils.constents import NOTE_TITLE_LENGTH
+from src.utils.db import SessionLocal, get_read_db
+from src.utils.helpers import format_sse
 from src.utils.settings import settings
+from src.utils.tokens import estimate_tokens
 
 chat_router = APIRouter(prefix="/chatbot")
 
-llm = ChatGroq(model="llama-3.3-70b-versatile", api_key=settings.GROQ_API_KEY, temperature=0.7,max_tokens=500)
+response_cache = build_response_cache(PROMPT_VERSION)
+
+chat_prompt_tokens = registry.histogram(
+    "chat_prompt_tokens",
+    "Estimated prompt tokens sent to the LLM",
+    buckets=(128, 256, 512, 768, 1024, 1536, 2048, 4096, 8192),
+)
 
 
-prompt = """
-You are Smart Notes Assistant for students.
+def get_optional_user(request: Request, db: Session = Depends(get_read_db)) -> Optional[Principal]:
+    # the chatbot also answers anonymous visitors; only a signed-in user gets answers grounded in their notes
+    if not request.headers.get("Authorization"):
+        return None
+    return resolve_principal(request, db)
 
-Student name: {user_name}
-Requested question: {question}
 
-Your task:
-1. Start with a short greeting to the student using their name.
-2. Write clear, exam-oriented notes.
-3. Keep explanations step-by-step and practical.
-4. Include real-world examples.
-5. End with short Q&A revision points.
+def get_current_user(request: Request, db: Session = Depends(get_read_db)) -> Principal:
+    return resolve_principal(request, db)
 
-Formatting rules (strict):
-- Respond in Markdown.
-- Use headings: `#`, `##`, `###`
-- Use short paragraphs.
-- Use bullet points where useful.
-- Use **bold** only for important terms.
-- Keep language simple and concise.
-"""
 
-template = PromptTemplate(
-    input_variables=["question", "user_name"],
-    template=prompt,
-)
-parser = StrOutputParser()
-chain = template | llm | parser
+def usage_client(request: Request, current_user: Optional[Principal] = Depends(get_optional_user)) -> str:
+    # budgets follow the user in the token, never the free-text user_name of the body
+    if current_user is not None:
+        return user_client(current_user.id)
+    return anonymous_client(client_address(request))
+
+
+def enforce_budget(client: str = Depends(usage_client)) -> str:
+    usage_meter.check(client)
+    return client
+
+
+def retrieve_context(question: str, current_user: Optional[Principal]) -> str:
+    if current_user is None:
+        return ""
+    with span("retrieve_context"):
+        return build_context(current_user.id, question)
+
+
+def prompt_inputs(question: str, context: str, history: str) -> dict:
+    return {"question": question, "user_name": STUDENT_PLACEHOLDER, "context": context, "history": history}
+
+
+def prompt_tokens(inputs: dict) -> int:
+    return estimate_tokens(NOTES_PROMPT.format(**inputs))
+
+
+def cache_scope(context: str, history: str) -> str:
+    # everything besides the question that shapes the answer
+    return "\n\n".join(part for part in (context, history) if part)
+
+
+async def summarize(summary: str, transcript: str) -> str:
+    inputs = {"summary": summary, "transcript": transcript, "max_words": settings.CHAT_SUMMARY_TOKENS * 3 // 4}
+    return await upstream.call(lambda: summary_chain().ainvoke(inputs))
 
 
-def generate_notes(question: str, user_name: str) -> str:
-    return chain.invoke({"question": question, "user_name": user_name})
+async def fetch_notes(question: str, context: str, history: str = "", client: Optional[str] = None) -> str:
+    inputs = prompt_inputs(question, context, history)
+    tokens = prompt_tokens(inputs)
+    chat_prompt_tokens.observe(tokens)
+    message = await upstream.call(lambda: notes_chain().ainvoke(inputs))
+    response = message_text(message)
+    # only calls that reach the provider are charged; cache hits and coalesced waiters are free.
+    # The provider's own count when it reports one, the estimate otherwise
+    if client is not None:
+        usage_meter.record(client, *(reported_usage(message) or (tokens, estimate_tokens(response))))
+    await run_in_threadpool(response_cache.store, question, response, cache_scope(context, history))
+    return response
+
+
+@timed("generate_notes")
+async def generate_notes(
+    question: str, user_name: str, context: str = "", history: str = "", client: Optional[str] = None
+) -> str:
+    scope = cache_scope(context, history)
+    # the Redis backend and the semantic index do network I/O or embedding work, so off the event loop
+    response = await run_in_threadpool(response_cache.lookup, question, scope)
+    if response is None:
+        key = cache_key(question, PROMPT_VERSION, scope)
+        response = await inflight.do(key, lambda: fetch_notes(question, context, history, client))
+    return personalize(response, user_name)
+
+
+def find_session(session_id: Optional[str], current_user: Optional[Principal]) -> Optional[ChatSession]:
+    if session_id is None:
+        return None
+    return session_store.get(session_id, current_user.id if current_user else None)
+
+
+async def open_session(session_id: Optional[str], current_user: Optional[Principal]) -> Optional[ChatSession]:
+    # the Redis store makes a network round trip, so off the event loop
+    return await run_in_threadpool(find_session, session_id, current_user)
+
+
+async def record_turn(session: ChatSession, question: str, response: str, context: str, history: str):
+    tokens = prompt_tokens(prompt_inputs(question, context, history))
+    await run_in_threadpool(session_store.record, session, question, response, tokens)
+
+
+async def join_inflight(key: str):
+    shared = inflight.get(key)
+    if shared is None:
+        return None
+    llm_coalesced.inc(mode="stream")
+    try:
+        return await asyncio.shield(shared)
+    except Exception:
+        # the first caller failed or went away; make our own call
+        return None
+
+
+async def stream_notes(
+    question: str,
+    user_name: str,
+    request: Request,
+    context: str = "",
+    session: Optional[ChatSession] = None,
+    client: Optional[str] = None,
+):
+    history = session.history_text() if session else ""
+    scope = cache_scope(context, history)
+    key = cache_key(question, PROMPT_VERSION, scope)
+    cached = await run_in_threadpool(response_cache.lookup, question, scope)
+    if cached is None:
+        cached = await join_inflight(key)
+    if cached is not None:
+        response = personalize(cached, user_name)
+        if session:
+            await record_turn(session, question, response, context, history)
+        yield format_sse(response)
+        yield format_sse("", event="done")
+        if session:
+            await session_store.compact(session, summarize)
+        return
+
+    # identical requests arriving while this one streams wait for its full text
+    leader = inflight.lead(key) if inflight.get(key) is None else None
+    inputs = prompt_inputs(question, context, history)
+    tokens = prompt_tokens(inputs)
+    chat_prompt_tokens.observe(tokens)
+    stream = upstream.stream(lambda: notes_chain().astream(inputs))
+    chunks = []
+    usage = None
+    pending = ""
+    try:
+        async for message in stream:
+            if await request.is_disconnected():
+                break
+            # a provider reports the usage of a stream on its final chunk, which may carry no text
+            usage = reported_usage(message) or usage
+            chunk = message_text(message)
+            if not chunk:
+                continue
+            chunks.append(chunk)
+            ready, pending = split_pending(pending + chunk)
+            if ready:
+                yield format_sse(personalize(ready, user_name))
+        else:
+            if pending:
+                yield format_sse(personalize(pending, user_name))
+            response = "".join(chunks)
+            await run_in_threadpool(response_cache.store, question, response, scope)
+            if leader is not None:
+                leader.set_result(response)
+            if session:
+                await record_turn(session, question, personalize(response, user_name), context, history)
+            yield format_sse("", event="done")
+            if session:
+                await session_store.compact(session, summarize)
+    except HTTPException as exc:
+        yield format_sse(exc.detail, event="error")
+    except Exception as exc:
+        yield format_sse(f"Chatbot failed: {exc}", event="error")
+    finally:
+        if leader is not None and not leader.done():
+            leader.set_exception(RuntimeError("Stream ended before completion"))
+        # a stream the client left early was still generated up to that point
+        if client is not None and (chunks or usage):
+            usage_meter.record(client, *(usage or (tokens, estimate_tokens("".join(chunks)))))
+        await stream.aclose()
 
 
 @chat_router.post(
@@ -49,13 +216,184 @@ def generate_notes(question: str, user_name: str) -> str:
     response_model=ChatResponse,
     status_code=status.HTTP_200_OK,
 )
-def generate_chat_response(body: ChatMessage):
+async def generate_chat_response(
+    body: ChatMessage,
+    background_tasks: BackgroundTasks,
+    current_user: Optional[Principal] = Depends(get_optional_user),
+    client: str = Depends(enforce_budget),
+):
+    session = await open_session(body.session_id, current_user)
     try:
         user_name = body.user_name.strip() if body.user_name else "Student"
-        response = generate_notes(body.query, user_name)
-        return {"response": response}
+        context = await run_in_threadpool(retrieve_context, body.query, current_user)
+        history = session.history_text() if session else ""
+        response = await generate_notes(body.query, user_name, context, history, client)
+        if session:
+            await record_turn(session, body.query, response, context, history)
+            # summarising older turns can take an LLM call; do it after the response is sent
+            background_tasks.add_task(session_store.compact, session, summarize)
+        return {"response": response, "session_id": body.session_id}
+    except HTTPException:
+        raise
     except Exception as exc:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Chatbot failed: {exc}",
         )
+
+
+@chat_router.post("/generate/stream", status_code=status.HTTP_200_OK)
+async def generate_chat_stream(
+    body: ChatMessage,
+    request: Request,
+    current_user: Optional[Principal] = Depends(get_optional_user),
+    client: str = Depends(enforce_budget),
+):
+    session = await open_session(body.session_id, current_user)
+    user_name = body.user_name.strip() if body.user_name else "Student"
+    # the first lookup for a user builds their index from the database, so keep it off the event loop
+    context = await run_in_threadpool(retrieve_context, body.query, current_user)
+    return StreamingResponse(
+        stream_notes(body.query, user_name, request, context, session, client),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def generate_topic(index: int, topic: str, user_name: str, current_user: Optional[Principal], client: str, fan_out):
+    # returns (index, response, error) so one failed topic does not end the batch
+    async with fan_out:
+        try:
+            # checked per topic too: the budget can run out part way through a batch
+            await run_in_threadpool(usage_meter.check, client)
+            context = await run_in_threadpool(retrieve_context, topic, current_user)
+            return index, await generate_notes(topic, user_name, context, client=client), None
+        except HTTPException as exc:
+            return index, None, exc.detail
+        except Exception as exc:
+            return index, None, f"Chatbot failed: {exc}"
+
+
+def save_batch(results, subject_id: int, current_user: Principal):
+    batch = [
+        (index, NotesSchema(title=topic[:NOTE_TITLE_LENGTH], content=response, subject_id=subject_id))
+        for index, topic, response in sorted(results)
+    ]
+    with SessionLocal() as db:
+        return bulk.insert_batch(db, batch, current_user, bulk.ImportReport())
+
+
+async def stream_batch(
+    body: ChatBatchRequest, user_name: str, request: Request, current_user: Optional[Principal], client: str
+):
+    # topics run concurrently through the same cache, coalescing and limiter as /generate; the
+    # semaphore keeps one batch from filling the limiter's whole waiting queue
+    fan_out = asyncio.Semaphore(settings.CHAT_BATCH_CONCURRENCY)
+    tasks = [
+        asyncio.create_task(generate_topic(index, topic, user_name, current_user, client, fan_out))
+        for index, topic in enumerate(body.topics)
+    ]
+    results = []
+    failed = 0
+    try:
+        for finished in asyncio.as_completed(tasks):
+            index, response, error = await finished
+            event = {"index": index, "topic": body.topics[index]}
+            if error is None:
+                results.append((index, body.topics[index], response))
+                event["response"] = response
+            else:
+                failed += 1
+                event["error"] = error
+            yield format_sse(json.dumps(event), event="result")
+            if await request.is_disconnected():
+                return
+
+        if body.subject_id is not None and results:
+            try:
+                note_ids = await run_in_threadpool(save_batch, results, body.subject_id, current_user)
+            except Exception as exc:
+                yield format_sse(f"Saving notes failed: {exc}", event="error")
+                return
+            yield format_sse(json.dumps({"note_ids": note_ids}), event="saved")
+        yield format_sse(json.dumps({"completed": len(results), "failed": failed}), event="done")
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def check_subject(subject_id: int, db: Session, current_user: Principal):
+    subject = (
+        db.query(SubjectModel.id)
+        .filter(SubjectModel.id == subject_id, SubjectModel.user_id == current_user.id)
+        .first()
+    )
+    if not subject:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Subject not Found")
+
+
+@chat_router.post("/generate/batch", status_code=status.HTTP_200_OK)
+async def generate_chat_batch(
+    body: ChatBatchRequest,
+    request: Request,
+    db: Session = Depends(get_read_db),
+    current_user: Optional[Principal] = Depends(get_optional_user),
+    client: str = Depends(enforce_budget),
+):
+    topics = [topic.strip() for topic in body.topics if topic.strip()]
+    if not topics or len(topics) > settings.CHAT_BATCH_MAX_TOPICS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Send between 1 and {settings.CHAT_BATCH_MAX_TOPICS} topics",
+        )
+    if body.subject_id is not None:
+        if current_user is None:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Sign in to save notes")
+        await run_in_threadpool(check_subject, body.subject_id, db, current_user)
+    user_name = body.user_name.strip() if body.user_name else "Student"
+    return StreamingResponse(
+        stream_batch(body.model_copy(update={"topics": topics}), user_name, request, current_user, client),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@chat_router.get("/usage", response_model=ChatUsage, status_code=status.HTTP_200_OK)
+def get_usage(days: int = Query(7, ge=1, le=90), client: str = Depends(usage_client)):
+    # the caller's own budgets and daily totals: by user when signed in, otherwise by IP address
+    return usage_meter.report(client, days)
+
+
+@chat_router.get("/cache/stats", status_code=status.HTTP_200_OK, dependencies=[Depends(get_current_user)])
+def cache_stats():
+    return response_cache.stats()
+
+
+def session_view(session: ChatSession):
+    return {
+        "session_id": session.id,
+        "summary": session.summary,
+        "history": [{"role": role, "content": text} for role, text in session.turns],
+        "stats": session.stats(),
+    }
+
+
+@chat_router.post("/sessions", response_model=ChatHistory, status_code=status.HTTP_201_CREATED)
+def create_session(current_user: Optional[Principal] = Depends(get_optional_user)):
+    return session_view(session_store.create(current_user.id if current_user else None))
+
+
+@chat_router.get("/sessions/stats", status_code=status.HTTP_200_OK, dependencies=[Depends(get_current_user)])
+def session_stats():
+    return session_store.stats()
+
+
+@chat_router.get("/sessions/{session_id}", response_model=ChatHistory, status_code=status.HTTP_200_OK)
+def get_session(session_id: str, current_user: Optional[Principal] = Depends(get_optional_user)):
+    return session_view(find_session(session_id, current_user))
+
+
+@chat_router.delete("/sessions/{session_id}", response_model=None, status_code=status.HTTP_204_NO_CONTENT)
+def delete_session(session_id: str, current_user: Optional[Principal] = Depends(get_optional_user)):
+    session_store.delete(session_id, current_user.id if current_user else None)
+    return None
@@ -0,0 +1,203 @@
+import asyncio
+import json
+import re
+import uuid
+from typing import Optional
+
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+
+from src.utils import redis_client
+from src.utils.cache import TTLCache
+from src.utils.settings import settings
+from src.utils.tokens import CHARS_PER_TOKEN, estimate_tokens
+
+STUDENT = "Student"
+ASSISTANT = "Assistant"
+
+
+def clip(text: str, max_tokens: int) -> str:
+    limit = max_tokens * CHARS_PER_TOKEN
+    return text if len(text) <= limit else text[:limit].rstrip() + " …"
+
+
+class ChatSession:
+    # Turns are stored as (role, text) tuples, clipped to CHAT_TURN_TOKENS; older turns are folded
+    # into `summary` so neither the stored history nor the prompt grows with the conversation.
+
+    __slots__ = ("id", "user_id", "turns", "summary", "summarized_turns", "prompt_tokens", "last_prompt_tokens", "lock")
+
+    def __init__(self, id: str, user_id: Optional[int]):
+        self.id = id
+        self.user_id = user_id
+        self.turns = []
+        self.summary = ""
+        self.summarized_turns = 0
+        self.prompt_tokens = 0
+        self.last_prompt_tokens = 0
+        self.lock = asyncio.Lock()
+
+    def history_tokens(self) -> int:
+        return sum(estimate_tokens(text) for _, text in self.turns)
+
+    def history_text(self) -> str:
+        # newest turns first until the budget is spent, so an uncompacted session still yields a bounded prompt
+        lines, used = [], 0
+        for role, text in reversed(self.turns):
+            cost = estimate_tokens(text)
+            if used + cost > settings.CHAT_HISTORY_TOKENS:
+                break
+            lines.append(f"{role}: {text}")
+            used += cost
+        parts = []
+        if self.summary:
+            parts.append(f"Summary of earlier conversation: {self.summary}")
+        parts.extend(reversed(lines))
+        return "\n".join(parts)
+
+    def size(self) -> int:
+        return 200 + len(self.summary.encode()) + sum(len(text.encode()) + 64 for _, text in self.turns)
+
+    def stats(self) -> dict:
+        return {
+            "turns": len(self.turns),
+            "summarized_turns": self.summarized_turns,
+            "history_tokens": self.history_tokens(),
+            "summary_tokens": estimate_tokens(self.summary),
+            "bytes": self.size(),
+            "last_prompt_tokens": self.last_prompt_tokens,
+            "prompt_tokens_total": self.prompt_tokens,
+        }
+
+    def dumps(self) -> str:
+        return json.dumps(
+            {
+                "user_id": self.user_id,
+                "turns": self.turns,
+                "summary": self.summary,
+                "summarized_turns": self.summarized_turns,
+                "prompt_tokens": self.prompt_tokens,
+                "last_prompt_tokens": self.last_prompt_tokens,
+            }
+        )
+
+    @classmethod
+    def loads(cls, id: str, data) -> "ChatSession":
+        state = json.loads(data)
+        session = cls(id, state["user_id"])
+        session.turns = [tuple(turn) for turn in state["turns"]]
+        session.summary = state["summary"]
+        session.summarized_turns = state["summarized_turns"]
+        session.prompt_tokens = state["prompt_tokens"]
+        session.last_prompt_tokens = state["last_prompt_tokens"]
+        return session
+
+
+class SessionStore:
+    # Sessions live in this process, so with several workers a conversation must keep reaching the
+    # same one (sticky routing); RedisSessionStore shares them instead.
+
+    def __init__(self, max_entries: int, ttl: int, max_bytes: int):
+        self.cache = TTLCache(max_entries=max_entries, ttl=ttl, max_bytes=max_bytes, sizeof=lambda session: session.size())
+
+    def load(self, session_id: str) -> Optional[ChatSession]:
+        return self.cache.get(session_id)
+
+    def save(self, session: ChatSession):
+        # re-set so the store's byte accounting and expiry follow the session
+        self.cache.set(session.id, session)
+
+    def forget(self, session_id: str):
+        self.cache.invalidate(session_id)
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+    def create(self, user_id: Optional[int]) -> ChatSession:
+        session = ChatSession(uuid.uuid4().hex, user_id)
+        self.save(session)
+        return session
+
+    def get(self, session_id: str, user_id: Optional[int]) -> ChatSession:
+        session = self.load(session_id)
+        if session is None or session.user_id != user_id:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Chat session not Found")
+        return session
+
+    def delete(self, session_id: str, user_id: Optional[int]):
+        self.get(session_id, user_id)
+        self.forget(session_id)
+
+    def record(self, session: ChatSession, question: str, response: str, prompt_tokens: int):
+        session.turns.append((STUDENT, clip(question, settings.CHAT_TURN_TOKENS)))
+        session.turns.append((ASSISTANT, clip(response, settings.CHAT_TURN_TOKENS)))
+        session.prompt_tokens += prompt_tokens
+        session.last_prompt_tokens = prompt_tokens
+        self.save(session)
+
+    async def compact(self, session: ChatSession, summarize):
+        # once the turns exceed the budget, fold the oldest into the summary until half the budget is left
+        if session.history_tokens() <= settings.CHAT_HISTORY_TOKENS:
+            return
+        async with session.lock:
+            keep, used = [], 0
+            for role, text in reversed(session.turns):
+                cost = estimate_tokens(text)
+                if used + cost > settings.CHAT_HISTORY_TOKENS // 2:
+                    break
+                keep.append((role, text))
+                used += cost
+            keep.reverse()
+            older = session.turns[: len(session.turns) - len(keep)]
+            if not older:
+                return
+            transcript = "\n".join(f"{role}: {text}" for role, text in older)
+            try:
+                summary = await summarize(session.summary, transcript)
+            except Exception:
+                # without the model, keep the questions that were asked; better than losing them
+                asked = "; ".join(re.sub(r"\s+", " ", text)[:120] for role, text in older if role == STUDENT)
+                summary = f"{session.summary} Earlier the student asked about: {asked}.".strip()
+            session.summary = clip(summary.strip(), settings.CHAT_SUMMARY_TOKENS)
+            session.turns = session.turns[len(older):]
+            session.summarized_turns += len(older)
+            await run_in_threadpool(self.save, session)
+
+
+class RedisSessionStore(SessionStore):
+    # Shared between workers: every request reads the session and every turn writes it back whole,
+    # expiring CHAT_SESSION_TTL after its last turn. Two requests of one conversation running at
+    # once on different workers each append to what they read, and the last write wins.
+
+    def __init__(self, client, ttl: int, max_bytes: int, prefix: str = "chatsession:"):
+        self.client = client
+        self.ttl = ttl
+        # per session here; the total is left to the server's maxmemory-policy
+        self.max_bytes = max_bytes
+        self.prefix = prefix
+
+    def load(self, session_id: str) -> Optional[ChatSession]:
+        data = self.client.get(self.prefix + session_id)
+        return ChatSession.loads(session_id, data) if data is not None else None
+
+    def save(self, session: ChatSession):
+        data = session.dumps().encode()
+        if len(data) <= self.max_bytes:
+            self.client.set(self.prefix + session.id, data, ex=self.ttl)
+
+    def forget(self, session_id: str):
+        self.client.delete(self.prefix + session_id)
+
+    def stats(self) -> dict:
+        return {"backend": "redis"}
+
+
+def build_session_store() -> SessionStore:
+    if settings.CHAT_SESSION_BACKEND == "redis":
+        if not settings.CHAT_SESSION_REDIS_URL:
+            raise RuntimeError("CHAT_SESSION_BACKEND=redis needs CHAT_SESSION_REDIS_URL")
+        return RedisSessionStore(redis_client.connect(settings.CHAT_SESSION_REDIS_URL), settings.CHAT_SESSION_TTL, settings.CHAT_SESSION_MAX_BYTES)
+    return SessionStore(settings.CHAT_SESSION_MAX_ENTRIES, settings.CHAT_SESSION_TTL, settings.CHAT_SESSION_MAX_BYTES)
+
+
+session_store = build_session_store()
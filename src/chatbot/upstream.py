@@ -0,0 +1,200 @@
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException, status
+
+from src.metrics.registry import registry
+from src.utils.settings import settings
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+llm_queue_wait = registry.histogram("llm_queue_wait_seconds", "Time a request waited for an upstream LLM slot")
+llm_coalesced = registry.counter("llm_coalesced_requests_total", "Requests served by an identical in-flight LLM call")
+llm_retries = registry.counter("llm_retries_total", "Upstream LLM calls retried after a transient error")
+llm_shed = registry.counter("llm_shed_total", "Requests rejected with 503 instead of waiting for an LLM slot")
+
+
+class SingleFlight:
+    # Identical in-flight requests share one upstream call. Everything runs on the event loop,
+    # so the dict needs no lock.
+
+    def __init__(self):
+        self._calls = {}
+
+    def get(self, key: str):
+        return self._calls.get(key)
+
+    def _register(self, key: str, future):
+        self._calls[key] = future
+
+        def done(finished):
+            if self._calls.get(key) is finished:
+                del self._calls[key]
+            # mark the exception retrieved even when every waiter has gone away
+            if not finished.cancelled():
+                finished.exception()
+
+        future.add_done_callback(done)
+        return future
+
+    async def do(self, key: str, fn):
+        task = self._calls.get(key)
+        if task is None:
+            # a task of its own, so a disconnecting first caller does not cancel it for the others
+            task = self._register(key, asyncio.ensure_future(fn()))
+        else:
+            llm_coalesced.inc(mode="generate")
+        return await asyncio.shield(task)
+
+    def lead(self, key: str):
+        # for streaming callers, who resolve the future themselves once the full text is known
+        return self._register(key, asyncio.get_running_loop().create_future())
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    async def take(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class UpstreamLimiter:
+    # caps concurrent provider calls and their start rate; waiters beyond max_waiting, or waiting
+    # longer than queue_timeout, get a 503 with Retry-After instead of piling up
+
+    def __init__(self, max_concurrency: int, rate: float, burst: int, max_waiting: int, queue_timeout: float):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.bucket = TokenBucket(rate, burst) if rate > 0 else None
+        self.max_waiting = max_waiting
+        self.queue_timeout = queue_timeout
+        self.waiting = 0
+        self.active = 0
+
+    def shed(self, reason: str):
+        llm_shed.inc(reason=reason)
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Chatbot is busy, please retry",
+            headers={"Retry-After": str(settings.LLM_RETRY_AFTER)},
+        )
+
+    async def _acquire(self):
+        await self.semaphore.acquire()
+        if self.bucket is not None:
+            try:
+                await self.bucket.take()
+            except BaseException:
+                self.semaphore.release()
+                raise
+
+    @asynccontextmanager
+    async def slot(self):
+        if self.waiting >= self.max_waiting:
+            raise self.shed("queue_full")
+        self.waiting += 1
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise self.shed("queue_timeout")
+        finally:
+            self.waiting -= 1
+            llm_queue_wait.observe(time.perf_counter() - start)
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self.semaphore.release()
+
+
+limiter = UpstreamLimiter(
+    settings.LLM_MAX_CONCURRENCY,
+    settings.LLM_RATE_LIMIT,
+    settings.LLM_BURST,
+    settings.LLM_MAX_WAITING,
+    settings.LLM_QUEUE_TIMEOUT,
+)
+inflight = SingleFlight()
+
+
+@registry.collector
+def collect_limiter():
+    return [
+        ("llm_inflight", "gauge", "Upstream LLM calls in progress", [({}, limiter.active)]),
+        ("llm_waiting", "gauge", "Requests queued for an upstream LLM slot", [({}, limiter.waiting)]),
+    ]
+
+
+def is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, HTTPException):
+        return False
+    if isinstance(exc, (ConnectionError, TimeoutError, asyncio.TimeoutError)):
+        return True
+    # provider SDK errors (groq, openai, httpx) carry the HTTP status or are connection errors by name
+    if getattr(exc, "status_code", None) in RETRYABLE_STATUS:
+        return True
+    return type(exc).__name__ in {"APIConnectionError", "APITimeoutError", "ConnectError", "ReadTimeout"}
+
+
+def retry_delay(exc: Exception, attempt: int) -> float:
+    response = getattr(exc, "response", None)
+    retry_after = getattr(response, "headers", {}).get("retry-after") if response is not None else None
+    try:
+        if retry_after is not None:
+            return min(float(retry_after), settings.LLM_RETRY_MAX)
+    except ValueError:
+        pass
+    # full jitter, so clients that failed together do not come back together
+    return random.uniform(0, min(settings.LLM_RETRY_MAX, settings.LLM_RETRY_BASE * 2 ** attempt))
+
+
+async def call(fn):
+    attempt = 0
+    while True:
+        try:
+            async with limiter.slot():
+                return await fn()
+        except Exception as exc:
+            if attempt >= settings.LLM_MAX_RETRIES or not is_retryable(exc):
+                raise
+            llm_retries.inc(error=type(exc).__name__)
+            await asyncio.sleep(retry_delay(exc, attempt))
+            attempt += 1
+
+
+async def stream(make_stream):
+    # holds one slot for the whole stream; only retried while nothing has been sent to the client
+    attempt = 0
+    while True:
+        started = False
+        try:
+            async with limiter.slot():
+                upstream = make_stream()
+                try:
+                    async for chunk in upstream:
+                        started = True
+                        yield chunk
+                finally:
+                    # closing the generator tears down the upstream HTTP stream to the LLM provider
+                    await upstream.aclose()
+            return
+        except Exception as exc:
+            if started or attempt >= settings.LLM_MAX_RETRIES or not is_retryable(exc):
+                raise
+            llm_retries.inc(error=type(exc).__name__)
+            await asyncio.sleep(retry_delay(exc, attempt))
+            attempt += 1
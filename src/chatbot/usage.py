@@ -0,0 +1,287 @@
+import asyncio
+import ipaddress
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Optional
+
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select, update
+
+from src.chatbot.models import ChatUsageModel
+from src.metrics.registry import registry
+from src.utils.cache import TTLCache
+from src.utils.db import SessionLocal
+from src.utils.settings import settings
+
+logger = logging.getLogger("smartnotes.usage")
+
+chat_tokens = registry.counter("chat_tokens_total", "LLM tokens spent on chatbot answers, by kind")
+chat_quota_rejected = registry.counter("chat_quota_rejected_total", "Chatbot requests rejected by a per-client token budget")
+
+MINUTE = 60
+HOUR = 3600
+DAY = 86400
+
+
+def user_client(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+def anonymous_client(address: Optional[str]) -> str:
+    return f"ip:{address or 'unknown'}"
+
+
+@lru_cache(maxsize=8)
+def trusted_networks(spec: str):
+    return [ipaddress.ip_network(item.strip(), strict=False) for item in spec.split(",") if item.strip()]
+
+
+def is_trusted(address: str, networks) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in networks)
+
+
+def client_address(request) -> Optional[str]:
+    # X-Forwarded-For is believed only from CHAT_TRUSTED_PROXIES, otherwise any caller could pick its
+    # own budget key; the caller is the rightmost hop that is not one of those proxies
+    address = request.client.host if request.client else None
+    networks = trusted_networks(settings.CHAT_TRUSTED_PROXIES)
+    if address is None or not is_trusted(address, networks):
+        return address
+    hops = [hop.strip() for header in request.headers.getlist("x-forwarded-for") for hop in header.split(",")]
+    for hop in reversed(hops):
+        if hop and not is_trusted(hop, networks):
+            return hop
+    return address
+
+
+def reported_usage(message) -> Optional[tuple]:
+    # (prompt, completion) tokens when the provider reported them on the message, LangChain's usage_metadata
+    usage = getattr(message, "usage_metadata", None)
+    if not usage:
+        return None
+    return usage["input_tokens"], usage["output_tokens"]
+
+
+def client_user_id(client: str) -> Optional[int]:
+    return int(client.split(":", 1)[1]) if client.startswith("user:") else None
+
+
+def window_limits(client: str):
+    # (window seconds, token budget); a budget of 0 turns that window off
+    if client_user_id(client) is not None:
+        limits = ((HOUR, settings.CHAT_TOKENS_PER_HOUR), (DAY, settings.CHAT_TOKENS_PER_DAY))
+    else:
+        limits = ((HOUR, settings.CHAT_ANON_TOKENS_PER_HOUR), (DAY, settings.CHAT_ANON_TOKENS_PER_DAY))
+    return [(seconds, limit) for seconds, limit in limits if limit > 0]
+
+
+class UsageMeter:
+    # Tokens are counted in memory per client and minute: `windows` holds the last day of minutes for
+    # the sliding-window budgets, `pending` the counts not yet written. A background task adds
+    # `pending` to ChatUsage every CHAT_USAGE_FLUSH_INTERVAL seconds, one upsert per (client, minute).
+    # ChatUsage is the shared total: a client's window is re-read from it (plus this process's unflushed
+    # counts) at most every `refresh` seconds, so with several processes each one sees what the others
+    # flushed, and a budget is only overrun by what they spent in the last refresh + flush interval.
+
+    def __init__(self, max_clients: int, flush_interval: float, refresh: float):
+        self.windows = TTLCache(max_entries=max_clients, ttl=refresh)
+        self.pending = {}
+        # taken out of `pending` but not committed yet; still counted by _load
+        self.flushing = {}
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._task = None
+
+    def _load(self, client: str) -> dict:
+        since = int(time.time() // MINUTE) - DAY // MINUTE
+        minutes = {}
+        with SessionLocal() as db:
+            rows = db.execute(
+                select(ChatUsageModel.period_start, ChatUsageModel.prompt_tokens + ChatUsageModel.completion_tokens).where(
+                    ChatUsageModel.client == client,
+                    ChatUsageModel.period_start >= datetime.fromtimestamp(since * MINUTE),
+                )
+            ).all()
+        for period_start, tokens in rows:
+            minute = int(period_start.timestamp() // MINUTE)
+            minutes[minute] = minutes.get(minute, 0) + tokens
+        with self._lock:
+            for pending in (self.pending, self.flushing):
+                for (pending_client, minute), counts in pending.items():
+                    if pending_client == client:
+                        minutes[minute] = minutes.get(minute, 0) + counts[1] + counts[2]
+        return minutes
+
+    def _minutes(self, client: str) -> dict:
+        minutes = self.windows.get(client)
+        if minutes is None:
+            minutes = self._load(client)
+            self.windows.set(client, minutes)
+        return minutes
+
+    def spent(self, minutes: dict, now: float, seconds: int) -> int:
+        first = int(now // MINUTE) - seconds // MINUTE
+        return sum(tokens for minute, tokens in list(minutes.items()) if minute > first)
+
+    def retry_after(self, minutes: dict, now: float, seconds: int, limit: int) -> int:
+        # seconds until enough of the oldest minutes leave the window to get back under the budget
+        spent = self.spent(minutes, now, seconds)
+        first = int(now // MINUTE) - seconds // MINUTE
+        for minute in sorted(minute for minute in list(minutes) if minute > first):
+            spent -= minutes[minute]
+            if spent < limit:
+                return max(int((minute + 1) * MINUTE + seconds - now), 1)
+        return MINUTE
+
+    def check(self, client: str):
+        # may read ChatUsage, so call it off the event loop
+        limits = window_limits(client)
+        if not limits:
+            return
+        now = time.time()
+        minutes = self._minutes(client)
+        for seconds, limit in limits:
+            if self.spent(minutes, now, seconds) >= limit:
+                chat_quota_rejected.inc(window=str(seconds))
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Chatbot token budget used up, please retry later",
+                    headers={"Retry-After": str(self.retry_after(minutes, now, seconds, limit))},
+                )
+
+    def record(self, client: str, prompt_tokens: int, completion_tokens: int):
+        minute = int(time.time() // MINUTE)
+        with self._lock:
+            minutes = self.windows.get(client)
+            if minutes is not None:
+                minutes[minute] = minutes.get(minute, 0) + prompt_tokens + completion_tokens
+                for old in [old for old in minutes if old <= minute - DAY // MINUTE]:
+                    del minutes[old]
+            counts = self.pending.setdefault((client, minute), [0, 0, 0])
+            counts[0] += 1
+            counts[1] += prompt_tokens
+            counts[2] += completion_tokens
+        chat_tokens.inc(prompt_tokens, kind="prompt")
+        chat_tokens.inc(completion_tokens, kind="completion")
+
+    def flush(self) -> int:
+        with self._lock:
+            pending, self.pending = self.pending, {}
+            self.flushing = pending
+        if not pending:
+            return 0
+        rows = [
+            {
+                "client": client,
+                "user_id": client_user_id(client),
+                "period_start": datetime.fromtimestamp(minute * MINUTE),
+                "requests": counts[0],
+                "prompt_tokens": counts[1],
+                "completion_tokens": counts[2],
+            }
+            for (client, minute), counts in pending.items()
+        ]
+        try:
+            with SessionLocal() as db:
+                upsert_usage(db, rows)
+                db.commit()
+        except Exception:
+            # keep the counts for the next flush
+            with self._lock:
+                self.flushing = {}
+                for key, counts in pending.items():
+                    merged = self.pending.setdefault(key, [0, 0, 0])
+                    for index, value in enumerate(counts):
+                        merged[index] += value
+            raise
+        with self._lock:
+            self.flushing = {}
+        return len(rows)
+
+    def start(self):
+        self._task = asyncio.create_task(self.loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await run_in_threadpool(self.flush)
+
+    async def loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await run_in_threadpool(self.flush)
+            except Exception:
+                logger.exception("flushing chatbot usage failed")
+
+    def report(self, client: str, days: int) -> dict:
+        self.flush()
+        now = time.time()
+        minutes = self._minutes(client)
+        windows = []
+        for seconds, limit in window_limits(client):
+            used = self.spent(minutes, now, seconds)
+            windows.append(
+                {
+                    "seconds": seconds,
+                    "limit": limit,
+                    "used": used,
+                    "remaining": max(limit - used, 0),
+                    "retry_after": self.retry_after(minutes, now, seconds, limit) if used >= limit else 0,
+                }
+            )
+        since = datetime.combine(datetime.now().date() - timedelta(days=days - 1), datetime.min.time())
+        day = func.date(ChatUsageModel.period_start)
+        with SessionLocal() as db:
+            rows = db.execute(
+                select(
+                    day.label("day"),
+                    func.sum(ChatUsageModel.requests).label("requests"),
+                    func.sum(ChatUsageModel.prompt_tokens).label("prompt_tokens"),
+                    func.sum(ChatUsageModel.completion_tokens).label("completion_tokens"),
+                )
+                .where(ChatUsageModel.client == client, ChatUsageModel.period_start >= since)
+                .group_by(day)
+                .order_by(day)
+            ).all()
+        return {"windows": windows, "days": [dict(row._mapping) for row in rows]}
+
+
+def upsert_usage(db, rows):
+    table = ChatUsageModel.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        statement = insert(table)
+        db.execute(
+            statement.on_conflict_do_update(
+                index_elements=["client", "period_start"],
+                set_={name: table.c[name] + statement.excluded[name] for name in ("requests", "prompt_tokens", "completion_tokens")},
+            ),
+            rows,
+        )
+        return
+    for row in rows:
+        result = db.execute(
+            update(table)
+            .where(table.c.client == row["client"], table.c.period_start == row["period_start"])
+            .values({name: table.c[name] + row[name] for name in ("requests", "prompt_tokens", "completion_tokens")})
+        )
+        if not result.rowcount:
+            db.execute(table.insert(), row)
+
+
+usage_meter = UsageMeter(settings.CHAT_USAGE_MAX_CLIENTS, settings.CHAT_USAGE_FLUSH_INTERVAL, settings.CHAT_USAGE_REFRESH)
@@ -0,0 +1,67 @@
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from src.notes.models import NotesModel
+from src.subject.models import SubjectModel
+from src.users.auth import Principal
+from src.utils.bus import DATA_CHANGED, bus
+from src.utils.cache import TTLCache
+from src.utils.etags import current_version
+from src.utils.settings import settings
+
+# (user_id, recent, data version) -> summary dict. A write bumps the version, so later reads miss
+# even when the invalidation below never reaches this process; dropping the user's entries on
+# DATA_CHANGED only frees the memory early.
+summary_cache = TTLCache(max_entries=settings.DASHBOARD_CACHE_MAX_ENTRIES, ttl=settings.DASHBOARD_CACHE_TTL)
+
+
+def invalidate_summary(user_id: int):
+    summary_cache.invalidate_group(user_id)
+
+
+bus.subscribe(DATA_CHANGED, lambda data, local: invalidate_summary(data["user_id"]))
+
+
+def get_summary(recent: int, db: Session, current_user: Principal):
+    # read the version before the aggregates: a write landing in between then only makes the stored
+    # summary newer than its key, never older (this also holds on a lagging replica)
+    key = (current_user.id, recent, current_version(db, current_user.id))
+    summary = summary_cache.get(key)
+    if summary is not None:
+        return summary
+
+    per_subject = (
+        db.query(
+            SubjectModel.id,
+            SubjectModel.title,
+            func.count(NotesModel.id).label("note_count"),
+            func.coalesce(func.sum(NotesModel.content_length), 0).label("content_length"),
+            func.max(NotesModel.create_at).label("last_note_at"),
+        )
+        .outerjoin(NotesModel, NotesModel.subject_id == SubjectModel.id)
+        .filter(SubjectModel.user_id == current_user.id)
+        .group_by(SubjectModel.id, SubjectModel.title)
+        .order_by(SubjectModel.id)
+        .all()
+    )
+    recent_notes = (
+        db.query(NotesModel.id, NotesModel.title, NotesModel.subject_id, NotesModel.create_at)
+        .join(SubjectModel, NotesModel.subject_id == SubjectModel.id)
+        .filter(SubjectModel.user_id == current_user.id)
+        .order_by(NotesModel.create_at.desc(), NotesModel.id.desc())
+        .limit(recent)
+        .all()
+    )
+
+    subjects = [dict(row._mapping) for row in per_subject]
+    summary = {
+        "subjects": subjects,
+        "recent_notes": [dict(row._mapping) for row in recent_notes],
+        "totals": {
+            "subjects": len(subjects),
+            "notes": sum(subject["note_count"] for subject in subjects),
+            "content_length": sum(subject["content_length"] for subject in subjects),
+        },
+    }
+    summary_cache.set(key, summary, group=current_user.id)
+    return summary
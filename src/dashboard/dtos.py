@@ -0,0 +1,30 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List, Optional
+
+
+class SubjectSummary(BaseModel):
+    id: int
+    title: str
+    note_count: int
+    content_length: int
+    last_note_at: Optional[datetime] = None
+
+
+class RecentNote(BaseModel):
+    id: int
+    title: str
+    subject_id: int
+    create_at: datetime
+
+
+class DashboardTotals(BaseModel):
+    subjects: int
+    notes: int
+    content_length: int
+
+
+class DashboardSummary(BaseModel):
+    subjects: List[SubjectSummary]
+    recent_notes: List[RecentNote]
+    totals: DashboardTotals
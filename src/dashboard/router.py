@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends, Query, status
+from sqlalchemy.orm import Session
+
+from src.dashboard import controller
+from src.dashboard.dtos import DashboardSummary
+from src.notes.router import get_current_user
+from src.users.auth import Principal
+from src.utils.constents import DASHBOARD_MAX_RECENT_NOTES, DASHBOARD_RECENT_NOTES
+from src.utils.db import get_read_db
+
+
+dashboard_routes = APIRouter(prefix="/dashboard")
+
+
+@dashboard_routes.get("/summary", response_model=DashboardSummary, status_code=status.HTTP_200_OK)
+def get_summary(
+    recent: int = Query(DASHBOARD_RECENT_NOTES, ge=0, le=DASHBOARD_MAX_RECENT_NOTES),
+    db: Session = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    return controller.get_summary(recent, db, current_user)
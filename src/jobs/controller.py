@@ -0,0 +1,83 @@
+import asyncio
+import json
+
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+
+from src.chatbot.router import generate_notes, retrieve_context
+from src.chatbot.usage import usage_meter, user_client
+from src.jobs.dtos import JobCreate
+from src.jobs.models import CANCELLED, DONE, FAILED
+from src.jobs.queue import job_queue
+from src.notes import controller as notes_controller
+from src.notes.dtos import NotesSchema
+from src.subject.models import SubjectModel
+from src.users.auth import Principal
+from src.users.models import UserModel
+from src.utils.constents import NOTE_TITLE_LENGTH
+from src.utils.db import SessionLocal
+from src.utils.helpers import format_sse
+
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+def enqueue_job(body: JobCreate, db, current_user: Principal):
+    if body.subject_id is not None:
+        subject = (
+            db.query(SubjectModel)
+            .filter(SubjectModel.id == body.subject_id, SubjectModel.user_id == current_user.id)
+            .first()
+        )
+        if not subject:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Subject not Found")
+    # the job is charged to this user when it runs; refuse it now rather than fail it later
+    usage_meter.check(user_client(current_user.id))
+    payload = body.model_dump(exclude={"priority"})
+    return job_queue.enqueue(current_user.id, payload, body.priority)
+
+
+def load_principal(user_id: int) -> Principal:
+    with SessionLocal() as db:
+        user = db.get(UserModel, user_id)
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return Principal(id=user.id, name=user.name, username=user.username, email=user.email)
+
+
+def save_note(payload: dict, response: str, current_user: Principal) -> int:
+    body = NotesSchema(
+        title=payload.get("title") or payload["query"][:NOTE_TITLE_LENGTH],
+        content=response,
+        subject_id=payload["subject_id"],
+    )
+    with SessionLocal() as db:
+        return notes_controller.create_note(body, db, current_user).id
+
+
+async def run_job(job, owner: str):
+    # returns (response, note_id); goes through the same cache, coalescing and limiter as /chatbot/generate
+    payload = json.loads(job.payload)
+    current_user = await run_in_threadpool(load_principal, job.user_id)
+    context = await run_in_threadpool(retrieve_context, payload["query"], current_user)
+    user_name = (payload.get("user_name") or current_user.name or "Student").strip()
+    response = await generate_notes(payload["query"], user_name, context, client=user_client(current_user.id))
+    note_id = None
+    # a job cancelled while the answer was generated must not leave a note behind
+    if payload.get("subject_id") is not None and await run_in_threadpool(job_queue.holds, job.id, owner):
+        note_id = await run_in_threadpool(save_note, payload, response, current_user)
+    return response, note_id
+
+
+async def job_events(job_id: str, current_user: Principal, poll_interval: float):
+    last = None
+    while True:
+        job = await run_in_threadpool(job_queue.get, job_id, current_user.id)
+        if job.status != last:
+            last = job.status
+            data = {"id": job.id, "status": job.status, "attempts": job.attempts}
+            if job.status in FINISHED:
+                data.update(result=job.result, error=job.error, note_id=job.note_id)
+            yield format_sse(json.dumps(data), event=job.status)
+        if job.status in FINISHED:
+            return
+        await asyncio.sleep(poll_interval)
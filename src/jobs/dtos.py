@@ -0,0 +1,28 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import List, Optional
+
+
+class JobCreate(BaseModel):
+    query: str
+    user_name: Optional[str] = None
+    priority: int = Field(0, ge=0, le=9)
+    # when set, the generated answer is saved as a note in this subject
+    subject_id: Optional[int] = None
+    title: Optional[str] = None
+
+
+class JobResponse(BaseModel):
+    id: str
+    status: str
+    priority: int
+    attempts: int
+    result: Optional[str] = None
+    error: Optional[str] = None
+    note_id: Optional[int] = None
+    create_at: datetime
+    update_at: datetime
+
+
+class JobList(BaseModel):
+    items: List[JobResponse]
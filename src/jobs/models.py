@@ -0,0 +1,35 @@
+from sqlalchemy import Column,Integer,String,DateTime,Text,Index
+from sqlalchemy.orm import declarative_base
+from datetime import datetime
+
+# the queue can live in its own database (JOBS_DATABASE_URL), so it has its own metadata
+JobsBase=declarative_base()
+
+QUEUED="queued"
+RUNNING="running"
+DONE="done"
+FAILED="failed"
+CANCELLED="cancelled"
+
+class JobModel(JobsBase):
+    __tablename__="Jobs"
+
+    id=Column(String(32),primary_key=True)
+    user_id=Column(Integer,nullable=False,index=True)
+    status=Column(String,nullable=False,default=QUEUED)
+    priority=Column(Integer,nullable=False,default=0)
+    payload=Column(Text,nullable=False)
+    result=Column(Text)
+    error=Column(Text)
+    note_id=Column(Integer)
+    attempts=Column(Integer,nullable=False,default=0)
+    available_at=Column(DateTime,nullable=False,default=datetime.now)
+    lease_owner=Column(String)
+    lease_until=Column(DateTime)
+    create_at=Column(DateTime,default=datetime.now)
+    update_at=Column(DateTime,default=datetime.now)
+
+    # claim() scans runnable jobs highest priority first, oldest first
+    __table_args__=(
+        Index("ix_jobs_status_priority","status","priority","create_at"),
+    )
@@ -0,0 +1,204 @@
+import json
+import uuid
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, event, func, or_, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker
+
+from src.jobs.models import CANCELLED, DONE, FAILED, QUEUED, RUNNING, JobModel, JobsBase
+from src.utils.db import PoolStats, build_engine
+from src.utils.settings import settings
+
+# how many runnable candidates one claim() tries before giving up to a competing worker
+CLAIM_CANDIDATES = 8
+# first key of the Postgres advisory locks that serialize claims for one user
+CLAIM_LOCK_NAMESPACE = 0x6A6F6273
+
+
+class JobQueue:
+    # At-least-once delivery: a claimed job is leased to one worker; if that worker dies the lease
+    # runs out and the job becomes claimable again. Every state change after the claim is a
+    # compare-and-set on (status, lease_owner), so a worker that lost its lease cannot overwrite
+    # the job. The per-user cap is checked again by the claiming UPDATE itself, so it holds across
+    # workers and processes: SQLite runs one writer at a time, and on Postgres claimers for the same
+    # user queue on an advisory lock, so each UPDATE sees the claims committed before it.
+
+    def __init__(self, url: str):
+        self.engine = build_engine(url, PoolStats())
+        if make_url(url).get_backend_name() == "sqlite":
+            event.listen(self.engine, "connect", self._sqlite_pragmas)
+        self.Session = sessionmaker(bind=self.engine, expire_on_commit=False)
+
+    @staticmethod
+    def _sqlite_pragmas(dbapi_connection, connection_record):
+        # WAL lets the API read job status while a worker is writing
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA busy_timeout=5000")
+        cursor.close()
+
+    def setup(self):
+        JobsBase.metadata.create_all(self.engine)
+
+    def enqueue(self, user_id: int, payload: dict, priority: int = 0) -> JobModel:
+        with self.Session() as db:
+            queued = (
+                db.query(func.count(JobModel.id))
+                .filter(JobModel.user_id == user_id, JobModel.status.in_((QUEUED, RUNNING)))
+                .scalar()
+            )
+            if queued >= settings.JOBS_MAX_QUEUED_PER_USER:
+                raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too many pending jobs")
+            job = JobModel(id=uuid.uuid4().hex, user_id=user_id, priority=priority, payload=json.dumps(payload))
+            db.add(job)
+            db.commit()
+            return job
+
+    def get(self, job_id: str, user_id: int) -> JobModel:
+        with self.Session() as db:
+            job = db.query(JobModel).filter(JobModel.id == job_id, JobModel.user_id == user_id).first()
+        if not job:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not Found")
+        return job
+
+    def list_jobs(self, user_id: int, limit: int):
+        with self.Session() as db:
+            return (
+                db.query(JobModel)
+                .filter(JobModel.user_id == user_id)
+                .order_by(JobModel.create_at.desc())
+                .limit(limit)
+                .all()
+            )
+
+    def cancel(self, job_id: str, user_id: int) -> JobModel:
+        job = self.get(job_id, user_id)
+        with self.Session() as db:
+            updated = (
+                db.query(JobModel)
+                .filter(JobModel.id == job_id, JobModel.status.in_((QUEUED, RUNNING)))
+                .update({"status": CANCELLED, "lease_owner": None, "update_at": datetime.now()}, synchronize_session=False)
+            )
+            db.commit()
+        if not updated:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Job already {job.status}")
+        return self.get(job_id, user_id)
+
+    def runnable(self, now: datetime):
+        return or_(
+            and_(JobModel.status == QUEUED, JobModel.available_at <= now),
+            and_(JobModel.status == RUNNING, JobModel.lease_until < now),
+        )
+
+    def running(self, now: datetime, user_id):
+        return (
+            select(func.count())
+            .select_from(JobModel)
+            .where(JobModel.user_id == user_id, JobModel.status == RUNNING, JobModel.lease_until >= now)
+            .scalar_subquery()
+        )
+
+    def claim(self, owner: str):
+        now = datetime.now()
+        busy_users = (
+            select(JobModel.user_id)
+            .where(JobModel.status == RUNNING, JobModel.lease_until >= now)
+            .group_by(JobModel.user_id)
+            .having(func.count() >= settings.JOBS_USER_CONCURRENCY)
+        )
+        with self.Session() as db:
+            # only a first cut: another worker may claim for the same users before our UPDATEs run
+            candidates = (
+                db.query(JobModel.id, JobModel.user_id)
+                .filter(self.runnable(now), JobModel.user_id.not_in(busy_users))
+                .order_by(JobModel.priority.desc(), JobModel.create_at)
+                .limit(CLAIM_CANDIDATES)
+                .all()
+            )
+            # end the read, so each UPDATE below starts from the latest committed claims
+            db.commit()
+            for candidate in candidates:
+                if self.engine.dialect.name == "postgresql":
+                    db.execute(select(func.pg_advisory_xact_lock(CLAIM_LOCK_NAMESPACE, candidate.user_id)))
+                claimed = (
+                    db.query(JobModel)
+                    .filter(
+                        JobModel.id == candidate.id,
+                        self.runnable(now),
+                        self.running(now, candidate.user_id) < settings.JOBS_USER_CONCURRENCY,
+                    )
+                    .update(
+                        {
+                            "status": RUNNING,
+                            "lease_owner": owner,
+                            "lease_until": now + timedelta(seconds=settings.JOBS_LEASE_SECONDS),
+                            "attempts": JobModel.attempts + 1,
+                            "update_at": now,
+                        },
+                        synchronize_session=False,
+                    )
+                )
+                db.commit()
+                if claimed:
+                    return db.get(JobModel, candidate.id, populate_existing=True)
+        return None
+
+    def _leased(self, db, job_id: str, owner: str):
+        return db.query(JobModel).filter(
+            JobModel.id == job_id, JobModel.status == RUNNING, JobModel.lease_owner == owner
+        )
+
+    def holds(self, job_id: str, owner: str) -> bool:
+        # False once the job was cancelled or its lease passed to another worker
+        with self.Session() as db:
+            return db.query(self._leased(db, job_id, owner).exists()).scalar()
+
+    def extend(self, job_id: str, owner: str) -> bool:
+        with self.Session() as db:
+            updated = self._leased(db, job_id, owner).update(
+                {"lease_until": datetime.now() + timedelta(seconds=settings.JOBS_LEASE_SECONDS)},
+                synchronize_session=False,
+            )
+            db.commit()
+        return bool(updated)
+
+    def complete(self, job_id: str, owner: str, result: str, note_id=None) -> bool:
+        with self.Session() as db:
+            updated = self._leased(db, job_id, owner).update(
+                {"status": DONE, "result": result, "note_id": note_id, "lease_owner": None, "update_at": datetime.now()},
+                synchronize_session=False,
+            )
+            db.commit()
+        return bool(updated)
+
+    def fail(self, job_id: str, owner: str, error: str, retry: bool) -> bool:
+        with self.Session() as db:
+            job = self._leased(db, job_id, owner).first()
+            if job is None:
+                return False
+            now = datetime.now()
+            if retry and job.attempts < settings.JOBS_MAX_ATTEMPTS:
+                job.status = QUEUED
+                job.available_at = now + timedelta(seconds=settings.JOBS_RETRY_DELAY * 2 ** (job.attempts - 1))
+            else:
+                job.status = FAILED
+            job.error = error
+            job.lease_owner = None
+            job.update_at = now
+            db.commit()
+        return True
+
+    def release(self, job_id: str, owner: str) -> bool:
+        # shutdown hands the job back without counting the interrupted attempt
+        with self.Session() as db:
+            updated = self._leased(db, job_id, owner).update(
+                {"status": QUEUED, "lease_owner": None, "attempts": JobModel.attempts - 1, "update_at": datetime.now()},
+                synchronize_session=False,
+            )
+            db.commit()
+        return bool(updated)
+
+
+job_queue = JobQueue(settings.JOBS_DATABASE_URL or settings.DATABASE_URL)
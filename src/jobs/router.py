@@ -0,0 +1,52 @@
+from fastapi import APIRouter, Depends, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from src.jobs import controller
+from src.jobs.dtos import JobCreate, JobList, JobResponse
+from src.jobs.queue import job_queue
+from src.notes.router import get_current_user
+from src.users.auth import Principal
+from src.utils.db import get_read_db
+from src.utils.settings import settings
+
+
+jobs_routes = APIRouter(prefix="/chatbot/jobs")
+
+
+@jobs_routes.post("", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+def create_job(
+    body: JobCreate,
+    db: Session = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    return controller.enqueue_job(body, db, current_user)
+
+
+@jobs_routes.get("", response_model=JobList, status_code=status.HTTP_200_OK)
+def list_jobs(
+    limit: int = Query(20, ge=1, le=100),
+    current_user: Principal = Depends(get_current_user),
+):
+    return {"items": job_queue.list_jobs(current_user.id, limit)}
+
+
+@jobs_routes.get("/{job_id}", response_model=JobResponse, status_code=status.HTTP_200_OK)
+def get_job(job_id: str, current_user: Principal = Depends(get_current_user)):
+    return job_queue.get(job_id, current_user.id)
+
+
+@jobs_routes.get("/{job_id}/events", status_code=status.HTTP_200_OK)
+def job_events(job_id: str, current_user: Principal = Depends(get_current_user)):
+    # server-sent events: one event per status change, the last one carries the result
+    job_queue.get(job_id, current_user.id)
+    return StreamingResponse(
+        controller.job_events(job_id, current_user, settings.JOBS_POLL_INTERVAL),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@jobs_routes.delete("/{job_id}", response_model=JobResponse, status_code=status.HTTP_200_OK)
+def cancel_job(job_id: str, current_user: Principal = Depends(get_current_user)):
+    return job_queue.cancel(job_id, current_user.id)
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import os
+import socket
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+from src.chatbot.upstream import is_retryable
+from src.jobs.controller import run_job
+from src.jobs.queue import JobQueue, job_queue
+from src.metrics.registry import registry
+from src.utils.settings import settings
+
+logger = logging.getLogger("smartnotes.jobs")
+
+jobs_finished = registry.counter("jobs_finished_total", "Background jobs by final outcome")
+
+
+class JobWorkers:
+    def __init__(self, queue: JobQueue, count: int, poll_interval: float):
+        self.queue = queue
+        self.count = count
+        self.poll_interval = poll_interval
+        self.busy = 0
+        self._tasks = []
+
+    def start(self):
+        prefix = f"{socket.gethostname()}-{os.getpid()}"
+        self._tasks = [asyncio.create_task(self.loop(f"{prefix}-{index}")) for index in range(self.count)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def loop(self, owner: str):
+        while True:
+            try:
+                job = await run_in_threadpool(self.queue.claim, owner)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("claiming a job failed")
+                job = None
+            if job is None:
+                await asyncio.sleep(self.poll_interval)
+                continue
+            self.busy += 1
+            try:
+                await self.process(job, owner)
+            finally:
+                self.busy -= 1
+
+    async def heartbeat(self, job_id: str, owner: str):
+        while True:
+            await asyncio.sleep(settings.JOBS_LEASE_SECONDS / 3)
+            await run_in_threadpool(self.queue.extend, job_id, owner)
+
+    async def process(self, job, owner: str):
+        if job.attempts > settings.JOBS_MAX_ATTEMPTS:
+            # its lease ran out once too often, most likely the worker kept crashing on it
+            await run_in_threadpool(self.queue.fail, job.id, owner, "Job lease expired too many times", False)
+            jobs_finished.inc(status="failed")
+            return
+
+        heartbeat = asyncio.create_task(self.heartbeat(job.id, owner))
+        try:
+            response, note_id = await run_job(job, owner)
+        except asyncio.CancelledError:
+            await run_in_threadpool(self.queue.release, job.id, owner)
+            raise
+        except HTTPException as exc:
+            # 503 is our own LLM limiter shedding load; 404s (subject or user gone) will not get better
+            retry = exc.status_code == 503
+            await run_in_threadpool(self.queue.fail, job.id, owner, exc.detail, retry)
+            jobs_finished.inc(status="retried" if retry else "failed")
+        except Exception as exc:
+            logger.exception("job %s failed", job.id)
+            retry = is_retryable(exc)
+            await run_in_threadpool(self.queue.fail, job.id, owner, f"Chatbot failed: {exc}", retry)
+            jobs_finished.inc(status="retried" if retry else "failed")
+        else:
+            completed = await run_in_threadpool(self.queue.complete, job.id, owner, response, note_id)
+            # not completed: cancelled meanwhile, or the lease was lost and another worker has it
+            jobs_finished.inc(status="done" if completed else "discarded")
+        finally:
+            heartbeat.cancel()
+
+
+workers = JobWorkers(job_queue, settings.JOBS_WORKERS, settings.JOBS_POLL_INTERVAL)
+
+
+@registry.collector
+def collect_workers():
+    return [("jobs_workers_busy", "gauge", "Job workers currently running a job", [({}, workers.busy)])]
+
+
+async def main():
+    # standalone worker process, for deployments where the web process cannot run background tasks
+    job_queue.setup()
+    pool = JobWorkers(job_queue, max(settings.JOBS_WORKERS, 1), settings.JOBS_POLL_INTERVAL)
+    pool.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await pool.stop()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,156 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import random
+import time
+from collections import Counter as Tally
+from contextlib import contextmanager
+from pathlib import Path
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src.metrics.registry import registry
+from src.utils.settings import settings
+
+logger = logging.getLogger("smartnotes.metrics")
+
+http_latency = registry.histogram("http_request_duration_seconds", "Request latency by route template")
+http_requests = registry.counter("http_requests_total", "Requests by route template, method and status")
+db_query_latency = registry.histogram(
+    "db_query_duration_seconds",
+    "SQL statement latency",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+db_queries_per_request = registry.histogram(
+    "db_queries_per_request",
+    "SQL statements issued while serving one request",
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 500),
+)
+db_slow_queries = registry.counter("db_slow_queries_total", "Statements slower than SLOW_QUERY_MS")
+db_n_plus_one = registry.counter("db_n_plus_one_total", "Requests repeating one statement N_PLUS_ONE_THRESHOLD+ times")
+span_latency = registry.histogram("span_duration_seconds", "Latency of instrumented code sections")
+
+
+class RequestStats:
+    __slots__ = ("queries", "statements")
+
+    def __init__(self):
+        self.queries = 0
+        self.statements = Tally()
+
+
+# shared by reference with threadpool handlers, which run in a copy of the request's context
+current_request = contextvars.ContextVar("current_request", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    db_query_latency.observe(elapsed)
+    if elapsed * 1000 >= settings.SLOW_QUERY_MS:
+        db_slow_queries.inc()
+        logger.warning("slow query (%.1f ms): %s", elapsed * 1000, " ".join(statement.split())[:500])
+    stats = current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.statements[statement] += 1
+
+
+@contextmanager
+def span(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        span_latency.observe(time.perf_counter() - start, name=name)
+
+
+def timed(name: str):
+    def decorator(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def start_profiler(scope):
+    # pyinstrument is optional; it samples the event loop thread, so threadpool handlers show up as awaits
+    if not settings.PROFILE_REQUESTS:
+        return None
+    requested = dict(scope["headers"]).get(b"x-profile") == b"1"
+    if not requested and random.random() >= settings.PROFILE_SAMPLE_RATE:
+        return None
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        return None
+    profiler = Profiler(async_mode="enabled")
+    profiler.start()
+    return profiler
+
+
+def stop_profiler(profiler, method: str, route: str):
+    profiler.stop()
+    directory = Path(settings.PROFILE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    name = f"{int(time.time() * 1000)}-{method}-{route.strip('/').replace('/', '_') or 'root'}.html"
+    (directory / name).write_text(profiler.output_html())
+
+
+class MetricsMiddleware:
+    # plain ASGI so streaming responses are timed end to end and never buffered
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        profiler = start_profiler(scope)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            route = getattr(scope.get("route"), "path", "unmatched")
+            method = scope["method"]
+            http_latency.observe(elapsed, route=route, method=method)
+            http_requests.inc(route=route, method=method, status=status_code)
+            db_queries_per_request.observe(stats.queries, route=route)
+            statement, repeats = max(stats.statements.items(), key=lambda item: item[1], default=("", 0))
+            if repeats >= settings.N_PLUS_ONE_THRESHOLD:
+                db_n_plus_one.inc(route=route)
+                logger.warning("possible N+1 on %s %s: %d x %s", method, route, repeats, " ".join(statement.split())[:200])
+            if profiler is not None:
+                stop_profiler(profiler, method, route)
+            current_request.reset(token)
@@ -0,0 +1,50 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from src.metrics.registry import registry
+from src.utils.db import pool_stats
+
+metrics_router = APIRouter()
+
+
+@registry.collector
+def collect_pools():
+    pools = pool_stats()
+    checkouts = [({"pool": name}, stats["checkouts"]) for name, stats in pools.items()]
+    waits = [({"pool": name}, stats["wait_seconds_total"]) for name, stats in pools.items()]
+    timeouts = [({"pool": name}, stats["timeouts"]) for name, stats in pools.items()]
+    return [
+        ("db_pool_checkouts_total", "counter", "Connections handed out by the pool", checkouts),
+        ("db_pool_wait_seconds_total", "counter", "Time spent waiting for a pooled connection", waits),
+        ("db_pool_timeouts_total", "counter", "Checkouts that hit pool_timeout", timeouts),
+    ]
+
+
+@registry.collector
+def collect_caches():
+    from src.chatbot.router import response_cache
+    from src.chatbot.sessions import session_store
+    from src.dashboard.controller import summary_cache
+    from src.users.auth import token_cache
+
+    caches = {
+        "auth": token_cache.stats(),
+        "dashboard": summary_cache.stats(),
+        "chat_response": response_cache.stats(),
+        "chat_session": session_store.cache.stats(),
+    }
+    gauges = ("entries", "bytes")
+    return [
+        (
+            f"cache_{field}" if field in gauges else f"cache_{field}_total",
+            "gauge" if field in gauges else "counter",
+            f"Cache {field}",
+            [({"cache": name}, stats[field]) for name, stats in caches.items() if field in stats],
+        )
+        for field in ("hits", "misses", "evictions", *gauges)
+    ]
+
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics():
+    return registry.render()
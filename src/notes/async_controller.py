@@ -0,0 +1,179 @@
+from typing import Optional
+
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.chatbot.retrieval import retrieval_index
+from src.utils.bus import DATA_CHANGED, bus
+from src.notes import revisions, search
+from src.notes.content import with_content
+from src.notes.controller import with_revision
+from src.notes.dtos import NotesPatch, NotesSchema
+from src.notes.models import NotesModel, release_later
+from src.subject.models import SubjectModel, notes_version_update
+from src.users.auth import Principal
+from src.utils.etags import abump_version
+from src.utils.helpers import decode_cursor, encode_cursor
+
+
+def owned_notes(statement, current_user: Principal):
+    return statement.join(SubjectModel, NotesModel.subject_id == SubjectModel.id).where(
+        SubjectModel.user_id == current_user.id
+    )
+
+
+async def find_note(id: int, db: AsyncSession, current_user: Principal):
+    statement = owned_notes(select(NotesModel).options(*with_content()), current_user).where(NotesModel.id == id)
+    result = await db.execute(statement)
+    note = result.scalar_one_or_none()
+    if not note:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Note not Found")
+    return note
+
+
+async def check_subject(subject_id: int, db: AsyncSession, current_user: Principal):
+    result = await db.execute(
+        select(SubjectModel.id).where(SubjectModel.id == subject_id, SubjectModel.user_id == current_user.id)
+    )
+    if result.first() is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Subject not Found")
+
+
+async def create_note(body: NotesSchema, db: AsyncSession, current_user: Principal):
+    await check_subject(body.subject_id, db, current_user)
+
+    new_note = NotesModel(
+        title=body.title,
+        content=body.content,
+        subject_id=body.subject_id,
+    )
+    db.add(new_note)
+    await db.flush()
+    db.add(revisions.snapshot(new_note, 1))
+    await search.aindex_note(db, new_note, current_user.id)
+    await db.execute(notes_version_update([new_note.subject_id]))
+    await abump_version(db, current_user.id)
+    await db.commit()
+    bus.publish(DATA_CHANGED, user_id=current_user.id, notes=True)
+    await db.refresh(new_note)
+    # chunking and hashing the body is CPU work, kept off the event loop
+    await run_in_threadpool(retrieval_index.note_written, current_user.id, new_note.id, new_note.title, new_note.content)
+    return with_revision(new_note, 1)
+
+
+async def get_notes(db: AsyncSession, current_user: Principal, subject_id: Optional[int] = None):
+    statement = owned_notes(select(NotesModel).options(*with_content()), current_user)
+    if subject_id is not None:
+        statement = statement.where(NotesModel.subject_id == subject_id)
+    return (await db.execute(statement)).scalars().all()
+
+
+async def get_notes_page(
+    db: AsyncSession,
+    current_user: Principal,
+    limit: int,
+    cursor: Optional[str] = None,
+    subject_id: Optional[int] = None,
+    view: str = "summary",
+):
+    if view == "summary":
+        statement = select(
+            NotesModel.id,
+            NotesModel.title,
+            NotesModel.preview,
+            NotesModel.subject_id,
+            NotesModel.create_at,
+        )
+    else:
+        statement = select(NotesModel).options(*with_content())
+
+    statement = owned_notes(statement, current_user)
+    if subject_id is not None:
+        statement = statement.where(NotesModel.subject_id == subject_id)
+    if cursor:
+        cursor_create_at, cursor_id = decode_cursor(cursor)
+        statement = statement.where(
+            or_(
+                NotesModel.create_at < cursor_create_at,
+                and_(NotesModel.create_at == cursor_create_at, NotesModel.id < cursor_id),
+            )
+        )
+
+    statement = statement.order_by(NotesModel.create_at.desc(), NotesModel.id.desc()).limit(limit + 1)
+    result = await db.execute(statement)
+    rows = result.all() if view == "summary" else result.scalars().all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].create_at, rows[-1].id)
+    return {"items": rows, "next_cursor": next_cursor}
+
+
+async def get_notebyId(id: int, db: AsyncSession, current_user: Principal):
+    note = await find_note(id, db, current_user)
+    return with_revision(note, await revisions.acurrent_revision(db, note.id))
+
+
+async def update_note(id: int, body: NotesSchema, db: AsyncSession, current_user: Principal):
+    note = await find_note(id, db, current_user)
+    await check_subject(body.subject_id, db, current_user)
+
+    await search.aremove_note(db, note.id)
+    await db.execute(notes_version_update([note.subject_id, body.subject_id]))
+    for field, value in body.model_dump().items():
+        setattr(note, field, value)
+
+    await db.flush()
+    revision = await revisions.acurrent_revision(db, note.id) + 1
+    await revisions.aadd_revision(db, revisions.snapshot(note, revision))
+    await search.aindex_note(db, note, current_user.id)
+    await abump_version(db, current_user.id)
+    await db.commit()
+    bus.publish(DATA_CHANGED, user_id=current_user.id, notes=True)
+    await db.refresh(note)
+    await run_in_threadpool(retrieval_index.note_written, current_user.id, note.id, note.title, note.content)
+    return with_revision(note, revision)
+
+
+async def patch_note(id: int, body: NotesPatch, db: AsyncSession, current_user: Principal):
+    note = await find_note(id, db, current_user)
+    await search.aremove_note(db, note.id)
+    revision = await revisions.apatch(db, note, body)
+    await search.aindex_note(db, note, current_user.id)
+    await db.execute(notes_version_update([note.subject_id]))
+    await abump_version(db, current_user.id)
+    result = {"id": note.id, "revision": revision, "title": note.title, "length": len(note.content)}
+    content = note.content
+    await db.commit()
+    bus.publish(DATA_CHANGED, user_id=current_user.id, notes=True)
+    await run_in_threadpool(retrieval_index.note_written, current_user.id, result["id"], result["title"], content)
+    return result
+
+
+async def list_note_revisions(id: int, limit: int, before: Optional[int], db: AsyncSession, current_user: Principal):
+    note = await find_note(id, db, current_user)
+    return await revisions.alist_revisions(db, note.id, limit, before)
+
+
+async def get_note_revision(id: int, revision: int, db: AsyncSession, current_user: Principal):
+    note = await find_note(id, db, current_user)
+    return await revisions.aload_revision(db, note.id, revision)
+
+
+async def delete_note(id: int, db: AsyncSession, current_user: Principal):
+    note = await find_note(id, db, current_user)
+    await search.aremove_note(db, note.id)
+    release_later(db, await revisions.apurge(db, [note.id]))
+    await db.execute(notes_version_update([note.subject_id]))
+    await db.delete(note)
+    await abump_version(db, current_user.id)
+    await db.commit()
+    bus.publish(DATA_CHANGED, user_id=current_user.id, notes=True)
+    retrieval_index.note_deleted(current_user.id, id)
+    return None
+
+
+async def search_notes(query: str, limit: int, subject_id: Optional[int], db: AsyncSession, current_user: Principal):
+    return await search.asearch_notes(db, current_user.id, query, limit, subject_id)
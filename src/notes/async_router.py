@@ -0,0 +1,152 @@
+from fastapi import APIRouter, Depends, Query, Response, status, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional, Union
+
+from src.notes import async_controller as controller
+from src.notes.dtos import (
+    NotesSchema,
+    NotesResponse,
+    NotesPage,
+    NotesSummaryPage,
+    NotesSearchResult,
+    NotesPatch,
+    NotesPatchResponse,
+    NoteRevisionSummary,
+    NoteRevisionResponse,
+)
+from src.users import async_controller as user_controller
+from src.users.auth import Principal
+from src.utils.async_db import get_async_db
+from src.utils.constents import NOTES_PAGE_DEFAULT_LIMIT, NOTES_PAGE_MAX_LIMIT, NOTE_REVISIONS_PAGE_LIMIT
+from src.utils.etags import acurrent_version, check_not_modified
+
+
+notes_routes = APIRouter(prefix="/notes")
+
+
+async def get_current_user(request: Request, db: AsyncSession = Depends(get_async_db)):
+    return await user_controller.is_authenticated(request, db)
+
+
+async def conditional_read(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    check_not_modified(request, response, current_user.id, await acurrent_version(db, current_user.id))
+
+
+@notes_routes.post("/create", response_model=NotesResponse, status_code=status.HTTP_201_CREATED)
+async def create_note(
+    body: NotesSchema,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    return await controller.create_note(body, db, current_user)
+
+
+@notes_routes.get(
+    "/get",
+    response_model=List[NotesResponse],
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(conditional_read)],
+)
+async def get_notes(
+    subject_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    return await controller.get_notes(db, current_user, subject_id)
+
+
+@notes_routes.get(
+    "/list",
+    response_model=Union[NotesPage, NotesSummaryPage],
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(conditional_read)],
+)
+async def list_notes(
+    limit: int = Query(NOTES_PAGE_DEFAULT_LIMIT, ge=1, le=NOTES_PAGE_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    subject_id: Optional[int] = None,
+    view: Literal["summary", "full"] = "summary",
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    return await controller.get_notes_page(db, current_user, limit, cursor, subject_id, view)
+
+
+@notes_routes.get("/search", response_model=List[NotesSearchResult], status_code=status.HTTP_200_OK)
+async def search_notes(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(NOTES_PAGE_DEFAULT_LIMIT, ge=1, le=NOTES_PAGE_MAX_LIMIT),
+    subject_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    return await controller.search_notes(q, limit, subject_id, db, current_user)
+
+
+@notes_routes.get(
+    "/get_note/{id}",
+    response_model=NotesResponse,
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(conditional_read)],
+)
+async def get_noteById(
+    id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    return await controller.get_notebyId(id, db, current_user)
+
+
+@notes_routes.put("/update/{id}", response_model=NotesResponse, status_code=status.HTTP_201_CREATED)
+async def update_note(
+    id: int,
+    body: NotesSchema,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    return await controller.update_note(id, body, db, current_user)
+
+
+@notes_routes.patch("/patch/{id}", response_model=NotesPatchResponse, status_code=status.HTTP_200_OK)
+async def patch_note(
+    id: int,
+    body: NotesPatch,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    return await controller.patch_note(id, body, db, current_user)
+
+
+@notes_routes.get("/revisions/{id}", response_model=List[NoteRevisionSummary], status_code=status.HTTP_200_OK)
+async def list_note_revisions(
+    id: int,
+    limit: int = Query(NOTE_REVISIONS_PAGE_LIMIT, ge=1, le=NOTE_REVISIONS_PAGE_LIMIT),
+    before: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    return await controller.list_note_revisions(id, limit, before, db, current_user)
+
+
+@notes_routes.get("/revisions/{id}/{revision}", response_model=NoteRevisionResponse, status_code=status.HTTP_200_OK)
+async def get_note_revision(
+    id: int,
+    revision: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    return await controller.get_note_revision(id, revision, db, current_user)
+
+
+@notes_routes.delete("/delete/{id}", response_model=None, status_code=status.HTTP_204_NO_CONTENT)
+async def delete_note(
+    id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    return await controller.delete_note(id, db, current_user)
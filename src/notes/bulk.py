@@ -0,0 +1,323 @@
+import json
+import zipfile
+from datetime import datetime
+from pathlib import PurePosixPath
+from tempfile import SpooledTemporaryFile
+from typing import Optional
+
+from fastapi import HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from src.chatbot.retrieval import retrieval_index
+from src.utils.bus import DATA_CHANGED, bus
+from src.notes import revisions, search
+from src.notes.dtos import NotesBulkDelete, NotesMove, NotesSchema
+from src.notes.content import body_columns, join_bodies, read_body
+from src.notes.models import (
+    NoteRevisionModel,
+    NotesModel,
+    arelease_contents,
+    content_fields,
+    content_tier_enabled,
+    release_contents,
+    store_contents,
+)
+from src.subject.models import SubjectModel, notes_version_update
+from src.users.auth import Principal
+from src.utils.etags import bump_version
+from src.utils.constents import (
+    BULK_IMPORT_BATCH_SIZE,
+    BULK_IMPORT_MAX_ERRORS,
+    BULK_IMPORT_MAX_NOTE_BYTES,
+    BULK_MAX_NOTE_IDS,
+    EXPORT_YIELD_PER,
+)
+from src.utils.db import read_session
+
+SPOOL_MAX_MEMORY = 16 * 1024 * 1024
+
+
+class ImportReport:
+    def __init__(self):
+        self.imported = 0
+        self.failed = 0
+        self.batches = 0
+        self.errors = []
+
+    def fail(self, item, detail: str):
+        self.failed += 1
+        if len(self.errors) < BULK_IMPORT_MAX_ERRORS:
+            self.errors.append({"item": str(item), "detail": detail})
+
+    def as_dict(self):
+        return {"imported": self.imported, "failed": self.failed, "batches": self.batches, "errors": self.errors}
+
+
+def insert_batch(db: Session, batch, current_user: Principal, report: ImportReport):
+    # one ownership query and multi-row INSERTs of the notes and their first snapshots per batch,
+    # committed as its own transaction;
+    # returns the new note ids in batch order
+    subject_ids = {note.subject_id for _, note in batch}
+    owned = {
+        row.id
+        for row in db.query(SubjectModel.id).filter(
+            SubjectModel.user_id == current_user.id, SubjectModel.id.in_(subject_ids)
+        )
+    }
+
+    notes = []
+    inserted = []
+    for item, note in batch:
+        if note.subject_id not in owned:
+            report.fail(item, "Subject not Found")
+            continue
+        notes.append(note.model_dump())
+
+    if notes:
+        # a Core insert skips the flush hook that places bodies, so do it here
+        tier = content_tier_enabled(db.get_bind().dialect.name)
+        rows, contents = [], []
+        for values in notes:
+            fields, content = content_fields(values["content"], tier)
+            rows.append({"title": values["title"], "subject_id": values["subject_id"], **fields})
+            if content:
+                contents.append(content)
+        try:
+            store_contents(db, contents)
+            inserted = db.execute(
+                insert(NotesModel).returning(NotesModel.id, sort_by_parameter_order=True), rows
+            ).all()
+            db.execute(
+                insert(NoteRevisionModel),
+                [revisions.snapshot_values(row.id, values["title"], values) for row, values in zip(inserted, rows)],
+            )
+            search.index_many(db, [{"id": row.id, **values} for row, values in zip(inserted, notes)], current_user.id)
+            db.execute(notes_version_update(sorted({values["subject_id"] for values in notes})))
+            bump_version(db, current_user.id)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        bus.publish(DATA_CHANGED, user_id=current_user.id, notes=True)
+        for row, values in zip(inserted, notes):
+            retrieval_index.note_written(current_user.id, row.id, values["title"], values["content"])
+    report.imported += len(notes)
+    report.batches += 1
+    return [row.id for row in inserted]
+
+
+def parse_line(raw: bytes, line_no: int, report: ImportReport):
+    if not raw.strip():
+        return None
+    try:
+        return NotesSchema.model_validate(json.loads(raw))
+    except (ValueError, ValidationError) as exc:
+        report.fail(line_no, str(exc).splitlines()[0])
+        return None
+
+
+async def import_ndjson(request: Request, db: Session, current_user: Principal):
+    report = ImportReport()
+    batch = []
+    buffer = b""
+    line_no = 0
+
+    async def take(raw: bytes):
+        nonlocal batch, line_no
+        line_no += 1
+        note = parse_line(raw, line_no, report)
+        if note is not None:
+            batch.append((line_no, note))
+        if len(batch) >= BULK_IMPORT_BATCH_SIZE:
+            await run_in_threadpool(insert_batch, db, batch, current_user, report)
+            batch = []
+
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for raw in lines:
+            await take(raw)
+        if len(buffer) > BULK_IMPORT_MAX_NOTE_BYTES:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"Line {line_no + 1} is too large")
+    if buffer:
+        await take(buffer)
+    if batch:
+        await run_in_threadpool(insert_batch, db, batch, current_user, report)
+    return report.as_dict()
+
+
+def import_zip_file(spool, db: Session, current_user: Principal, subject_id: Optional[int]):
+    # entries are "<subject title>/<note title>.md"; files outside a known subject folder use subject_id
+    report = ImportReport()
+    try:
+        archive = zipfile.ZipFile(spool)
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid zip archive")
+
+    subjects = {
+        row.title: row.id
+        for row in db.query(SubjectModel.id, SubjectModel.title).filter(SubjectModel.user_id == current_user.id)
+    }
+    batch = []
+    with archive:
+        for info in archive.infolist():
+            path = PurePosixPath(info.filename)
+            if info.is_dir() or path.suffix.lower() not in (".md", ".markdown"):
+                continue
+            if info.file_size > BULK_IMPORT_MAX_NOTE_BYTES:
+                report.fail(info.filename, "Note is too large")
+                continue
+            target = subjects.get(path.parent.name, subject_id) if len(path.parts) > 1 else subject_id
+            if target is None:
+                report.fail(info.filename, "Subject not Found")
+                continue
+            content = archive.read(info).decode("utf-8", errors="replace")
+            batch.append((info.filename, NotesSchema(title=path.stem, content=content, subject_id=target)))
+            if len(batch) >= BULK_IMPORT_BATCH_SIZE:
+                insert_batch(db, batch, current_user, report)
+                batch = []
+    if batch:
+        insert_batch(db, batch, current_user, report)
+    return report.as_dict()
+
+
+async def import_markdown_zip(request: Request, db: Session, current_user: Principal, subject_id: Optional[int]):
+    # zip needs random access, so spool the upload (to disk past SPOOL_MAX_MEMORY) before reading it
+    with SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY) as spool:
+        async for chunk in request.stream():
+            spool.write(chunk)
+        spool.seek(0)
+        return await run_in_threadpool(import_zip_file, spool, db, current_user, subject_id)
+
+
+def export_notes(current_user: Principal, subject_id: Optional[int] = None):
+    # owns its session: the generator outlives the request's dependencies while the body streams
+    db = read_session()
+    try:
+        query = (
+            join_bodies(db.query(NotesModel.id, NotesModel.title, NotesModel.subject_id, NotesModel.create_at, *body_columns()))
+            .join(SubjectModel, NotesModel.subject_id == SubjectModel.id)
+            .filter(SubjectModel.user_id == current_user.id)
+        )
+        if subject_id is not None:
+            query = query.filter(NotesModel.subject_id == subject_id)
+        for row in query.order_by(NotesModel.id).yield_per(EXPORT_YIELD_PER):
+            record = {
+                "id": row.id,
+                "title": row.title,
+                "content": read_body(row),
+                "subject_id": row.subject_id,
+                "create_at": row.create_at,
+            }
+            if isinstance(record["create_at"], datetime):
+                record["create_at"] = record["create_at"].isoformat()
+            yield json.dumps(record) + "\n"
+    finally:
+        db.close()
+
+
+def owned_notes(current_user: Principal, note_ids=None, subject_id: Optional[int] = None, before: Optional[datetime] = None):
+    # WHERE criteria on "Notes" alone; ownership is a subquery, so the same criteria serve
+    # SELECT, UPDATE and DELETE without joins
+    criteria = [NotesModel.subject_id.in_(select(SubjectModel.id).where(SubjectModel.user_id == current_user.id))]
+    if note_ids is not None:
+        criteria.append(NotesModel.id.in_(note_ids))
+    if subject_id is not None:
+        criteria.append(NotesModel.subject_id == subject_id)
+    if before is not None:
+        criteria.append(NotesModel.create_at < before)
+    return criteria
+
+
+def remove_notes(db: Session, criteria) -> int:
+    # set-based: the search rows, revisions and body hashes are found through the notes about to be
+    # deleted, so nothing is loaded into the session however many notes match. Bodies no other note
+    # shares are removed in the same transaction.
+    ids = select(NotesModel.id).where(*criteria)
+    search.remove_many(db, ids)
+    snapshots = revisions.purge(db, ids)
+    db.execute(notes_version_update(note_subjects(criteria)))
+    hashes = db.scalars(content_hashes(criteria)).all()
+    deleted = db.execute(notes_delete(criteria)).rowcount
+    release_contents(db, [*hashes, *snapshots])
+    return deleted
+
+
+async def aremove_notes(db: AsyncSession, criteria) -> int:
+    ids = select(NotesModel.id).where(*criteria)
+    await search.aremove_many(db, ids)
+    snapshots = await revisions.apurge(db, ids)
+    await db.execute(notes_version_update(note_subjects(criteria)))
+    hashes = (await db.scalars(content_hashes(criteria))).all()
+    deleted = (await db.execute(notes_delete(criteria))).rowcount
+    await arelease_contents(db, [*hashes, *snapshots])
+    return deleted
+
+
+def note_subjects(criteria):
+    return select(NotesModel.subject_id).where(*criteria).distinct()
+
+
+def content_hashes(criteria):
+    return select(NotesModel.content_hash).where(*criteria, NotesModel.content_hash.is_not(None)).distinct()
+
+
+def notes_delete(criteria):
+    return delete(NotesModel).where(*criteria).execution_options(synchronize_session=False)
+
+
+def check_note_ids(note_ids):
+    if note_ids is not None and len(note_ids) > BULK_MAX_NOTE_IDS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"At most {BULK_MAX_NOTE_IDS} note ids per request")
+
+
+def move_notes(db: Session, body: NotesMove, current_user: Principal):
+    if (body.note_ids is None) == (body.from_subject_id is None):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Give either note_ids or from_subject_id")
+    check_note_ids(body.note_ids)
+    target = (
+        db.query(SubjectModel.id)
+        .filter(SubjectModel.id == body.subject_id, SubjectModel.user_id == current_user.id)
+        .first()
+    )
+    if not target:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Subject not Found")
+
+    # ids that are not the user's, or already in the target subject, are not counted
+    criteria = [*owned_notes(current_user, body.note_ids, body.from_subject_id), NotesModel.subject_id != body.subject_id]
+    # the subjects the notes leave, while the criteria still find them there
+    db.execute(notes_version_update(note_subjects(criteria)))
+    result = db.execute(
+        update(NotesModel)
+        .where(*criteria)
+        .values(subject_id=body.subject_id)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount:
+        db.execute(notes_version_update([body.subject_id]))
+    bump_version(db, current_user.id)
+    db.commit()
+    bus.publish(DATA_CHANGED, user_id=current_user.id, notes=False)
+    return {"moved": result.rowcount}
+
+
+def delete_notes(db: Session, body: NotesBulkDelete, current_user: Principal):
+    if body.note_ids is None and body.subject_id is None and body.before is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Give at least one of note_ids, subject_id or before")
+    check_note_ids(body.note_ids)
+    before = body.before
+    if before is not None and before.tzinfo is not None:
+        # create_at is stored as naive local time
+        before = before.astimezone().replace(tzinfo=None)
+    deleted = remove_notes(db, owned_notes(current_user, body.note_ids, body.subject_id, before))
+    bump_version(db, current_user.id)
+    db.commit()
+    bus.publish(DATA_CHANGED, user_id=current_user.id, notes=True)
+    if deleted:
+        # dropped rather than edited note by note; rebuilt on the next chatbot question
+        retrieval_index.forget_user(current_user.id)
+    return {"deleted": deleted}
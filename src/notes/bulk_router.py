@@ -0,0 +1,55 @@
+from fastapi import APIRouter, Depends, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from typing import Optional
+
+from src.notes import bulk
+from src.notes.dtos import (
+    BulkImportResponse,
+    NotesBulkDelete,
+    NotesBulkDeleteResponse,
+    NotesMove,
+    NotesMoveResponse,
+)
+from src.notes.router import get_current_user
+from src.users.auth import Principal
+from src.utils.db import get_db
+
+
+notes_bulk_routes = APIRouter(prefix="/notes")
+
+
+@notes_bulk_routes.post("/bulk_import", response_model=BulkImportResponse, status_code=status.HTTP_200_OK)
+async def bulk_import(
+    request: Request,
+    subject_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    # application/x-ndjson: one {"title", "content", "subject_id"} object per line
+    # application/zip: markdown files grouped in folders named after the subject
+    if "zip" in request.headers.get("content-type", ""):
+        return await bulk.import_markdown_zip(request, db, current_user, subject_id)
+    return await bulk.import_ndjson(request, db, current_user)
+
+
+@notes_bulk_routes.get("/export", status_code=status.HTTP_200_OK)
+def export_notes(
+    subject_id: Optional[int] = None,
+    current_user: Principal = Depends(get_current_user),
+):
+    return StreamingResponse(
+        bulk.export_notes(current_user, subject_id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="notes.ndjson"'},
+    )
+
+
+@notes_bulk_routes.post("/bulk_move", response_model=NotesMoveResponse, status_code=status.HTTP_200_OK)
+def bulk_move(body: NotesMove, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
+    return bulk.move_notes(db, body, current_user)
+
+
+@notes_bulk_routes.post("/bulk_delete", response_model=NotesBulkDeleteResponse, status_code=status.HTTP_200_OK)
+def bulk_delete(body: NotesBulkDelete, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
+    return bulk.delete_notes(db, body, current_user)
@@ -0,0 +1,202 @@
+import argparse
+import logging
+
+from sqlalchemy import bindparam, func, inspect, select, text, update
+from sqlalchemy.orm import joinedload, undefer
+
+from src.notes.models import (
+    NoteContentModel,
+    NoteRevisionModel,
+    NotesModel,
+    content_fields,
+    content_referenced,
+    content_tier_enabled,
+    release_contents,
+    store_contents,
+)
+from src.utils.compression import decompress
+from src.utils.constents import NOTE_PREVIEW_LENGTH
+from src.utils.db import SessionLocal, engine
+
+logger = logging.getLogger("smartnotes.content")
+
+# columns added after the tables were first created; create_all does not alter existing tables
+UPGRADE_COLUMNS = {
+    "Notes": {"content_hash": "VARCHAR(64)", "preview": "VARCHAR", "content_length": "INTEGER"},
+    "NoteRevisions": {"content_hash": "VARCHAR(64)"},
+}
+
+# (model, column holding a plain body, its value once the body is in the tier, rows that hold bodies)
+BODY_TABLES = (
+    (NotesModel, "content", None, ()),
+    (NoteRevisionModel, "data", "", (NoteRevisionModel.kind == "snapshot",)),
+)
+
+
+def with_content():
+    # loader options for queries whose notes will have their body read; AsyncSession cannot lazy load
+    return (undefer(NotesModel.stored_content), joinedload(NotesModel.body))
+
+
+def body_columns():
+    return (
+        NotesModel.stored_content.label("stored_content"),
+        NoteContentModel.codec.label("codec"),
+        NoteContentModel.data.label("data"),
+    )
+
+
+def join_bodies(query):
+    # for column queries (query or select) that include body_columns()
+    return query.outerjoin(NoteContentModel, NotesModel.content_hash == NoteContentModel.hash)
+
+
+def read_body(row) -> str:
+    return decompress(row.codec, row.data) if row.codec is not None else row.stored_content
+
+
+def upgrade_schema(bind=engine):
+    with bind.begin() as conn:
+        for table, added in UPGRADE_COLUMNS.items():
+            if not inspect(conn).has_table(table):
+                # created with every column by create_all
+                continue
+            columns = {column["name"] for column in inspect(conn).get_columns(table)}
+            for name, ddl in added.items():
+                if name not in columns:
+                    conn.execute(text(f'ALTER TABLE "{table}" ADD COLUMN {name} {ddl}'))
+        conn.execute(text('CREATE INDEX IF NOT EXISTS ix_notes_content_hash ON "Notes" (content_hash)'))
+        conn.execute(text('CREATE INDEX IF NOT EXISTS ix_note_revisions_content_hash ON "NoteRevisions" (content_hash)'))
+        # rows written before the preview columns existed; listings read only these two
+        conn.execute(
+            text(
+                f'UPDATE "Notes" SET preview = substr(content, 1, {NOTE_PREVIEW_LENGTH}), '
+                "content_length = length(coalesce(content, '')) WHERE content_length IS NULL"
+            )
+        )
+
+
+def move_bodies(to_tier: bool, batch_size: int) -> int:
+    # notes and their snapshot revisions; returns the number of notes moved
+    moved = {}
+    for model, column, tiered, criteria in BODY_TABLES:
+        moved[model.__tablename__] = move_rows(model, column, tiered, criteria, to_tier, batch_size)
+    return moved["Notes"]
+
+
+def move_rows(model, column: str, tiered, criteria, to_tier: bool, batch_size: int) -> int:
+    # keyset batches, each its own transaction, so a large table can be migrated while the app runs
+    table = model.__table__
+    moved = 0
+    last_id = 0
+    while True:
+        with SessionLocal() as db:
+            where = table.c.content_hash.is_(None) if to_tier else table.c.content_hash.is_not(None)
+            rows = db.execute(
+                select(table.c.id, table.c[column].label("stored_content"), NoteContentModel.codec, NoteContentModel.data)
+                .outerjoin(NoteContentModel, table.c.content_hash == NoteContentModel.hash)
+                .where(where, *criteria, table.c.id > last_id)
+                .order_by(table.c.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                return moved
+            updates, contents = [], []
+            for row in rows:
+                body = read_body(row)
+                if to_tier:
+                    fields, content = content_fields(body, True)
+                    if content:
+                        contents.append(content)
+                    updates.append({"row_id": row.id, "body": tiered, "content_hash": fields["content_hash"]})
+                else:
+                    updates.append({"row_id": row.id, "body": body, "content_hash": None})
+            store_contents(db, contents)
+            db.execute(
+                update(table)
+                .where(table.c.id == bindparam("row_id"))
+                .values({column: bindparam("body"), "content_hash": bindparam("content_hash")}),
+                updates,
+            )
+            db.commit()
+            moved += len(rows)
+            last_id = rows[-1].id
+            logger.info("moved %s %s rows", moved, table.name)
+
+
+def vacuum(batch_size: int = 500) -> int:
+    # writes release their own bodies; this catches what older versions, or `restore`, left behind.
+    # release_contents re-checks every candidate, so notes written meanwhile keep their bodies.
+    removed = 0
+    last_hash = ""
+    referenced = content_referenced()
+    while True:
+        with SessionLocal() as db:
+            hashes = db.scalars(
+                select(NoteContentModel.hash)
+                .where(~referenced, NoteContentModel.hash > last_hash)
+                .order_by(NoteContentModel.hash)
+                .limit(batch_size)
+            ).all()
+            if not hashes:
+                return removed
+            removed += release_contents(db, hashes)
+            db.commit()
+            last_hash = hashes[-1]
+
+
+def stats() -> dict:
+    with SessionLocal() as db:
+        plain = db.execute(
+            select(func.count(), func.coalesce(func.sum(func.length(NotesModel.stored_content)), 0)).where(
+                NotesModel.content_hash.is_(None)
+            )
+        ).one()
+        tiered = db.execute(select(func.count()).where(NotesModel.content_hash.is_not(None))).scalar_one()
+        snapshots = db.execute(
+            select(func.count(), func.count(NoteRevisionModel.content_hash)).where(NoteRevisionModel.kind == "snapshot")
+        ).one()
+        stored = db.execute(
+            select(
+                func.count(),
+                func.coalesce(func.sum(NoteContentModel.size), 0),
+                func.coalesce(func.sum(func.length(NoteContentModel.data)), 0),
+            )
+        ).one()
+    return {
+        "tier_enabled": content_tier_enabled(engine.dialect.name),
+        "plain_notes": plain[0],
+        "plain_characters": plain[1],
+        "tier_notes": tiered,
+        "plain_snapshots": snapshots[0] - snapshots[1],
+        "tier_snapshots": snapshots[1],
+        "tier_bodies": stored[0],
+        "tier_characters": stored[1],
+        "tier_bytes": stored[2],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move note and snapshot revision bodies into or out of the compressed content tier")
+    parser.add_argument("command", choices=["migrate", "restore", "vacuum", "stats"])
+    parser.add_argument("--batch", type=int, default=500)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    upgrade_schema()
+    if args.command == "migrate":
+        if engine.dialect.name == "postgresql":
+            parser.error("PostgreSQL keeps note bodies in Notes.content, which its search index reads")
+        if not content_tier_enabled(engine.dialect.name):
+            logger.warning("NOTE_CONTENT_TIER is off for %s; new writes will stay plain", engine.dialect.name)
+        logger.info("migrated %s notes", move_bodies(True, args.batch))
+    elif args.command == "restore":
+        logger.info("restored %s notes", move_bodies(False, args.batch))
+        logger.info("removed %s unreferenced bodies", vacuum(args.batch))
+    elif args.command == "vacuum":
+        logger.info("removed %s unreferenced bodies", vacuum(args.batch))
+    logger.info("%s", stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,39 @@
+from typing import Optional
+
 from fastapi import HTTPException, status
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
 
-from src.notes.dtos import NotesSchema
-from src.notes.models import NotesModel
-from src.subject.models import SubjectModel
-from src.users.models import UserModel
+from src.chatbot.retrieval import retrieval_index
+from src.utils.bus import DATA_CHANGED, bus
+from src.notes import revisions, search
+from src.notes.content import with_content
+from src.notes.dtos import NotesPatch, NotesResponse, NotesSchema
+from src.notes.models import NotesModel, release_later
+from src.subject.models import SubjectModel, notes_version_update
+from src.users.auth import Principal
+from src.utils.etags import bump_version
+from src.utils.helpers import decode_cursor, encode_cursor
+
+
+def with_revision(note: NotesModel, revision: int):
+    return NotesResponse.model_validate(note, from_attributes=True).model_copy(update={"revision": revision})
+
 
+def find_note(id: int, db: Session, current_user: Principal):
+    note = (
+        db.query(NotesModel)
+        .options(*with_content())
+        .join(SubjectModel, NotesModel.subject_id == SubjectModel.id)
+        .filter(NotesModel.id == id, SubjectModel.user_id == current_user.id)
+        .first()
+    )
+    if not note:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Note not Found")
+    return note
 
-def create_note(body: NotesSchema, db: Session, current_user: UserModel):
+
+def create_note(body: NotesSchema, db: Session, current_user: Principal):
     subject = (
         db.query(SubjectModel)
         .filter(SubjectModel.id == body.subject_id, SubjectModel.user_id == current_user.id)
@@ -22,42 +48,80 @@ def create_note(body: NotesSchema, db: Session, current_user: UserModel):
         subject_id=body.subject_id,
     )
     db.add(new_note)
+    db.flush()
+    db.add(revisions.snapshot(new_note, 1))
+    search.index_note(db, new_note, current_user.id)
+    db.execute(notes_version_update([new_note.subject_id]))
+    bump_version(db, current_user.id)
     db.commit()
+    bus.publish(DATA_CHANGED, user_id=current_user.id, notes=True)
     db.refresh(new_note)
-    return new_note
+    retrieval_index.note_written(current_user.id, new_note.id, new_note.title, new_note.content)
+    return with_revision(new_note, 1)
 
 
-def get_notes(db: Session, current_user: UserModel):
-    notes = (
+def get_notes(db: Session, current_user: Principal, subject_id: Optional[int] = None):
+    query = (
         db.query(NotesModel)
+        .options(*with_content())
         .join(SubjectModel, NotesModel.subject_id == SubjectModel.id)
         .filter(SubjectModel.user_id == current_user.id)
-        .all()
-    )
-    return notes
-
-
-def get_notebyId(id: int, db: Session, current_user: UserModel):
-    note = (
-        db.query(NotesModel)
-        .join(SubjectModel, NotesModel.subject_id == SubjectModel.id)
-        .filter(NotesModel.id == id, SubjectModel.user_id == current_user.id)
-        .first()
     )
-    if not note:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Note not Found")
-    return note
-
-
-def update_note(id: int, body: NotesSchema, db: Session, current_user: UserModel):
-    note = (
-        db.query(NotesModel)
-        .join(SubjectModel, NotesModel.subject_id == SubjectModel.id)
-        .filter(NotesModel.id == id, SubjectModel.user_id == current_user.id)
-        .first()
+    if subject_id is not None:
+        query = query.filter(NotesModel.subject_id == subject_id)
+    return query.all()
+
+
+def get_notes_page(
+    db: Session,
+    current_user: Principal,
+    limit: int,
+    cursor: Optional[str] = None,
+    subject_id: Optional[int] = None,
+    view: str = "summary",
+):
+    if view == "summary":
+        # the stored preview, so listing never reads (or decompresses) a note body
+        query = db.query(
+            NotesModel.id,
+            NotesModel.title,
+            NotesModel.preview,
+            NotesModel.subject_id,
+            NotesModel.create_at,
+        )
+    else:
+        query = db.query(NotesModel).options(*with_content())
+
+    query = query.join(SubjectModel, NotesModel.subject_id == SubjectModel.id).filter(
+        SubjectModel.user_id == current_user.id
     )
-    if not note:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Note not Found")
+    if subject_id is not None:
+        query = query.filter(NotesModel.subject_id == subject_id)
+    if cursor:
+        cursor_create_at, cursor_id = decode_cursor(cursor)
+        query = query.filter(
+            or_(
+                NotesModel.create_at < cursor_create_at,
+                and_(NotesModel.create_at == cursor_create_at, NotesModel.id < cursor_id),
+            )
+        )
+
+    # fetch one extra row to know whether another page exists
+    rows = query.order_by(NotesModel.create_at.desc(), NotesModel.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].create_at, rows[-1].id)
+    return {"items": rows, "next_cursor": next_cursor}
+
+
+def get_notebyId(id: int, db: Session, current_user: Principal):
+    note = find_note(id, db, current_user)
+    return with_revision(note, revisions.current_revision(db, note.id))
+
+
+def update_note(id: int, body: NotesSchema, db: Session, current_user: Principal):
+    note = find_note(id, db, current_user)
 
     subject = (
         db.query(SubjectModel)
@@ -67,26 +131,66 @@ def update_note(id: int, body: NotesSchema, db: Session, current_user: UserModel
     if not subject:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Subject not Found")
 
+    # out of the search index while it still holds the old text, back in once the new text is flushed
+    search.remove_note(db, note.id)
+    # the subject it leaves changes too
+    db.execute(notes_version_update([note.subject_id, body.subject_id]))
     data = body.model_dump()
     for field, value in data.items():
         setattr(note, field, value)
 
     db.add(note)
+    db.flush()
+    revision = revisions.current_revision(db, note.id) + 1
+    revisions.add_revision(db, revisions.snapshot(note, revision))
+    search.index_note(db, note, current_user.id)
+    bump_version(db, current_user.id)
     db.commit()
+    bus.publish(DATA_CHANGED, user_id=current_user.id, notes=True)
     db.refresh(note)
-    return note
+    retrieval_index.note_written(current_user.id, note.id, note.title, note.content)
+    return with_revision(note, revision)
+
+
+def patch_note(id: int, body: NotesPatch, db: Session, current_user: Principal):
+    # only the owned-note lookup: a patch cannot move the note, so the subject check of a PUT is skipped
+    note = find_note(id, db, current_user)
+    search.remove_note(db, note.id)
+    revision = revisions.patch(db, note, body)
+    search.index_note(db, note, current_user.id)
+    db.execute(notes_version_update([note.subject_id]))
+    bump_version(db, current_user.id)
+    result = {"id": note.id, "revision": revision, "title": note.title, "length": len(note.content)}
+    content = note.content
+    db.commit()
+    bus.publish(DATA_CHANGED, user_id=current_user.id, notes=True)
+    retrieval_index.note_written(current_user.id, result["id"], result["title"], content)
+    return result
 
 
-def delete_note(id: int, db: Session, current_user: UserModel):
-    note = (
-        db.query(NotesModel)
-        .join(SubjectModel, NotesModel.subject_id == SubjectModel.id)
-        .filter(NotesModel.id == id, SubjectModel.user_id == current_user.id)
-        .first()
-    )
-    if not note:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Note not Found")
+def list_note_revisions(id: int, limit: int, before: Optional[int], db: Session, current_user: Principal):
+    note = find_note(id, db, current_user)
+    return revisions.list_revisions(db, note.id, limit, before)
 
+
+def get_note_revision(id: int, revision: int, db: Session, current_user: Principal):
+    note = find_note(id, db, current_user)
+    return revisions.load_revision(db, note.id, revision)
+
+
+def delete_note(id: int, db: Session, current_user: Principal):
+    note = find_note(id, db, current_user)
+
+    search.remove_note(db, note.id)
+    release_later(db, revisions.purge(db, [note.id]))
+    db.execute(notes_version_update([note.subject_id]))
     db.delete(note)
+    bump_version(db, current_user.id)
     db.commit()
+    bus.publish(DATA_CHANGED, user_id=current_user.id, notes=True)
+    retrieval_index.note_deleted(current_user.id, id)
     return None
+
+
+def search_notes(query: str, limit: int, subject_id: Optional[int], db: Session, current_user: Principal):
+    return search.search_notes(db, current_user.id, query, limit, subject_id)
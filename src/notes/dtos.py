@@ -1,5 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
+from typing import List, Optional
 
 
 class NotesSchema(BaseModel):
@@ -14,3 +15,100 @@ class NotesResponse(BaseModel):
     content: str
     subject_id: int
     create_at: datetime
+    revision: Optional[int] = None
+
+
+class NotesSummaryResponse(BaseModel):
+    id: int
+    title: str
+    preview: Optional[str] = None
+    subject_id: int
+    create_at: datetime
+
+
+class NotesPage(BaseModel):
+    items: List[NotesResponse]
+    next_cursor: Optional[str] = None
+
+
+class NotesSummaryPage(BaseModel):
+    items: List[NotesSummaryResponse]
+    next_cursor: Optional[str] = None
+
+
+class NotesSearchResult(BaseModel):
+    id: int
+    title: str
+    snippet: str
+    subject_id: int
+    create_at: datetime
+    score: float
+
+
+class BulkImportError(BaseModel):
+    item: str
+    detail: str
+
+
+class BulkImportResponse(BaseModel):
+    imported: int
+    failed: int
+    batches: int
+    errors: List[BulkImportError]
+
+
+class DeltaOp(BaseModel):
+    # exactly one of the three; offsets count characters (Unicode code points)
+    retain: Optional[int] = Field(None, ge=0)
+    insert: Optional[str] = None
+    delete: Optional[int] = Field(None, ge=0)
+
+
+class NotesPatch(BaseModel):
+    base_revision: int = Field(..., ge=0)
+    ops: List[DeltaOp] = []
+    title: Optional[str] = None
+
+
+class NotesPatchResponse(BaseModel):
+    id: int
+    revision: int
+    title: str
+    length: int
+
+
+class NoteRevisionSummary(BaseModel):
+    revision: int
+    kind: str
+    title: str
+    size: int
+    create_at: datetime
+
+
+class NoteRevisionResponse(BaseModel):
+    revision: int
+    title: str
+    content: str
+    create_at: datetime
+
+
+class NotesMove(BaseModel):
+    # either explicit note ids or every note of from_subject_id
+    subject_id: int
+    note_ids: Optional[List[int]] = None
+    from_subject_id: Optional[int] = None
+
+
+class NotesMoveResponse(BaseModel):
+    moved: int
+
+
+class NotesBulkDelete(BaseModel):
+    # filters are combined; at least one is required
+    note_ids: Optional[List[int]] = None
+    subject_id: Optional[int] = None
+    before: Optional[datetime] = None
+
+
+class NotesBulkDeleteResponse(BaseModel):
+    deleted: int
@@ -1,18 +1,244 @@
-from sqlalchemy import Column,Integer,String ,DateTime ,ForeignKey,Text
+from sqlalchemy import Column,Integer,String ,DateTime ,ForeignKey,Text,Index,UniqueConstraint,LargeBinary,delete,event,or_,select
+from sqlalchemy.ext.asyncio import AsyncSession
 from src.utils.db import Base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship,deferred,Session
 from datetime import datetime
+from src.utils.compression import compress,decompress,digest
+from src.utils.constents import NOTE_PREVIEW_LENGTH
+from src.utils.settings import settings
+
+
+class NoteContentModel(Base):
+    # content-addressed note bodies, so identical texts (the same AI answer saved twice) are stored once
+    __tablename__="NoteContents"
+
+    hash=Column(String(64),primary_key=True)
+    codec=Column(String,nullable=False)
+    data=Column(LargeBinary,nullable=False)
+    size=Column(Integer,nullable=False)
+    create_at=Column(DateTime,default=datetime.now)
+
+    @property
+    def text(self):
+        return decompress(self.codec,self.data)
+
 
 class NotesModel(Base):
     __tablename__="Notes"
 
     id =Column(Integer,primary_key=True)
     title=Column(String,nullable=False)
-    content=Column(Text)
-    create_at=Column(DateTime,default=datetime.now())
+    # the plain body, for notes kept outside the content tier; deferred like the tier itself, so
+    # loading a note for its title or preview never reads the body
+    stored_content=deferred(Column("content",Text))
+    content_hash=Column(String(64),ForeignKey("NoteContents.hash"))
+    preview=Column(String)
+    content_length=Column(Integer)
+    create_at=Column(DateTime,default=datetime.now)
 
     subject_id= Column(Integer,ForeignKey("Subject.id"))
 
     subject= relationship("SubjectModel",back_populates="notes")
+    body= relationship("NoteContentModel",lazy="select")
+
+    # keyset pagination walks (subject_id, create_at, id) newest first
+    __table_args__=(
+        Index("ix_notes_subject_id_create_at","subject_id","create_at","id"),
+        Index("ix_notes_create_at_id","create_at","id"),
+        Index("ix_notes_content_hash","content_hash"),
+    )
+
+    @property
+    def content(self):
+        text=getattr(self,"_text",None)
+        if text is None:
+            text=self.stored_content if self.content_hash is None else self.body.text
+            self._text=text
+        return text
+
+    @content.setter
+    def content(self,text):
+        # where the body goes is decided at flush, once the session's database is known
+        self._text=text
+        self._content_changed=True
+        self.preview=text[:NOTE_PREVIEW_LENGTH] if text is not None else None
+        self.content_length=len(text or "")
+
+    def place(self,fields):
+        self.stored_content=fields["stored_content"]
+        self.content_hash=fields["content_hash"]
+
+
+def content_tier_enabled(dialect:str)->bool:
+    # PostgreSQL search indexes the plain content column, so bodies stay there; src.notes.search
+    # refuses NOTE_CONTENT_TIER=on for it at startup
+    if dialect=="postgresql":
+        return False
+    return settings.NOTE_CONTENT_TIER in ("auto","on")
+
+
+def content_fields(text,tier:bool):
+    # returns the Notes column values for a body and the NoteContents row to store, if any
+    fields={
+        "preview":text[:NOTE_PREVIEW_LENGTH] if text is not None else None,
+        "content_length":len(text or ""),
+    }
+    if text is None or not tier:
+        return {**fields,"stored_content":text,"content_hash":None},None
+    codec,data=compress(text,settings.NOTE_CONTENT_CODEC,settings.NOTE_CONTENT_MIN_BYTES)
+    key=digest(text)
+    return {**fields,"stored_content":None,"content_hash":key},{"hash":key,"codec":codec,"data":data,"size":len(text),"create_at":datetime.now()}
+
+
+def insert_contents(session:Session,dialect:str,rows):
+    # rows that already exist are skipped, so concurrent writers of the same text do not collide
+    table=NoteContentModel.__table__
+    if dialect in ("sqlite","postgresql"):
+        if dialect=="sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        session.execute(insert(table).on_conflict_do_nothing(index_elements=["hash"]),rows)
+        return
+    existing=set(session.scalars(select(NoteContentModel.hash).where(NoteContentModel.hash.in_([row["hash"] for row in rows]))))
+    rows=[row for row in rows if row["hash"] not in existing]
+    if rows:
+        session.execute(table.insert(),rows)
+
+
+def contents_lock(hashes,shared:bool):
+    # sorted, so two transactions locking overlapping bodies take the locks in the same order
+    statement=select(NoteContentModel.hash).where(NoteContentModel.hash.in_(sorted(hashes)))
+    return statement.with_for_update(read=True,key_share=True) if shared else statement.with_for_update()
+
+
+def store_contents(session:Session,rows):
+    rows=list({row["hash"]:row for row in rows}.values())
+    if not rows:
+        return
+    dialect=session.get_bind().dialect.name
+    insert_contents(session,dialect,rows)
+    if dialect=="sqlite":
+        # SQLite runs one writer at a time, so no release_contents can interleave with this transaction
+        return
+    # hold the bodies until commit, so a concurrent release_contents cannot delete one a note is about
+    # to point at; any deleted between the insert and the lock are stored again
+    while True:
+        present=set(session.scalars(contents_lock([row["hash"] for row in rows],shared=True)))
+        missing=[row for row in rows if row["hash"] not in present]
+        if not missing:
+            return
+        insert_contents(session,dialect,missing)
+
+
+def content_referenced():
+    # notes and snapshot revisions both point at bodies
+    return or_(
+        select(NotesModel.id).where(NotesModel.content_hash==NoteContentModel.hash).exists(),
+        select(NoteRevisionModel.id).where(NoteRevisionModel.content_hash==NoteContentModel.hash).exists(),
+    )
+
+
+def unreferenced_delete(hashes):
+    # references are checked by the DELETE itself, not by whoever collected the hashes
+    return delete(NoteContentModel).where(NoteContentModel.hash.in_(hashes),~content_referenced()).execution_options(synchronize_session=False)
+
+
+def release_later(session,hashes):
+    # released by the after_flush hook below, once the rows that pointed at them are gone
+    session.info.setdefault("released_contents",set()).update(hashes)
+
+
+def released(hashes):
+    return sorted({key for key in hashes if key})
+
+
+def release_contents(session:Session,hashes)->int:
+    # bodies the notes no longer point at, deleted in the transaction that moved the notes off them
+    hashes=released(hashes)
+    if not hashes:
+        return 0
+    if session.get_bind().dialect.name!="sqlite":
+        session.execute(contents_lock(hashes,shared=False)).all()
+    return session.execute(unreferenced_delete(hashes)).rowcount
+
+
+async def arelease_contents(session:AsyncSession,hashes)->int:
+    hashes=released(hashes)
+    if not hashes:
+        return 0
+    if session.get_bind().dialect.name!="sqlite":
+        (await session.execute(contents_lock(hashes,shared=False))).all()
+    return (await session.execute(unreferenced_delete(hashes))).rowcount
+
+
+@event.listens_for(Session,"before_flush")
+def store_note_contents(session,flush_context,instances):
+    rows=[]
+    tier=None
+    released=session.info.setdefault("released_contents",set())
+    for note in list(session.new)+list(session.dirty):
+        if not isinstance(note,(NotesModel,NoteRevisionModel)) or not getattr(note,"_content_changed",False):
+            continue
+        if tier is None:
+            tier=content_tier_enabled(session.get_bind().dialect.name)
+        fields,row=content_fields(note._text,tier)
+        if note.content_hash!=fields["content_hash"]:
+            released.add(note.content_hash)
+        note.place(fields)
+        note._content_changed=False
+        if row:
+            rows.append(row)
+    for note in session.deleted:
+        if isinstance(note,(NotesModel,NoteRevisionModel)):
+            released.add(note.content_hash)
+    store_contents(session,rows)
+
+
+@event.listens_for(Session,"after_flush")
+def release_note_contents(session,flush_context):
+    # the notes' UPDATE/DELETE has run, so the NOT EXISTS check sees them
+    hashes=session.info.pop("released_contents",None)
+    if hashes:
+        release_contents(session,hashes)
+
+
+class NoteRevisionModel(Base):
+    # kind "snapshot" holds the full content, kind "delta" the JSON ops applied to the previous revision.
+    # A snapshot's body is placed like a note's: in the content tier (sharing the note's NoteContents
+    # row, so it costs no second copy) with `data` left empty, or plain in `data`.
+    __tablename__="NoteRevisions"
+
+    id=Column(Integer,primary_key=True)
+    note_id=Column(Integer,ForeignKey("Notes.id",ondelete="CASCADE"),nullable=False)
+    revision=Column(Integer,nullable=False)
+    kind=Column(String,nullable=False)
+    title=Column(String,nullable=False)
+    data=Column(Text,nullable=False)
+    content_hash=Column(String(64),ForeignKey("NoteContents.hash"))
+    create_at=Column(DateTime,default=datetime.now)
+
+    body=relationship("NoteContentModel",lazy="select")
+
+    # one row per (note, revision); the unique index also serves "latest revision" and range lookups
+    __table_args__=(
+        UniqueConstraint("note_id","revision",name="uq_note_revisions_note_id_revision"),
+        Index("ix_note_revisions_content_hash","content_hash"),
+    )
+
+    @property
+    def content(self):
+        # the snapshot's text, or a delta's encoded ops
+        text=getattr(self,"_text",None)
+        if text is None:
+            text=self.data if self.content_hash is None else self.body.text
+        return text
 
+    @content.setter
+    def content(self,text):
+        self._text=text
+        self._content_changed=True
 
+    def place(self,fields):
+        self.data=fields["stored_content"] or ""
+        self.content_hash=fields["content_hash"]
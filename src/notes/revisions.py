@@ -0,0 +1,268 @@
+import json
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
+
+from src.notes.models import NoteContentModel, NoteRevisionModel, arelease_contents, release_contents
+from src.utils.constents import NOTE_SNAPSHOT_EVERY
+from src.utils.settings import settings
+
+SNAPSHOT = "snapshot"
+DELTA = "delta"
+
+
+def apply_delta(text: str, ops) -> str:
+    # ops are {"retain": n} | {"insert": str} | {"delete": n}, offsets in characters;
+    # whatever follows the last op is kept as is
+    parts = []
+    position = 0
+    for op in ops:
+        retain, insert, remove = op.get("retain"), op.get("insert"), op.get("delete")
+        if sum(value is not None for value in (retain, insert, remove)) != 1:
+            raise ValueError("Each op needs exactly one of retain, insert or delete")
+        if insert is not None:
+            parts.append(insert)
+            continue
+        count = retain if retain is not None else remove
+        if count < 0 or position + count > len(text):
+            raise ValueError(f"Op runs past the end of the note ({len(text)} characters)")
+        if retain is not None:
+            parts.append(text[position: position + count])
+        position += count
+    parts.append(text[position:])
+    return "".join(parts)
+
+
+def encode_ops(ops) -> str:
+    return json.dumps([{key: value for key, value in op.items() if value is not None} for op in ops], separators=(",", ":"))
+
+
+def revision_query(note_id: int):
+    return select(func.coalesce(func.max(NoteRevisionModel.revision), 0)).where(NoteRevisionModel.note_id == note_id)
+
+
+def current_revision(db: Session, note_id: int) -> int:
+    # notes created before revisions existed are at revision 0
+    return db.execute(revision_query(note_id)).scalar_one()
+
+
+async def acurrent_revision(db: AsyncSession, note_id: int) -> int:
+    return (await db.execute(revision_query(note_id))).scalar_one()
+
+
+def snapshot(note, revision: int) -> NoteRevisionModel:
+    # the body is placed at flush, like the note's own, so in the content tier both share one row
+    return NoteRevisionModel(note_id=note.id, revision=revision, kind=SNAPSHOT, title=note.title, content=note.content or "")
+
+
+def snapshot_values(note_id: int, title: str, fields) -> dict:
+    # revision 1 for a note inserted with Core, which skips the flush hook that places snapshot bodies;
+    # fields are the note's placed columns from content_fields(), so both share one NoteContents row
+    return {
+        "note_id": note_id,
+        "revision": 1,
+        "kind": SNAPSHOT,
+        "title": title,
+        "data": fields["stored_content"] or "",
+        "content_hash": fields["content_hash"],
+    }
+
+
+def record_delta(note, revision: int, ops) -> NoteRevisionModel:
+    # a snapshot every NOTE_SNAPSHOT_EVERY revisions bounds how many deltas a lookup replays,
+    # and a delta that is not smaller than the note itself is not worth keeping as a delta
+    data = encode_ops(ops)
+    if revision == 1 or revision % NOTE_SNAPSHOT_EVERY == 0 or len(data) >= len(note.content or ""):
+        return snapshot(note, revision)
+    return NoteRevisionModel(note_id=note.id, revision=revision, kind=DELTA, title=note.title, data=data)
+
+
+def list_query(note_id: int, limit: int, before: int = None):
+    statement = select(
+        NoteRevisionModel.revision,
+        NoteRevisionModel.kind,
+        NoteRevisionModel.title,
+        func.coalesce(NoteContentModel.size, func.length(NoteRevisionModel.data)).label("size"),
+        NoteRevisionModel.create_at,
+    ).outerjoin(NoteContentModel, NoteRevisionModel.content_hash == NoteContentModel.hash).where(NoteRevisionModel.note_id == note_id)
+    if before is not None:
+        statement = statement.where(NoteRevisionModel.revision < before)
+    return statement.order_by(NoteRevisionModel.revision.desc()).limit(limit)
+
+
+def list_revisions(db: Session, note_id: int, limit: int, before: int = None):
+    return db.execute(list_query(note_id, limit, before)).all()
+
+
+async def alist_revisions(db: AsyncSession, note_id: int, limit: int, before: int = None):
+    return (await db.execute(list_query(note_id, limit, before))).all()
+
+
+def base_query(note_id: int, revision: int):
+    # nearest snapshot at or below the revision; it and the deltas after it are read on the unique index
+    return (
+        select(NoteRevisionModel)
+        .options(joinedload(NoteRevisionModel.body))
+        .where(
+            NoteRevisionModel.note_id == note_id,
+            NoteRevisionModel.revision <= revision,
+            NoteRevisionModel.kind == SNAPSHOT,
+        )
+        .order_by(NoteRevisionModel.revision.desc())
+        .limit(1)
+    )
+
+
+def deltas_query(note_id: int, base: NoteRevisionModel, revision: int):
+    return (
+        select(NoteRevisionModel)
+        .options(joinedload(NoteRevisionModel.body))
+        .where(
+            NoteRevisionModel.note_id == note_id,
+            NoteRevisionModel.revision > base.revision,
+            NoteRevisionModel.revision <= revision,
+        )
+        .order_by(NoteRevisionModel.revision)
+    )
+
+
+def missing_revision():
+    return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Revision not Found")
+
+
+def replay(base: NoteRevisionModel, deltas, revision: int):
+    content, title, reached, created = base.content, base.title, base.revision, base.create_at
+    for row in deltas:
+        content = row.content if row.kind == SNAPSHOT else apply_delta(content, json.loads(row.data))
+        title, reached, created = row.title, row.revision, row.create_at
+    if reached != revision:
+        raise missing_revision()
+    return {"revision": revision, "title": title, "content": content, "create_at": created}
+
+
+def load_revision(db: Session, note_id: int, revision: int):
+    base = db.execute(base_query(note_id, revision)).scalar_one_or_none()
+    if base is None:
+        raise missing_revision()
+    return replay(base, db.execute(deltas_query(note_id, base, revision)).scalars(), revision)
+
+
+async def aload_revision(db: AsyncSession, note_id: int, revision: int):
+    base = (await db.execute(base_query(note_id, revision))).scalar_one_or_none()
+    if base is None:
+        raise missing_revision()
+    return replay(base, (await db.execute(deltas_query(note_id, base, revision))).scalars(), revision)
+
+
+def purge_query(note_ids):
+    # note_ids is a list or a select of ids; SQLite does not enforce the ON DELETE CASCADE by default
+    return delete(NoteRevisionModel).where(NoteRevisionModel.note_id.in_(note_ids))
+
+
+def snapshot_hashes(*criteria):
+    return select(NoteRevisionModel.content_hash).where(*criteria, NoteRevisionModel.content_hash.is_not(None)).distinct()
+
+
+def purge(db: Session, note_ids) -> list:
+    # returns the bodies the deleted snapshots pointed at, for the caller to release
+    hashes = db.scalars(snapshot_hashes(NoteRevisionModel.note_id.in_(note_ids))).all()
+    db.execute(purge_query(note_ids))
+    return hashes
+
+
+async def apurge(db: AsyncSession, note_ids) -> list:
+    hashes = (await db.scalars(snapshot_hashes(NoteRevisionModel.note_id.in_(note_ids)))).all()
+    await db.execute(purge_query(note_ids))
+    return hashes
+
+
+def pruned(note_id: int):
+    # revisions below the NOTE_KEEP_SNAPSHOTS-th newest snapshot; every kept delta still has its base.
+    # With fewer snapshots the subquery is NULL and nothing matches.
+    oldest_kept = (
+        select(NoteRevisionModel.revision)
+        .where(NoteRevisionModel.note_id == note_id, NoteRevisionModel.kind == SNAPSHOT)
+        .order_by(NoteRevisionModel.revision.desc())
+        .offset(settings.NOTE_KEEP_SNAPSHOTS - 1)
+        .limit(1)
+        .scalar_subquery()
+    )
+    return (NoteRevisionModel.note_id == note_id, NoteRevisionModel.revision < oldest_kept)
+
+
+def prune(db: Session, note_id: int) -> int:
+    # runs when a snapshot is added, so history stays bounded however many autosaves a note gets
+    if settings.NOTE_KEEP_SNAPSHOTS <= 0:
+        return 0
+    criteria = pruned(note_id)
+    hashes = db.scalars(snapshot_hashes(*criteria)).all()
+    removed = db.execute(delete(NoteRevisionModel).where(*criteria).execution_options(synchronize_session=False)).rowcount
+    release_contents(db, hashes)
+    return removed
+
+
+async def aprune(db: AsyncSession, note_id: int) -> int:
+    if settings.NOTE_KEEP_SNAPSHOTS <= 0:
+        return 0
+    criteria = pruned(note_id)
+    hashes = (await db.scalars(snapshot_hashes(*criteria))).all()
+    removed = (await db.execute(delete(NoteRevisionModel).where(*criteria).execution_options(synchronize_session=False))).rowcount
+    await arelease_contents(db, hashes)
+    return removed
+
+
+def revision_conflict():
+    return HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Note was changed by another request")
+
+
+def add_revision(db: Session, row: NoteRevisionModel):
+    db.add(row)
+    try:
+        db.flush()
+    except IntegrityError:
+        # another write took this revision number first
+        db.rollback()
+        raise revision_conflict()
+    if row.kind == SNAPSHOT:
+        prune(db, row.note_id)
+
+
+async def aadd_revision(db: AsyncSession, row: NoteRevisionModel):
+    db.add(row)
+    try:
+        await db.flush()
+    except IntegrityError:
+        await db.rollback()
+        raise revision_conflict()
+    if row.kind == SNAPSHOT:
+        await aprune(db, row.note_id)
+
+
+def apply_patch(note, body, current: int) -> NoteRevisionModel:
+    # applies a NotesPatch to the loaded note and returns the revision row to record
+    if body.base_revision != current:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Note is at revision {current}")
+    ops = [op.model_dump() for op in body.ops]
+    try:
+        note.content = apply_delta(note.content or "", ops)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    if body.title is not None:
+        note.title = body.title
+    return record_delta(note, current + 1, ops)
+
+
+def patch(db: Session, note, body) -> int:
+    # the caller commits
+    row = apply_patch(note, body, current_revision(db, note.id))
+    add_revision(db, row)
+    return row.revision
+
+
+async def apatch(db: AsyncSession, note, body) -> int:
+    row = apply_patch(note, body, await acurrent_revision(db, note.id))
+    await aadd_revision(db, row)
+    return row.revision
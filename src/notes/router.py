@@ -1,43 +1,103 @@
-from fastapi import APIRouter, Depends, status, Request
+from fastapi import APIRouter, Depends, Query, Response, status, Request
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Literal, Optional, Union
 
 from src.notes import controller
-from src.notes.dtos import NotesSchema, NotesResponse
+from src.notes.dtos import (
+    NotesSchema,
+    NotesResponse,
+    NotesPage,
+    NotesSummaryPage,
+    NotesSearchResult,
+    NotesPatch,
+    NotesPatchResponse,
+    NoteRevisionSummary,
+    NoteRevisionResponse,
+)
 from src.users import controller as user_controller
-from src.users.models import UserModel
-from src.utils.db import get_db
+from src.users.auth import Principal
+from src.utils.constents import NOTES_PAGE_DEFAULT_LIMIT, NOTES_PAGE_MAX_LIMIT, NOTE_REVISIONS_PAGE_LIMIT
+from src.utils.db import get_db, get_read_db
+from src.utils.etags import check_not_modified, current_version
 
 
 notes_routes = APIRouter(prefix="/notes")
 
 
-def get_current_user(request: Request, db: Session = Depends(get_db)):
+def get_current_user(request: Request, db: Session = Depends(get_read_db)):
     return user_controller.is_authenticated(request, db)
 
 
+def conditional_read(
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    check_not_modified(request, response, current_user.id, current_version(db, current_user.id))
+
+
 @notes_routes.post("/create", response_model=NotesResponse, status_code=status.HTTP_201_CREATED)
 def create_note(
     body: NotesSchema,
     db: Session = Depends(get_db),
-    current_user: UserModel = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     return controller.create_note(body, db, current_user)
 
 
-@notes_routes.get("/get", response_model=List[NotesResponse], status_code=status.HTTP_200_OK)
+@notes_routes.get(
+    "/get",
+    response_model=List[NotesResponse],
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(conditional_read)],
+)
 def get_notes(
-    db: Session = Depends(get_db),
-    current_user: UserModel = Depends(get_current_user),
+    subject_id: Optional[int] = None,
+    db: Session = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    return controller.get_notes(db, current_user, subject_id)
+
+
+@notes_routes.get(
+    "/list",
+    response_model=Union[NotesPage, NotesSummaryPage],
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(conditional_read)],
+)
+def list_notes(
+    limit: int = Query(NOTES_PAGE_DEFAULT_LIMIT, ge=1, le=NOTES_PAGE_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    subject_id: Optional[int] = None,
+    view: Literal["summary", "full"] = "summary",
+    db: Session = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    return controller.get_notes_page(db, current_user, limit, cursor, subject_id, view)
+
+
+@notes_routes.get("/search", response_model=List[NotesSearchResult], status_code=status.HTTP_200_OK)
+def search_notes(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(NOTES_PAGE_DEFAULT_LIMIT, ge=1, le=NOTES_PAGE_MAX_LIMIT),
+    subject_id: Optional[int] = None,
+    db: Session = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_user),
 ):
-    return controller.get_notes(db, current_user)
+    return controller.search_notes(q, limit, subject_id, db, current_user)
 
 
-@notes_routes.get("/get_note/{id}", response_model=NotesResponse, status_code=status.HTTP_200_OK)
+@notes_routes.get(
+    "/get_note/{id}",
+    response_model=NotesResponse,
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(conditional_read)],
+)
 def get_noteById(
     id: int,
-    db: Session = Depends(get_db),
-    current_user: UserModel = Depends(get_current_user),
+    db: Session = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_user),
 ):
     return controller.get_notebyId(id, db, current_user)
 
@@ -47,15 +107,46 @@ def update_note(
     id: int,
     body: NotesSchema,
     db: Session = Depends(get_db),
-    current_user: UserModel = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     return controller.update_note(id, body, db, current_user)
 
 
+@notes_routes.patch("/patch/{id}", response_model=NotesPatchResponse, status_code=status.HTTP_200_OK)
+def patch_note(
+    id: int,
+    body: NotesPatch,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    return controller.patch_note(id, body, db, current_user)
+
+
+@notes_routes.get("/revisions/{id}", response_model=List[NoteRevisionSummary], status_code=status.HTTP_200_OK)
+def list_note_revisions(
+    id: int,
+    limit: int = Query(NOTE_REVISIONS_PAGE_LIMIT, ge=1, le=NOTE_REVISIONS_PAGE_LIMIT),
+    before: Optional[int] = None,
+    db: Session = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    return controller.list_note_revisions(id, limit, before, db, current_user)
+
+
+@notes_routes.get("/revisions/{id}/{revision}", response_model=NoteRevisionResponse, status_code=status.HTTP_200_OK)
+def get_note_revision(
+    id: int,
+    revision: int,
+    db: Session = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    return controller.get_note_revision(id, revision, db, current_user)
+
+
 @notes_routes.delete("/delete/{id}", response_model=None, status_code=status.HTTP_204_NO_CONTENT)
 def delete_note(
     id: int,
     db: Session = Depends(get_db),
-    current_user: UserModel = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     return controller.delete_note(id, db, current_user)
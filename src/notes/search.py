@@ -0,0 +1,292 @@
+import re
+from typing import Optional
+
+from sqlalchemy import column, event, insert, literal, select, table, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from src.utils.compression import decompress
+from src.utils.db import engine
+from src.utils.settings import settings
+
+MARK_START = "<mark>"
+MARK_END = "</mark>"
+SNIPPET_WORDS = 16
+
+FTS_COLUMNS = ["rowid", "title", "content", "owner"]
+notes_fts = table("notes_fts", column("notes_fts"), *(column(name) for name in FTS_COLUMNS))
+fts_source = table("notes_fts_source", column("id"), column("title"), column("content"), column("owner"))
+
+
+def note_body(codec, data, stored):
+    return decompress(codec, data) if codec is not None else stored or ""
+
+
+@event.listens_for(Engine, "connect")
+def register_note_body(dbapi_connection, connection_record):
+    # on every SQLite connection, sync or aiosqlite, primary or replica: any of them may read the view
+    create_function = getattr(dbapi_connection, "create_function", None)
+    if create_function is not None:
+        create_function("note_body", 3, note_body, deterministic=True)
+
+
+def tokenize(query: str):
+    return re.findall(r"\w+", query.lower())
+
+
+class SQLiteSearchBackend:
+    # FTS5 over an external-content view, so the index holds no second copy of the bodies; the view
+    # decompresses them with note_body() when snippet() or a rebuild reads it. FTS5 only removes a
+    # row given the values it was indexed with, so writers remove a note before changing it and
+    # index it again afterwards, both straight from the view.
+    # `owner` is an indexed column holding "u<user_id>" so the MATCH itself is scoped to one user;
+    # the query terms are scoped to title and content, so a term never matches an owner.
+
+    def setup(self, bind):
+        with bind.begin() as conn:
+            existing = conn.execute(
+                text("SELECT sql FROM sqlite_master WHERE type='table' AND name='notes_fts'")
+            ).scalar()
+            if existing and "content=" in existing:
+                return
+            if existing:
+                # the earlier table kept its own copy of every body
+                conn.execute(text("DROP TABLE notes_fts"))
+            conn.execute(
+                text(
+                    "CREATE VIEW IF NOT EXISTS notes_fts_source AS "
+                    "SELECT n.id AS id, n.title AS title, note_body(b.codec, b.data, n.content) AS content, "
+                    "'u' || s.user_id AS owner "
+                    'FROM "Notes" n JOIN "Subject" s ON s.id = n.subject_id '
+                    'LEFT JOIN "NoteContents" b ON b.hash = n.content_hash'
+                )
+            )
+            conn.execute(
+                text(
+                    "CREATE VIRTUAL TABLE notes_fts USING fts5("
+                    "title, content, owner, content='notes_fts_source', content_rowid='id', "
+                    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+                )
+            )
+            conn.execute(text("INSERT INTO notes_fts(notes_fts) VALUES ('rebuild')"))
+
+    def index_statements(self, note, user_id: int):
+        return self.index_many_statements([{"id": note.id}], user_id)
+
+    def index_many_statements(self, notes, user_id: int):
+        source = select(fts_source.c.id, fts_source.c.title, fts_source.c.content, fts_source.c.owner)
+        ids = [note["id"] for note in notes]
+        return [(insert(notes_fts).from_select(FTS_COLUMNS, source.where(fts_source.c.id.in_(ids))), None)]
+
+    def remove_statements(self, note_id: int):
+        return self.remove_many_statements([note_id])
+
+    def remove_many_statements(self, note_ids):
+        source = select(
+            literal("delete"), fts_source.c.id, fts_source.c.title, fts_source.c.content, fts_source.c.owner
+        ).where(fts_source.c.id.in_(note_ids))
+        return [(insert(notes_fts).from_select(["notes_fts", *FTS_COLUMNS], source), None)]
+
+    def search_query(self, user_id: int, terms, limit: int, subject_id: Optional[int]):
+        match = f"owner:u{user_id} AND " + " AND ".join(f'{{title content}}: "{term}"*' for term in terms)
+        sql = (
+            "SELECT n.id AS id, "
+            f"highlight(notes_fts, 0, '{MARK_START}', '{MARK_END}') AS title, "
+            f"snippet(notes_fts, 1, '{MARK_START}', '{MARK_END}', '…', {SNIPPET_WORDS}) AS snippet, "
+            "n.subject_id AS subject_id, n.create_at AS create_at, "
+            # bm25() is lower-is-better; title hits weigh more than body hits, owner not at all
+            "-bm25(notes_fts, 10.0, 1.0, 0.0) AS score "
+            'FROM notes_fts JOIN "Notes" n ON n.id = notes_fts.rowid '
+            "WHERE notes_fts MATCH :match"
+        )
+        params = {"match": match, "limit": limit}
+        if subject_id is not None:
+            sql += " AND n.subject_id = :subject_id"
+            params["subject_id"] = subject_id
+        sql += " ORDER BY bm25(notes_fts, 10.0, 1.0, 0.0) LIMIT :limit"
+        return text(sql), params
+
+    def results(self, rows, terms, limit: int):
+        return [dict(row._mapping) for row in rows]
+
+
+class PostgresSearchBackend:
+    # The GIN expression index is maintained by PostgreSQL on every write, so indexing is a no-op.
+    # It reads Notes.content, which is why bodies never move to the content tier on PostgreSQL.
+
+    document = "to_tsvector('english', coalesce(n.title, '') || ' ' || coalesce(n.content, ''))"
+
+    def setup(self, bind):
+        with bind.begin() as conn:
+            conn.execute(
+                text(
+                    'CREATE INDEX IF NOT EXISTS ix_notes_fts ON "Notes" USING GIN '
+                    "(to_tsvector('english', coalesce(title, '') || ' ' || coalesce(content, '')))"
+                )
+            )
+
+    def index_statements(self, note, user_id: int):
+        return []
+
+    def index_many_statements(self, notes, user_id: int):
+        return []
+
+    def remove_statements(self, note_id: int):
+        return []
+
+    def remove_many_statements(self, note_ids):
+        return []
+
+    def search_query(self, user_id: int, terms, limit: int, subject_id: Optional[int]):
+        options = f"StartSel={MARK_START},StopSel={MARK_END},MaxWords={SNIPPET_WORDS},MinWords=5"
+        sql = (
+            "SELECT n.id AS id, "
+            f"ts_headline('english', n.title, q, 'StartSel={MARK_START},StopSel={MARK_END},HighlightAll=true') AS title, "
+            f"ts_headline('english', coalesce(n.content, ''), q, '{options}') AS snippet, "
+            "n.subject_id AS subject_id, n.create_at AS create_at, "
+            f"ts_rank_cd({self.document}, q) AS score "
+            'FROM "Notes" n JOIN "Subject" s ON n.subject_id = s.id, '
+            "to_tsquery('english', :query) q "
+            f"WHERE s.user_id = :user_id AND {self.document} @@ q"
+        )
+        params = {"query": " & ".join(f"{term}:*" for term in terms), "user_id": user_id, "limit": limit}
+        if subject_id is not None:
+            sql += " AND n.subject_id = :subject_id"
+            params["subject_id"] = subject_id
+        sql += " ORDER BY score DESC LIMIT :limit"
+        return text(sql), params
+
+    def results(self, rows, terms, limit: int):
+        return [dict(row._mapping) for row in rows]
+
+
+class LikeSearchBackend:
+    # Portable fallback for dialects without a full-text engine; scans the user's notes in Python,
+    # since bodies in the content tier are compressed and cannot be matched with LIKE.
+
+    def setup(self, bind):
+        return None
+
+    def index_statements(self, note, user_id: int):
+        return []
+
+    def index_many_statements(self, notes, user_id: int):
+        return []
+
+    def remove_statements(self, note_id: int):
+        return []
+
+    def remove_many_statements(self, note_ids):
+        return []
+
+    def search_query(self, user_id: int, terms, limit: int, subject_id: Optional[int]):
+        from src.notes.content import body_columns, join_bodies
+        from src.notes.models import NotesModel
+        from src.subject.models import SubjectModel
+
+        statement = join_bodies(
+            select(NotesModel.id, NotesModel.title, NotesModel.subject_id, NotesModel.create_at, *body_columns())
+        ).join(SubjectModel, NotesModel.subject_id == SubjectModel.id).where(SubjectModel.user_id == user_id)
+        if subject_id is not None:
+            statement = statement.where(NotesModel.subject_id == subject_id)
+        return statement, None
+
+    def results(self, rows, terms, limit: int):
+        from src.notes.content import read_body
+
+        results = []
+        for row in rows:
+            body = read_body(row) or ""
+            title, content = row.title.lower(), body.lower()
+            if not all(term in title or term in content for term in terms):
+                continue
+            score = sum(title.count(term) * 10 + content.count(term) for term in terms)
+            position = min((content.find(term) for term in terms if term in content), default=0)
+            results.append(
+                {
+                    "id": row.id,
+                    "title": row.title,
+                    "snippet": body[max(position - 40, 0): position + 160],
+                    "subject_id": row.subject_id,
+                    "create_at": row.create_at,
+                    "score": float(score),
+                }
+            )
+        results.sort(key=lambda row: row["score"], reverse=True)
+        return results[:limit]
+
+
+def get_backend(dialect: str):
+    if dialect == "sqlite":
+        return SQLiteSearchBackend()
+    if dialect == "postgresql":
+        if settings.NOTE_CONTENT_TIER == "on":
+            raise RuntimeError("NOTE_CONTENT_TIER=on is not supported on PostgreSQL, whose search reads Notes.content")
+        return PostgresSearchBackend()
+    return LikeSearchBackend()
+
+
+backend = get_backend(engine.dialect.name)
+
+
+def setup(bind=engine):
+    backend.setup(bind)
+
+
+def execute(db: Session, statements):
+    for statement, params in statements:
+        db.execute(statement, params)
+
+
+async def aexecute(db: AsyncSession, statements):
+    for statement, params in statements:
+        await db.execute(statement, params)
+
+
+def index_note(db: Session, note, user_id: int):
+    # after the note is flushed; an existing note must have gone through remove_note before it changed
+    execute(db, backend.index_statements(note, user_id))
+
+
+async def aindex_note(db: AsyncSession, note, user_id: int):
+    await aexecute(db, backend.index_statements(note, user_id))
+
+
+def index_many(db: Session, notes, user_id: int):
+    # notes are freshly inserted rows given as mappings with id, title and content
+    if notes:
+        execute(db, backend.index_many_statements(notes, user_id))
+
+
+def remove_note(db: Session, note_id: int):
+    execute(db, backend.remove_statements(note_id))
+
+
+async def aremove_note(db: AsyncSession, note_id: int):
+    await aexecute(db, backend.remove_statements(note_id))
+
+
+def remove_many(db: Session, note_ids):
+    # note_ids is a list or a select of ids, so a whole subject is removed in one statement
+    execute(db, backend.remove_many_statements(note_ids))
+
+
+async def aremove_many(db: AsyncSession, note_ids):
+    await aexecute(db, backend.remove_many_statements(note_ids))
+
+
+def search_notes(db: Session, user_id: int, query: str, limit: int, subject_id: Optional[int] = None):
+    terms = tokenize(query)
+    if not terms:
+        return []
+    statement, params = backend.search_query(user_id, terms, limit, subject_id)
+    return backend.results(db.execute(statement, params).all(), terms, limit)
+
+
+async def asearch_notes(db: AsyncSession, user_id: int, query: str, limit: int, subject_id: Optional[int] = None):
+    terms = tokenize(query)
+    if not terms:
+        return []
+    statement, params = backend.search_query(user_id, terms, limit, subject_id)
+    return backend.results((await db.execute(statement, params)).all(), terms, limit)
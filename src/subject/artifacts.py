@@ -0,0 +1,274 @@
+import asyncio
+from datetime import datetime
+
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from src.chatbot import upstream
+from src.chatbot.chains import ARTIFACT_PROMPT, ARTIFACT_PROMPT_VERSION, ARTIFACT_TASKS, artifact_chain
+from src.chatbot.retrieval import chunk_text
+from src.chatbot.upstream import inflight
+from src.chatbot.usage import usage_meter, user_client
+from src.metrics.registry import registry
+from src.notes.content import body_columns, join_bodies, read_body
+from src.notes.models import NotesModel
+from src.subject.models import ArtifactPartModel, SubjectArtifactModel, SubjectModel
+from src.users.auth import Principal
+from src.utils.compression import digest
+from src.utils.db import SessionLocal
+from src.utils.settings import settings
+from src.utils.tokens import estimate_tokens
+
+ARTIFACT_KINDS = ("summary", "flashcards", "qa")
+
+artifact_steps = registry.counter("artifact_steps_total", "Artifact map/reduce steps, by step and whether the LLM was called")
+
+
+def check_subject(subject_id: int, db: Session, current_user: Principal) -> int:
+    # returns the subject's notes_version
+    subject = (
+        db.query(SubjectModel.notes_version)
+        .filter(SubjectModel.id == subject_id, SubjectModel.user_id == current_user.id)
+        .first()
+    )
+    if not subject:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Subject not Found")
+    return subject.notes_version
+
+
+def source_chunks(db: Session, subject_id: int):
+    # notes in id order, so an edit to one note leaves every other chunk, and its hash, as it was
+    rows = (
+        join_bodies(db.query(NotesModel.id, NotesModel.title, *body_columns()))
+        .filter(NotesModel.subject_id == subject_id)
+        .order_by(NotesModel.id)
+        .yield_per(500)
+    )
+    return [
+        f"### {row.title}\n{text}"
+        for row in rows
+        for text in chunk_text(read_body(row), settings.ARTIFACT_CHUNK_TOKENS)
+    ]
+
+
+def step_key(step: str, text: str) -> str:
+    return digest(f"{ARTIFACT_PROMPT_VERSION}\n{step}\n{text}")
+
+
+def source_hash(chunks) -> str:
+    return digest("\n".join(step_key("condense", chunk) for chunk in chunks))
+
+
+def artifact_view(rows, notes_version: int):
+    order = {kind: index for index, kind in enumerate(ARTIFACT_KINDS)}
+    return [
+        {
+            "kind": row.kind,
+            "content": row.content,
+            "chunks": row.chunks,
+            "stale": row.source_version != notes_version,
+            "update_at": row.update_at,
+        }
+        for row in sorted(rows, key=lambda row: order.get(row.kind, len(order)))
+    ]
+
+
+def get_artifacts(subject_id: int, db: Session, current_user: Principal):
+    # never calls the LLM nor reads the notes: serves the stored artifacts and says whether the
+    # subject's notes_version moved since they were built
+    notes_version = check_subject(subject_id, db, current_user)
+    rows = db.query(SubjectArtifactModel).filter(SubjectArtifactModel.subject_id == subject_id).all()
+    chunks = max((row.chunks for row in rows), default=0)
+    return {"subject_id": subject_id, "chunks": chunks, "artifacts": artifact_view(rows, notes_version)}
+
+
+def artifact_deletes(subject_id: int):
+    return [
+        delete(model).where(model.subject_id == subject_id).execution_options(synchronize_session=False)
+        for model in (SubjectArtifactModel, ArtifactPartModel)
+    ]
+
+
+def remove_artifacts(db: Session, subject_id: int):
+    # part of deleting a subject; the caller commits
+    for statement in artifact_deletes(subject_id):
+        db.execute(statement)
+
+
+async def aremove_artifacts(db: AsyncSession, subject_id: int):
+    for statement in artifact_deletes(subject_id):
+        await db.execute(statement)
+
+
+class ArtifactBuild:
+    # One map-reduce run. Every step's output is looked up by step_key first, so only chunks whose
+    # text changed (and the merges and artifacts above them) reach the LLM.
+
+    def __init__(self, client: str, known: dict):
+        self.client = client
+        self.known = known
+        self.steps = {}
+        self.generated = 0
+        self.reused = 0
+        self.fan_out = asyncio.Semaphore(settings.ARTIFACT_CONCURRENCY)
+
+    async def step(self, step: str, text: str) -> str:
+        key = step_key(step, text)
+        # identical chunks (a note saved twice) share one call
+        if key not in self.steps:
+            self.steps[key] = asyncio.ensure_future(self.run(key, step, text))
+        return await self.steps[key]
+
+    async def run(self, key: str, step: str, text: str) -> str:
+        if key in self.known:
+            self.reused += 1
+            artifact_steps.inc(step=step, llm="no")
+            return self.known[key]
+        async with self.fan_out:
+            # checked per call: the budget can run out part way through a build
+            await run_in_threadpool(usage_meter.check, self.client)
+            inputs = {"task": ARTIFACT_TASKS[step], "text": text}
+            output = await upstream.call(lambda: artifact_chain().ainvoke(inputs))
+        usage_meter.record(self.client, estimate_tokens(ARTIFACT_PROMPT.format(**inputs)), estimate_tokens(output))
+        self.generated += 1
+        artifact_steps.inc(step=step, llm="yes")
+        return output
+
+    async def reduce(self, parts) -> str:
+        # merge fixed groups of neighbours rather than packing by size, so an edit inside one note
+        # only changes the merges on its own path up the tree
+        fanout = max(settings.ARTIFACT_REDUCE_FANOUT, 2)
+        while len(parts) > 1 and estimate_tokens("\n\n".join(parts)) > settings.ARTIFACT_REDUCE_TOKENS:
+            groups = [parts[i: i + fanout] for i in range(0, len(parts), fanout)]
+            parts = await asyncio.gather(*(self.step("merge", "\n\n".join(group)) for group in groups))
+        return "\n\n".join(parts)
+
+    async def build(self, chunks) -> dict:
+        try:
+            condensed = await asyncio.gather(*(self.step("condense", chunk) for chunk in chunks))
+            text = await self.reduce(list(condensed))
+            outputs = await asyncio.gather(*(self.step(kind, text) for kind in ARTIFACT_KINDS))
+            return dict(zip(ARTIFACT_KINDS, outputs))
+        finally:
+            for task in self.steps.values():
+                task.cancel()
+
+    def parts(self) -> dict:
+        return {key: task.result() for key, task in self.steps.items()}
+
+
+def load_build(subject_id: int):
+    with SessionLocal() as db:
+        # read before the notes: an edit landing in between leaves the artifacts marked stale
+        notes_version = db.scalar(select(SubjectModel.notes_version).where(SubjectModel.id == subject_id))
+        chunks = source_chunks(db, subject_id)
+        known = dict(
+            db.query(ArtifactPartModel.hash, ArtifactPartModel.output)
+            .filter(ArtifactPartModel.subject_id == subject_id)
+            .all()
+        )
+    return notes_version, chunks, known
+
+
+def insert_parts(db: Session, rows):
+    # a build of the same subject in another process may have stored some of them already
+    if not rows:
+        return
+    table = ArtifactPartModel.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        db.execute(insert(table).on_conflict_do_nothing(index_elements=["subject_id", "hash"]), rows)
+        return
+    existing = set(
+        db.scalars(
+            select(ArtifactPartModel.hash).where(
+                ArtifactPartModel.subject_id == rows[0]["subject_id"],
+                ArtifactPartModel.hash.in_([row["hash"] for row in rows]),
+            )
+        )
+    )
+    rows = [row for row in rows if row["hash"] not in existing]
+    if rows:
+        db.execute(table.insert(), rows)
+
+
+def save_build(subject_id: int, notes_version: int, chunks: int, current_hash: str, outputs: dict, parts: dict, known: dict):
+    now = datetime.now()
+    with SessionLocal() as db:
+        # the subject may have been deleted while the LLM calls ran
+        if db.get(SubjectModel, subject_id) is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Subject not Found")
+        insert_parts(
+            db,
+            [
+                {"subject_id": subject_id, "hash": key, "output": output, "create_at": now}
+                for key, output in parts.items()
+                if key not in known
+            ],
+        )
+        # outputs for chunks that no longer exist will not be asked for again
+        db.execute(
+            delete(ArtifactPartModel)
+            .where(ArtifactPartModel.subject_id == subject_id, ArtifactPartModel.hash.not_in(list(parts)))
+            .execution_options(synchronize_session=False)
+        )
+        rows = {
+            row.kind: row
+            for row in db.query(SubjectArtifactModel).filter(SubjectArtifactModel.subject_id == subject_id)
+        }
+        for kind, content in outputs.items():
+            row = rows.get(kind)
+            if row is None:
+                row = rows[kind] = SubjectArtifactModel(subject_id=subject_id, kind=kind)
+                db.add(row)
+            row.content = content
+            row.source_hash = current_hash
+            row.source_version = notes_version
+            row.chunks = chunks
+            row.update_at = now
+        db.commit()
+        return artifact_view(rows.values(), notes_version)
+
+
+async def run_build(subject_id: int, client: str):
+    notes_version, chunks, known = await run_in_threadpool(load_build, subject_id)
+    if not chunks:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Subject has no notes to build from")
+    if len(chunks) > settings.ARTIFACT_MAX_CHUNKS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Subject is too large: {len(chunks)} chunks, at most {settings.ARTIFACT_MAX_CHUNKS}",
+        )
+    build = ArtifactBuild(client, known)
+    outputs = await build.build(chunks)
+    current_hash = source_hash(chunks)
+    artifacts = await run_in_threadpool(
+        save_build, subject_id, notes_version, len(chunks), current_hash, outputs, build.parts(), known
+    )
+    return {
+        "subject_id": subject_id,
+        "chunks": len(chunks),
+        "artifacts": artifacts,
+        "build": {"generated": build.generated, "reused": build.reused},
+    }
+
+
+def check_build(subject_id: int, client: str, current_user: Principal):
+    with SessionLocal() as db:
+        check_subject(subject_id, db, current_user)
+    usage_meter.check(client)
+
+
+async def build_artifacts(subject_id: int, current_user: Principal):
+    client = user_client(current_user.id)
+    # ownership is checked before joining a running build, which would hand over its result
+    await run_in_threadpool(check_build, subject_id, client, current_user)
+    # concurrent builds of one subject in this process share a single run
+    return await inflight.do(f"artifacts:{subject_id}", lambda: run_build(subject_id, client))
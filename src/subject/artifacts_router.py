@@ -0,0 +1,35 @@
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from src.notes.router import get_current_user
+from src.subject import artifacts
+from src.subject.dtos import SubjectArtifacts, SubjectArtifactsBuild
+from src.users.auth import Principal
+from src.utils.db import get_read_db
+
+logger = logging.getLogger("smartnotes.artifacts")
+
+subject_artifact_routes = APIRouter(prefix="/subjects")
+
+
+@subject_artifact_routes.get("/{id}/artifacts", response_model=SubjectArtifacts, status_code=status.HTTP_200_OK)
+def get_artifacts(id: int, db: Session = Depends(get_read_db), current_user: Principal = Depends(get_current_user)):
+    return artifacts.get_artifacts(id, db, current_user)
+
+
+@subject_artifact_routes.post("/{id}/artifacts/build", response_model=SubjectArtifactsBuild, status_code=status.HTTP_200_OK)
+async def build_artifacts(id: int, current_user: Principal = Depends(get_current_user)):
+    # summary, flashcards and Q&A from the subject's notes; only changed chunks reach the LLM
+    try:
+        return await artifacts.build_artifacts(id, current_user)
+    except HTTPException:
+        raise
+    except Exception:
+        # the error text can carry provider or database internals; it stays in the log
+        logger.exception("building artifacts for subject %s failed", id)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Artifact build failed",
+        )
@@ -0,0 +1,63 @@
+from src.subject.dtos import SubjectSchema
+from sqlalchemy import delete,select
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.subject.models import SubjectModel
+from src.notes import bulk
+from src.subject.artifacts import aremove_artifacts
+from src.notes.models import NotesModel
+from src.chatbot.retrieval import retrieval_index
+from src.utils.bus import DATA_CHANGED,bus
+from src.users.auth import Principal
+from src.utils.etags import abump_version
+from fastapi import HTTPException,status
+
+
+async def find_subject(id:int,db:AsyncSession,current_user:Principal,*options):
+    result=await db.execute(
+        select(SubjectModel).options(*options).where(SubjectModel.id==id,SubjectModel.user_id==current_user.id)
+    )
+    subject=result.scalar_one_or_none()
+    if not subject:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail="Subject not Found")
+    return subject
+
+async def create_subject(body:SubjectSchema,db:AsyncSession,current_user:Principal):
+    new_subject= SubjectModel(
+        title= body.title,
+        user_id= current_user.id
+    )
+    db.add(new_subject)
+    await abump_version(db,current_user.id)
+    await db.commit()
+    bus.publish(DATA_CHANGED,user_id=current_user.id,notes=False)
+    await db.refresh(new_subject)
+    return new_subject
+
+async def get_subjects(db:AsyncSession,current_user:Principal):
+    result=await db.execute(select(SubjectModel).where(SubjectModel.user_id==current_user.id))
+    return result.scalars().all()
+
+async def get_subjectbyId(id:int,db:AsyncSession,current_user:Principal):
+    return await find_subject(id,db,current_user)
+
+async def updateSubject(id:int,body:SubjectSchema,db:AsyncSession,current_user:Principal):
+    subject=await find_subject(id,db,current_user)
+    for field,value in body.model_dump().items():
+        setattr(subject,field,value)
+    await abump_version(db,current_user.id)
+    await db.commit()
+    bus.publish(DATA_CHANGED,user_id=current_user.id,notes=False)
+    await db.refresh(subject)
+    return subject
+
+async def delete_subject(id:int,db:AsyncSession,current_user:Principal):
+    await find_subject(id,db,current_user)
+    # set-based instead of the ORM cascade, which would load every note just to delete it
+    await bulk.aremove_notes(db,[NotesModel.subject_id==id])
+    await aremove_artifacts(db,id)
+    await db.execute(delete(SubjectModel).where(SubjectModel.id==id).execution_options(synchronize_session=False))
+    await abump_version(db,current_user.id)
+    await db.commit()
+    bus.publish(DATA_CHANGED,user_id=current_user.id,notes=True)
+    retrieval_index.forget_user(current_user.id)
+    return None
@@ -0,0 +1,37 @@
+from fastapi import APIRouter,Depends,Response,status,Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.subject.dtos import SubjectSchema,SubjectResponse
+from src.subject import async_controller as controller
+from src.users import async_controller as user_controller
+from src.users.auth import Principal
+from src.utils.async_db import get_async_db
+from src.utils.etags import acurrent_version,check_not_modified
+from typing import List
+
+subject_routes=APIRouter(prefix="/subjects")
+
+async def get_current_user(request:Request,db:AsyncSession=Depends(get_async_db)):
+    return await user_controller.is_authenticated(request,db)
+
+async def conditional_read(request:Request,response:Response,db:AsyncSession=Depends(get_async_db),current_user:Principal=Depends(get_current_user)):
+    check_not_modified(request,response,current_user.id,await acurrent_version(db,current_user.id))
+
+
+@subject_routes.post("/create",response_model=SubjectResponse,status_code=status.HTTP_201_CREATED)
+async def create_notes(body:SubjectSchema,db:AsyncSession=Depends(get_async_db),current_user:Principal=Depends(get_current_user)):
+    return await controller.create_subject(body,db,current_user)
+
+@subject_routes.get("/get",response_model=List[SubjectResponse],status_code=status.HTTP_200_OK,dependencies=[Depends(conditional_read)])
+async def get_subeject(db:AsyncSession=Depends(get_async_db),current_user:Principal=Depends(get_current_user)):
+    return await controller.get_subjects(db,current_user)
+
+
+@subject_routes.get("/get_subject/{id}",response_model=SubjectResponse,status_code=status.HTTP_200_OK,dependencies=[Depends(conditional_read)])
+async def get_subjectbyId(id:int,db:AsyncSession=Depends(get_async_db),current_user:Principal=Depends(get_current_user)):
+    return await controller.get_subjectbyId(id,db,current_user)
+@subject_routes.put("/update/{id}",response_model=SubjectResponse,status_code=status.HTTP_201_CREATED)
+async def update_subject(id:int,body:SubjectSchema,db:AsyncSession=Depends(get_async_db),current_user:Principal=Depends(get_current_user)):
+    return await controller.updateSubject(id,body,db,current_user)
+@subject_routes.delete("/delete/{id}",response_model=None,status_code=status.HTTP_204_NO_CONTENT)
+async def deletesubject(id:int,db:AsyncSession=Depends(get_async_db),current_user:Principal=Depends(get_current_user)):
+    return await controller.delete_subject(id,db,current_user)
@@ -1,12 +1,19 @@
 from src.subject.dtos import SubjectSchema
 from sqlalchemy.orm import Session
 from src.utils.db import get_db
+from sqlalchemy import delete
+from src.notes import bulk
+from src.subject.artifacts import remove_artifacts
+from src.notes.models import NotesModel
 from src.subject.models import SubjectModel
-from src.users.models import UserModel
+from src.chatbot.retrieval import retrieval_index
+from src.utils.bus import DATA_CHANGED,bus
+from src.users.auth import Principal
+from src.utils.etags import bump_version
 from fastapi import HTTPException,status
 
 
-def create_subject(body:SubjectSchema,db:Session,current_user:UserModel):
+def create_subject(body:SubjectSchema,db:Session,current_user:Principal):
 
     data= body.model_dump()
     new_subject= SubjectModel(
@@ -14,22 +21,24 @@ def create_subject(body:SubjectSchema,db:Session,current_user:UserModel):
         user_id= current_user.id
     )
     db.add(new_subject)
+    bump_version(db,current_user.id)
     db.commit()
+    bus.publish(DATA_CHANGED,user_id=current_user.id,notes=False)
     db.refresh(new_subject)
     
     return new_subject
 
-def get_subjects(db:Session,current_user:UserModel):
+def get_subjects(db:Session,current_user:Principal):
     subjects= db.query(SubjectModel).filter(SubjectModel.user_id==current_user.id).all()
     return subjects
 
-def get_subjectbyId(id:int,db:Session,current_user:UserModel):
+def get_subjectbyId(id:int,db:Session,current_user:Principal):
     subject= db.query(SubjectModel).filter(SubjectModel.id==id,SubjectModel.user_id==current_user.id).first()
     if not subject:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail="Subject not Found")
     return subject
 
-def updateSubject(id:int,body:SubjectSchema,db:Session,current_user:UserModel):
+def updateSubject(id:int,body:SubjectSchema,db:Session,current_user:Principal):
     subject=db.query(SubjectModel).filter(SubjectModel.id==id,SubjectModel.user_id==current_user.id).first()
     if not subject:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail="Subject not Found")
@@ -38,16 +47,24 @@ def updateSubject(id:int,body:SubjectSchema,db:Session,current_user:UserModel):
         setattr(subject,field,value)
 
     db.add(subject)
+    bump_version(db,current_user.id)
     db.commit()
+    bus.publish(DATA_CHANGED,user_id=current_user.id,notes=False)
     db.refresh(subject)
     return subject
 
-def delete_subject(id:int,db:Session,current_user:UserModel):
-    subject=db.query(SubjectModel).filter(SubjectModel.id==id,SubjectModel.user_id==current_user.id).first()
+def delete_subject(id:int,db:Session,current_user:Principal):
+    subject=db.query(SubjectModel.id).filter(SubjectModel.id==id,SubjectModel.user_id==current_user.id).first()
     if not subject:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail="Subject not Found")
-    db.delete(subject)
+    # set-based instead of the ORM cascade, which loads every note just to delete it
+    bulk.remove_notes(db,[NotesModel.subject_id==id])
+    remove_artifacts(db,id)
+    db.execute(delete(SubjectModel).where(SubjectModel.id==id).execution_options(synchronize_session=False))
+    bump_version(db,current_user.id)
     db.commit()
+    bus.publish(DATA_CHANGED,user_id=current_user.id,notes=True)
+    retrieval_index.forget_user(current_user.id)
 
     return None
     
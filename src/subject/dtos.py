@@ -1,4 +1,6 @@
 from pydantic import BaseModel
+from datetime import datetime
+from typing import List
 
 class SubjectSchema(BaseModel):
     title:str
@@ -7,4 +9,25 @@ class SubjectResponse(BaseModel):
     id:int
     title:str
     user_id:int
-    
+
+class SubjectArtifact(BaseModel):
+    kind:str
+    content:str
+    chunks:int
+    # built from an older version of the subject's notes; POST .../artifacts/build refreshes it
+    stale:bool
+    update_at:datetime
+
+class SubjectArtifacts(BaseModel):
+    subject_id:int
+    # of the notes the artifacts were built from
+    chunks:int
+    artifacts:List[SubjectArtifact]
+
+class ArtifactBuildStats(BaseModel):
+    # LLM calls made by this build vs map/reduce outputs reused from earlier builds
+    generated:int
+    reused:int
+
+class SubjectArtifactsBuild(SubjectArtifacts):
+    build:ArtifactBuildStats
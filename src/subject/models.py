@@ -1,4 +1,4 @@
-from sqlalchemy import Column,Integer,String,ForeignKey
+from sqlalchemy import Column,Integer,String,ForeignKey,Text,DateTime,UniqueConstraint,update
 from sqlalchemy.orm import relationship
 from src.utils.db import Base
 from datetime import datetime
@@ -9,7 +9,50 @@ class SubjectModel(Base):
     
     id =Column(Integer,primary_key=True)
     title=Column(String,nullable=False,unique=True)
-    user_id= Column(Integer,ForeignKey("Users.id"))
+    user_id= Column(Integer,ForeignKey("Users.id"),index=True)
+    # bumped by every write to the subject's notes, see notes_version_update
+    notes_version=Column(Integer,nullable=False,default=0,server_default="0")
 
     owner= relationship("UserModel",back_populates="subjects")
     notes= relationship("NotesModel",back_populates="subject",cascade="all,delete-orphan")
+
+
+def notes_version_update(subject_ids):
+    # subject_ids is a list or a SELECT of ids; run in the transaction that writes the notes
+    return (
+        update(SubjectModel)
+        .where(SubjectModel.id.in_(subject_ids))
+        .values(notes_version=SubjectModel.notes_version+1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+class SubjectArtifactModel(Base):
+    # the latest study artifact of each kind built from a subject's notes, see src/subject/artifacts.py;
+    # source_version is the subject's notes_version it was built from, so a read can tell whether it is
+    # stale without reading the notes, and source_hash identifies the chunks
+    __tablename__="SubjectArtifacts"
+
+    id=Column(Integer,primary_key=True)
+    subject_id=Column(Integer,ForeignKey("Subject.id",ondelete="CASCADE"),nullable=False)
+    kind=Column(String,nullable=False)
+    content=Column(Text,nullable=False)
+    source_hash=Column(String(64),nullable=False)
+    source_version=Column(Integer)
+    chunks=Column(Integer,nullable=False)
+    update_at=Column(DateTime,default=datetime.now)
+
+    __table_args__=(
+        UniqueConstraint("subject_id","kind",name="uq_subject_artifacts_subject_id_kind"),
+    )
+
+
+class ArtifactPartModel(Base):
+    # LLM outputs of the map and reduce steps, keyed by a hash of the prompt and its input, so a
+    # rebuild only calls the LLM for chunks (and groups of chunks) whose text changed
+    __tablename__="ArtifactParts"
+
+    subject_id=Column(Integer,ForeignKey("Subject.id",ondelete="CASCADE"),primary_key=True)
+    hash=Column(String(64),primary_key=True)
+    output=Column(Text,nullable=False)
+    create_at=Column(DateTime,default=datetime.now)
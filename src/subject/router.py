@@ -1,34 +1,38 @@
-from fastapi import APIRouter,Depends,status,Request
-from src.utils.db import get_db
+from fastapi import APIRouter,Depends,Response,status,Request
+from src.utils.db import get_db,get_read_db
+from src.utils.etags import check_not_modified,current_version
 from src.subject.dtos import SubjectSchema,SubjectResponse
 from src.subject import controller
 from src.users import controller as user_controller
 from src.utils.db import get_db
 from sqlalchemy.orm import Session
-from src.users.models import UserModel
+from src.users.auth import Principal
 from typing import List 
 
 subject_routes=APIRouter(prefix="/subjects")
 
-def get_current_user(request:Request,db:Session=Depends(get_db)):
+def get_current_user(request:Request,db:Session=Depends(get_read_db)):
     return user_controller.is_authenticated(request,db)
 
+def conditional_read(request:Request,response:Response,db:Session=Depends(get_read_db),current_user:Principal=Depends(get_current_user)):
+    check_not_modified(request,response,current_user.id,current_version(db,current_user.id))
+
 
 @subject_routes.post("/create",response_model=SubjectResponse,status_code=status.HTTP_201_CREATED)
-def create_notes(body:SubjectSchema,db:Session=Depends(get_db),current_user:UserModel=Depends(get_current_user)):
+def create_notes(body:SubjectSchema,db:Session=Depends(get_db),current_user:Principal=Depends(get_current_user)):
     return controller.create_subject(body,db,current_user)
 
-@subject_routes.get("/get",response_model=List[SubjectResponse],status_code=status.HTTP_200_OK)
-def get_subeject(db:Session=Depends(get_db),current_user:UserModel=Depends(get_current_user)):
+@subject_routes.get("/get",response_model=List[SubjectResponse],status_code=status.HTTP_200_OK,dependencies=[Depends(conditional_read)])
+def get_subeject(db:Session=Depends(get_read_db),current_user:Principal=Depends(get_current_user)):
     return controller.get_subjects(db,current_user)
 
 
-@subject_routes.get("/get_subject/{id}",response_model=SubjectResponse,status_code=status.HTTP_200_OK)
-def get_subjectbyId(id:int,db:Session=Depends(get_db),current_user:UserModel=Depends(get_current_user)):
+@subject_routes.get("/get_subject/{id}",response_model=SubjectResponse,status_code=status.HTTP_200_OK,dependencies=[Depends(conditional_read)])
+def get_subjectbyId(id:int,db:Session=Depends(get_read_db),current_user:Principal=Depends(get_current_user)):
     return controller.get_subjectbyId(id,db,current_user)
 @subject_routes.put("/update/{id}",response_model=SubjectResponse,status_code=status.HTTP_201_CREATED)
-def update_subject(id:int,body:SubjectSchema,db:Session=Depends(get_db),current_user:UserModel=Depends(get_current_user)):
+def update_subject(id:int,body:SubjectSchema,db:Session=Depends(get_db),current_user:Principal=Depends(get_current_user)):
     return controller.updateSubject(id,body,db,current_user)
 @subject_routes.delete("/delete/{id}",response_model=None,status_code=status.HTTP_204_NO_CONTENT)
-def deletesubject(id:int,db:Session=Depends(get_db),current_user:UserModel=Depends(get_current_user)):
+def deletesubject(id:int,db:Session=Depends(get_db),current_user:Principal=Depends(get_current_user)):
     return controller.delete_subject(id,db,current_user)
\ No newline at end of file
@@ -0,0 +1,86 @@
+from src.users.dtos import UserSchema, LoginSchema, ProfileUpdateSchema
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.users.models import UserModel
+from src.users.hashing import get_password_hash, verify_password
+from fastapi import HTTPException,status,Request
+import jwt
+from src.utils.settings import settings
+from datetime import datetime,timedelta
+from src.users import auth
+from src.utils.bus import USER_CHANGED,bus
+
+
+async def register(body:UserSchema,db:AsyncSession):
+    is_user=(await db.execute(select(UserModel).where(UserModel.username==body.username))).first()
+    if is_user:
+        raise HTTPException(status_code=400,detail="Username already exist")
+    is_user=(await db.execute(select(UserModel).where(UserModel.email==body.email))).first()
+    if is_user:
+        raise HTTPException(status_code=400,detail="Email Already register")
+    hash_password= await get_password_hash(body.password)
+    new_user=UserModel(
+        name= body.name,
+        username=body.username,
+        hash_password=hash_password,
+        email=body.email
+    )
+    db.add(new_user)
+    await db.commit()
+    await db.refresh(new_user)
+    return new_user
+
+async def login_user(body:LoginSchema,db:AsyncSession):
+    is_user=(await db.execute(select(UserModel).where(UserModel.username==body.username))).scalars().first()
+    if not is_user:
+         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,detail="User not Exit ")
+    valid,new_hash=await verify_password(body.password,is_user.hash_password)
+    if not valid:
+         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,detail="You Enterd Wrong Password")
+    if new_hash:
+        is_user.hash_password=new_hash
+        await db.commit()
+    exp_time=datetime.now()+timedelta(minutes=settings.EXP_TIME)
+    token=jwt.encode({"_id":is_user.id,"exp":exp_time.timestamp()},settings.SECRET_KEY,settings.ALGORITHM)
+    return {"token":token}
+
+async def is_authenticated(request:Request,db:AsyncSession):
+    return await auth.aresolve_principal(request,db)
+
+
+async def update_profile(body: ProfileUpdateSchema, request: Request, db: AsyncSession):
+    payload = auth.decode_token(auth.get_token(request))
+    user = (await db.execute(select(UserModel).where(UserModel.id == payload.get("_id")))).scalar_one_or_none()
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found",
+        )
+
+    normalized_username = body.username.strip()
+    if not normalized_username:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username is required",
+        )
+
+    username_taken = (
+        await db.execute(
+            select(UserModel.id).where(
+                UserModel.username == normalized_username,
+                UserModel.id != user.id,
+            )
+        )
+    ).first()
+    if username_taken:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username already exist",
+        )
+
+    user.name = body.name.strip() or user.name
+    user.username = normalized_username
+    await db.commit()
+    await db.refresh(user)
+    bus.publish(USER_CHANGED, user_id=user.id)
+    return user
@@ -0,0 +1,24 @@
+from src.users.dtos import UserSchema, LoginSchema, UserResponseSchema, ProfileUpdateSchema
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter,Depends,status,Request
+from src.utils.async_db import get_async_db
+from src.users import async_controller as controller
+
+userrouter=APIRouter(prefix="/users")
+
+@userrouter.post("/register",response_model=UserResponseSchema,status_code=status.HTTP_201_CREATED)
+async def register(body:UserSchema,db:AsyncSession=Depends(get_async_db)):
+    return await controller.register(body,db)
+
+@userrouter.post("/login",status_code=status.HTTP_200_OK)
+async def login(body:LoginSchema,db:AsyncSession=Depends(get_async_db)):
+    return await controller.login_user(body,db)
+
+@userrouter.get("/is_auth",status_code=status.HTTP_200_OK,response_model=UserResponseSchema)
+async def is_auth(request:Request,db:AsyncSession=Depends(get_async_db)):
+    return await controller.is_authenticated(request,db)
+
+
+@userrouter.put("/profile", status_code=status.HTTP_200_OK, response_model=UserResponseSchema)
+async def update_profile(body: ProfileUpdateSchema, request: Request, db: AsyncSession = Depends(get_async_db)):
+    return await controller.update_profile(body, request, db)
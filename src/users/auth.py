@@ -0,0 +1,84 @@
+import time
+from dataclasses import dataclass
+
+import jwt
+from fastapi import HTTPException, Request, status
+from jwt.exceptions import InvalidTokenError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from src.users.models import UserModel
+from src.utils.bus import USER_CHANGED, bus
+from src.utils.cache import TTLCache
+from src.utils.settings import settings
+
+
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    name: str
+    username: str
+    email: str
+
+
+# token -> Principal, bounded by the token's own expiry as well as the cache TTL
+token_cache = TTLCache(max_entries=settings.AUTH_CACHE_MAX_ENTRIES, ttl=settings.AUTH_CACHE_TTL)
+
+
+def get_token(request: Request) -> str:
+    auth_header = request.headers.get("Authorization")
+    if not auth_header:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token is missing")
+    parts = auth_header.split(" ")
+    if len(parts) < 2:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid Token")
+    return parts[1]
+
+
+def decode_token(token: str) -> dict:
+    try:
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except InvalidTokenError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid Token")
+
+
+def resolve_principal(request: Request, db: Session) -> Principal:
+    token = get_token(request)
+    principal = token_cache.get(token)
+    if principal is not None:
+        return principal
+
+    payload = decode_token(token)
+    user = db.query(UserModel).filter(UserModel.id == payload.get("_id")).first()
+    return cache_principal(token, payload, user)
+
+
+async def aresolve_principal(request: Request, db: AsyncSession) -> Principal:
+    token = get_token(request)
+    principal = token_cache.get(token)
+    if principal is not None:
+        return principal
+
+    payload = decode_token(token)
+    result = await db.execute(select(UserModel).where(UserModel.id == payload.get("_id")))
+    return cache_principal(token, payload, result.scalar_one_or_none())
+
+
+def cache_principal(token: str, payload: dict, user) -> Principal:
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+
+    principal = Principal(id=user.id, name=user.name, username=user.username, email=user.email)
+    ttl = settings.AUTH_CACHE_TTL
+    if payload.get("exp"):
+        ttl = min(ttl, payload["exp"] - time.time())
+    token_cache.set(token, principal, ttl=ttl)
+    return principal
+
+
+def invalidate_user(user_id: int):
+    token_cache.invalidate_where(lambda principal: principal.id == user_id)
+
+
+bus.subscribe(USER_CHANGED, lambda data, local: invalidate_user(data["user_id"]))
@@ -2,22 +2,16 @@ from src.users.dtos import UserSchema, LoginSchema, ProfileUpdateSchema
 from sqlalchemy.orm import Session
 from src.users.models import UserModel
 from fastapi import HTTPException,status,Request
-from pwdlib import PasswordHash
+from fastapi.concurrency import run_in_threadpool
 import jwt
 from src.utils.settings import settings
 from datetime import datetime,timedelta
-from jwt.exceptions  import InvalidTokenError
+from src.users import auth
+from src.utils.bus import USER_CHANGED,bus
+from src.users.hashing import get_password_hash, verify_password
 
 
-hash_password = PasswordHash.recommended()
-
-def get_password_hash(password):
-    return hash_password.hash(password)
-def verify_password(plain_password, hashed_password):
-    return hash_password.verify(plain_password, hashed_password)
-
-
-def register(body:UserSchema,db:Session):
+def check_available(body:UserSchema,db:Session):
     # checks Duplicated username validation
     is_user=db.query(UserModel).filter(UserModel.username==body.username).first()
     if is_user:
@@ -26,8 +20,21 @@ def register(body:UserSchema,db:Session):
     is_user=db.query(UserModel).filter(UserModel.email==body.email).first()
     if is_user:
         raise HTTPException(status_code=400,detail="Email Already register")
+
+def save_user(user:UserModel,db:Session):
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+def find_user(username:str,db:Session):
+    return db.query(UserModel).filter(UserModel.username==username).first()
+
+# database work stays on the threadpool, hashing is awaited on the hashing pool
+async def register(body:UserSchema,db:Session):
+    await run_in_threadpool(check_available,body,db)
     # hash the password encryption
-    hash_password= get_password_hash(body.password)
+    hash_password= await get_password_hash(body.password)
     # create the object of new usermodel
     new_user=UserModel(
         name= body.name,
@@ -36,18 +43,19 @@ def register(body:UserSchema,db:Session):
         email=body.email
     )
     # store in database
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-
-    return new_user
+    return await run_in_threadpool(save_user,new_user,db)
 # login function
-def login_user(body:LoginSchema,db:Session):
-    is_user=db.query(UserModel).filter(UserModel.username==body.username).first()
+async def login_user(body:LoginSchema,db:Session):
+    is_user=await run_in_threadpool(find_user,body.username,db)
     if not is_user:
          raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,detail="User not Exit ")
-    if not verify_password(body.password,is_user.hash_password):
+    valid,new_hash=await verify_password(body.password,is_user.hash_password)
+    if not valid:
          raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,detail="You Enterd Wrong Password")
+    if new_hash:
+        # hashing parameters changed since this password was stored
+        is_user.hash_password=new_hash
+        await run_in_threadpool(save_user,is_user,db)
      # creating expiry token
     exp_time=datetime.now()+timedelta(minutes=settings.EXP_TIME)
      
@@ -57,72 +65,43 @@ def login_user(body:LoginSchema,db:Session):
     return {"token":token}
 
 def is_authenticated(request:Request,db:Session):
-    auth_header=request.headers.get("Authorization")
-    if not auth_header:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,detail="Token is missing")
-    token=auth_header.split(" ")[1]
-    try:
-        payload=jwt.decode(token,settings.SECRET_KEY,algorithms=[settings.ALGORITHM])
-        user_id=payload.get("_id")
-        user=db.query(UserModel).filter(UserModel.id==user_id).first()
-        if not user:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,detail="User not found")
-        return user
-    except InvalidTokenError:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,detail="Invalid Token")
+    return auth.resolve_principal(request,db)
 
 
 def update_profile(body: ProfileUpdateSchema, request: Request, db: Session):
-    auth_header = request.headers.get("Authorization")
-    if not auth_header:
+    payload = auth.decode_token(auth.get_token(request))
+    user = db.query(UserModel).filter(UserModel.id == payload.get("_id")).first()
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token is missing",
+            detail="User not found",
         )
 
-    token = auth_header.split(" ")[1]
-    try:
-        payload = jwt.decode(
-            token,
-            settings.SECRET_KEY,
-            algorithms=[settings.ALGORITHM],
+    normalized_username = body.username.strip()
+    if not normalized_username:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username is required",
         )
-        user_id = payload.get("_id")
-        user = db.query(UserModel).filter(UserModel.id == user_id).first()
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="User not found",
-            )
 
-        normalized_username = body.username.strip()
-        if not normalized_username:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Username is required",
-            )
-
-        username_taken = (
-            db.query(UserModel)
-            .filter(
-                UserModel.username == normalized_username,
-                UserModel.id != user.id,
-            )
-            .first()
+    username_taken = (
+        db.query(UserModel)
+        .filter(
+            UserModel.username == normalized_username,
+            UserModel.id != user.id,
         )
-        if username_taken:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Username already exist",
-            )
-
-        user.name = body.name.strip() or user.name
-        user.username = normalized_username
-        db.commit()
-        db.refresh(user)
-        return user
-    except InvalidTokenError:
+        .first()
+    )
+    if username_taken:
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid Token",
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username already exist",
         )
+
+    user.name = body.name.strip() or user.name
+    user.username = normalized_username
+    db.commit()
+    db.refresh(user)
+    # cached principals, in every worker, still carry the old name/username
+    bus.publish(USER_CHANGED, user_id=user.id)
+    return user
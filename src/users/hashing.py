@@ -0,0 +1,89 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from fastapi import HTTPException, status
+from pwdlib import PasswordHash
+
+from src.metrics.instrumentation import span
+from src.metrics.registry import registry
+from src.utils.settings import settings
+
+_hasher = None
+
+
+def get_hasher() -> PasswordHash:
+    # built lazily so every pool process creates its own instance
+    global _hasher
+    if _hasher is None:
+        _hasher = PasswordHash.recommended()
+    return _hasher
+
+
+def hash_in_worker(password: str) -> str:
+    return get_hasher().hash(password)
+
+
+def verify_in_worker(password: str, hashed: str):
+    # returns (valid, new_hash); new_hash is set when the stored hash uses outdated parameters
+    return get_hasher().verify_and_update(password, hashed)
+
+
+hash_shed = registry.counter("password_hash_shed_total", "Hash/verify calls rejected with 503 because the queue was full")
+
+
+class HashingPool:
+    # Argon2 is CPU bound; a separate process pool keeps it off the GIL the CRUD handlers share.
+    # HASH_WORKERS=0 falls back to the event loop's default thread executor.
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None and self.workers > 0:
+            # spawn, not fork: the server process already runs threads and an event loop
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    async def run(self, name: str, fn, *args):
+        # only touched from the event loop, so the counter needs no lock
+        if self.pending >= self.max_pending:
+            hash_shed.inc(operation=name)
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please retry",
+                headers={"Retry-After": str(settings.HASH_RETRY_AFTER)},
+            )
+        self.pending += 1
+        try:
+            with span(name):
+                return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            self.pending -= 1
+
+
+pool = HashingPool(settings.HASH_WORKERS, settings.HASH_MAX_PENDING)
+
+
+@registry.collector
+def collect_pool():
+    return [("password_hash_pending", "gauge", "Hash/verify calls queued or running", [({}, pool.pending)])]
+
+
+async def get_password_hash(password: str) -> str:
+    return await pool.run("hash_password", hash_in_worker, password)
+
+
+async def verify_password(plain_password: str, hashed_password: str):
+    return await pool.run("verify_password", verify_in_worker, plain_password, hashed_password)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column,Integer,String,DateTime
+from sqlalchemy import Column,Integer,String,DateTime,ForeignKey
 from src.utils.db import Base
 from datetime import datetime
 from sqlalchemy.orm import relationship
@@ -14,3 +14,12 @@ class UserModel(Base):
     timestamp=Column(DateTime,default=datetime.now())
 
     subjects = relationship("SubjectModel",back_populates="owner",cascade="all,delete-orphan")
+
+
+class DataVersionModel(Base):
+    # bumped in the same transaction as every note/subject write; ETags on reads are derived from it
+    __tablename__="DataVersions"
+
+    user_id=Column(Integer,ForeignKey("Users.id",ondelete="CASCADE"),primary_key=True)
+    version=Column(Integer,nullable=False,default=0)
+    updated_at=Column(DateTime,default=datetime.now,onupdate=datetime.now)
@@ -0,0 +1,277 @@
+import abc
+import json
+import logging
+import os
+import queue
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from sqlalchemy import Column, Float, Integer, MetaData, Table, Text, create_engine, delete, event, func, insert, inspect, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError
+
+from src.metrics.registry import registry
+from src.utils import redis_client
+from src.utils.settings import settings
+
+logger = logging.getLogger("smartnotes.bus")
+
+bus_published = registry.counter("invalidation_events_published_total", "Invalidation events published, by topic")
+bus_received = registry.counter("invalidation_events_received_total", "Invalidation events received from other processes, by topic")
+
+# a user's principal (name, username, email) changed
+USER_CHANGED = "user_changed"
+# a user's subjects or notes changed; `notes` is false when no note content was touched
+DATA_CHANGED = "data_changed"
+
+
+def new_origin() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+class InvalidationBus:
+    # In-memory backend, for a single process. Handlers are called as handler(data, local): first in
+    # the publishing process right after its write commits (local=True), then in every other process
+    # once the backend delivers the event (local=False). Delivery is best effort; the caches behind
+    # the handlers keep their TTLs as the fallback.
+
+    def __init__(self):
+        self.origin = new_origin()
+        self.handlers = {}
+
+    def subscribe(self, topic: str, handler):
+        self.handlers.setdefault(topic, []).append(handler)
+
+    def publish(self, topic: str, **data):
+        bus_published.inc(topic=topic)
+        self.dispatch(topic, data, True)
+        try:
+            self.send(json.dumps({"origin": self.origin, "topic": topic, "data": data}))
+        except Exception:
+            # this process is already up to date; the others catch up when their entries expire
+            logger.exception("publishing %s failed", topic)
+
+    def dispatch(self, topic: str, data: dict, local: bool):
+        for handler in self.handlers.get(topic, ()):
+            try:
+                handler(data, local)
+            except Exception:
+                logger.exception("invalidation handler for %s failed", topic)
+
+    def receive(self, message):
+        event = json.loads(message)
+        if event["origin"] == self.origin:
+            return
+        bus_received.inc(topic=event["topic"])
+        self.dispatch(event["topic"], event["data"], False)
+
+    def send(self, message: str):
+        return None
+
+    def start(self):
+        # per worker: a forked worker must not share its parent's origin
+        self.origin = new_origin()
+
+    def stop(self):
+        return None
+
+
+class PollingBus(InvalidationBus, abc.ABC):
+    # Two background threads once started: one calls poll() until stop(), the other writes
+    # published events, so a publishing request never waits on the backend.
+
+    def __init__(self, interval: float):
+        super().__init__()
+        self.interval = interval
+        self.outbox = queue.Queue()
+        self._stopped = threading.Event()
+        self._threads = []
+
+    def send(self, message: str):
+        if self._threads:
+            self.outbox.put(message)
+        else:
+            # not started, e.g. a one-off script: write it directly
+            self.write(message)
+
+    def start(self):
+        super().start()
+        self._stopped.clear()
+        self._threads = [
+            threading.Thread(target=self.receive_loop, name="invalidation-receive", daemon=True),
+            threading.Thread(target=self.send_loop, name="invalidation-send", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self.outbox.put(None)
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+    def receive_loop(self):
+        while not self._stopped.is_set():
+            try:
+                self.poll()
+            except Exception:
+                logger.exception("receiving invalidation events failed")
+                self._stopped.wait(self.interval)
+
+    def send_loop(self):
+        while True:
+            message = self.outbox.get()
+            if message is None:
+                return
+            try:
+                self.write(message)
+            except Exception:
+                logger.exception("publishing an invalidation event failed")
+
+    @abc.abstractmethod
+    def write(self, message: str):
+        # store or send one published event
+        ...
+
+    @abc.abstractmethod
+    def poll(self):
+        # receive() the events that arrived since the last call, waiting up to `interval` for them
+        ...
+
+
+metadata = MetaData()
+# AUTOINCREMENT so ids are never reused after pruning; readers track the last id they saw
+events_table = Table(
+    "InvalidationEvents",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("message", Text, nullable=False),
+    Column("created", Float, nullable=False),
+    sqlite_autoincrement=True,
+)
+
+
+class SQLiteBus(PollingBus):
+    # Processes on one host share a SQLite file: publishing inserts a row, every process polls for
+    # rows newer than the last one it saw. Meant for tests and single-machine deployments.
+
+    def __init__(self, path: str, interval: float, retention: float):
+        super().__init__(interval)
+        self.engine = create_engine(f"sqlite:///{path}")
+        event.listen(self.engine, "connect", self._sqlite_pragmas)
+        self.retention = retention
+        self.last_id = 0
+        self.pruned_at = 0.0
+        self._ready = False
+
+    @staticmethod
+    def _sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA busy_timeout=5000")
+        cursor.close()
+
+    def setup(self):
+        if self._ready:
+            return
+        try:
+            metadata.create_all(self.engine)
+        except OperationalError:
+            # workers starting together race to create the table; losing that race is fine
+            if not inspect(self.engine).has_table(events_table.name):
+                raise
+        self._ready = True
+
+    def write(self, message: str):
+        self.setup()
+        with self.engine.begin() as conn:
+            conn.execute(insert(events_table), {"message": message, "created": time.time()})
+
+    def start(self):
+        self.setup()
+        with self.engine.connect() as conn:
+            self.last_id = conn.execute(select(func.coalesce(func.max(events_table.c.id), 0))).scalar_one()
+        super().start()
+
+    def poll(self):
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(events_table.c.id, events_table.c.message)
+                .where(events_table.c.id > self.last_id)
+                .order_by(events_table.c.id)
+            ).all()
+        for row in rows:
+            self.last_id = row.id
+            self.receive(row.message)
+        now = time.time()
+        if now - self.pruned_at > self.retention:
+            self.pruned_at = now
+            with self.engine.begin() as conn:
+                conn.execute(delete(events_table).where(events_table.c.created < now - self.retention))
+        self._stopped.wait(self.interval)
+
+
+class RedisBus(PollingBus):
+    # Pub/sub on one channel, for several hosts. `client` only needs redis-py's publish() and
+    # pubsub(), so redis_client.FakeRedis (INVALIDATION_REDIS_URL=fake://) can replace the server. Events published while a process is
+    # disconnected are lost to it, like any pub/sub message.
+
+    def __init__(self, client, channel: str):
+        super().__init__(1.0)
+        self.client = client
+        self.channel = channel
+        self._pubsub = None
+
+    def write(self, message: str):
+        self.client.publish(self.channel, message)
+
+    def poll(self):
+        if self._pubsub is None:
+            self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            self._pubsub.subscribe(self.channel)
+        try:
+            message = self._pubsub.get_message(timeout=self.interval)
+        except Exception:
+            # resubscribe on the next poll
+            self._pubsub = None
+            raise
+        if message and message.get("type") == "message":
+            data = message["data"]
+            self.receive(data.decode() if isinstance(data, bytes) else data)
+
+    def stop(self):
+        super().stop()
+        if self._pubsub is not None:
+            self._pubsub.close()
+            self._pubsub = None
+
+
+def sqlite_bus_path() -> str:
+    # unset: next to the SQLite database, which every worker on the host already opens by the same
+    # path; for other databases, in the system temp directory. Never relative to the working directory.
+    if settings.INVALIDATION_SQLITE_PATH:
+        return settings.INVALIDATION_SQLITE_PATH
+    url = make_url(settings.DATABASE_URL)
+    if url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:"):
+        database = Path(url.database).resolve()
+        return str(database.with_name(f"{database.stem}-invalidation.db"))
+    return str(Path(tempfile.gettempdir()) / "smartnotes-invalidation.db")
+
+
+def build_bus():
+    if settings.INVALIDATION_BUS == "redis":
+        # falling back to memory would quietly stop invalidating the other workers
+        if not settings.INVALIDATION_REDIS_URL:
+            raise RuntimeError("INVALIDATION_BUS=redis needs INVALIDATION_REDIS_URL")
+        return RedisBus(redis_client.connect(settings.INVALIDATION_REDIS_URL), settings.INVALIDATION_CHANNEL)
+    if settings.INVALIDATION_BUS == "sqlite":
+        return SQLiteBus(sqlite_bus_path(), settings.INVALIDATION_POLL_INTERVAL, settings.INVALIDATION_RETENTION)
+    return InvalidationBus()
+
+
+bus = build_bus()
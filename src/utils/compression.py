@@ -0,0 +1,37 @@
+import hashlib
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+RAW = "raw"
+ZLIB = "zlib"
+ZSTD = "zstd"
+
+
+def digest(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def compress(text: str, codec: str, min_bytes: int):
+    # returns (codec, data); small or incompressible bodies are kept raw rather than grown
+    raw = text.encode()
+    if len(raw) < min_bytes:
+        return RAW, raw
+    if codec == ZSTD and zstandard is not None:
+        data = zstandard.ZstdCompressor(level=9).compress(raw)
+    else:
+        codec, data = ZLIB, zlib.compress(raw, 9)
+    return (codec, data) if len(data) < len(raw) else (RAW, raw)
+
+
+def decompress(codec: str, data: bytes) -> str:
+    if codec == ZLIB:
+        return zlib.decompress(data).decode()
+    if codec == ZSTD:
+        if zstandard is None:
+            raise RuntimeError("zstd-compressed content needs the zstandard package")
+        return zstandard.ZstdDecompressor().decompress(data).decode()
+    return bytes(data).decode()
@@ -0,0 +1,23 @@
+# notes listing
+NOTE_PREVIEW_LENGTH = 200
+NOTES_PAGE_DEFAULT_LIMIT = 20
+NOTES_PAGE_MAX_LIMIT = 100
+
+# bulk import / export
+BULK_IMPORT_BATCH_SIZE = 500
+BULK_IMPORT_MAX_ERRORS = 50
+BULK_IMPORT_MAX_NOTE_BYTES = 1024 * 1024
+EXPORT_YIELD_PER = 500
+# ids accepted by one bulk move / delete request
+BULK_MAX_NOTE_IDS = 10000
+
+# dashboard
+DASHBOARD_RECENT_NOTES = 5
+DASHBOARD_MAX_RECENT_NOTES = 50
+
+# note revisions
+NOTE_SNAPSHOT_EVERY = 20
+NOTE_REVISIONS_PAGE_LIMIT = 50
+
+# notes saved from chatbot answers
+NOTE_TITLE_LENGTH = 120
@@ -1,16 +1,157 @@
-from sqlalchemy import create_engine
+import threading
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker,declarative_base
+from sqlalchemy.pool import NullPool, QueuePool
 from src.utils.settings import settings
 
+
+class PoolStats:
+    def __init__(self):
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+        self._lock = threading.Lock()
+
+    def observe(self, wait: float, timed_out: bool = False):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+            if timed_out:
+                self.timeouts += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "wait_seconds_total": round(self.wait_total, 6),
+                "wait_seconds_max": round(self.wait_max, 6),
+                "timeouts": self.timeouts,
+            }
+
+
+def timed_pool(stats: PoolStats):
+    # QueuePool._do_get is where a caller blocks for a free connection
+    class TimedQueuePool(QueuePool):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                connection = super()._do_get()
+            except Exception:
+                stats.observe(time.perf_counter() - start, timed_out=True)
+                raise
+            stats.observe(time.perf_counter() - start)
+            return connection
+
+    return TimedQueuePool
+
+
+def build_engine(url: str, stats: PoolStats):
+    options = {"pool_pre_ping": settings.DB_POOL_PRE_PING, "pool_recycle": settings.DB_POOL_RECYCLE}
+    if settings.DB_USE_NULL_POOL:
+        # serverless: never keep idle connections around between invocations
+        options["poolclass"] = NullPool
+    elif make_url(url).get_backend_name() != "sqlite":
+        options.update(
+            poolclass=timed_pool(stats),
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+        )
+    return create_engine(url, **options)
+
+
+class ReplicaMonitor:
+    # Postgres replicas report replay lag; anything else only has to answer a query.
+    LAG_SQL = {
+        "postgresql": (
+            "SELECT CASE WHEN NOT pg_is_in_recovery() "
+            "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+            "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+        ),
+    }
+
+    def __init__(self, engine, max_lag: float, interval: float):
+        self.engine = engine
+        self.max_lag = max_lag
+        self.interval = interval
+        self.lag = None
+        self.healthy = False
+        self.fallbacks = 0
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def is_healthy(self) -> bool:
+        if time.monotonic() - self._checked_at >= self.interval and self._lock.acquire(blocking=False):
+            try:
+                self._check()
+            finally:
+                self._lock.release()
+        if not self.healthy:
+            self.fallbacks += 1
+        return self.healthy
+
+    def _check(self):
+        sql = self.LAG_SQL.get(self.engine.dialect.name, "SELECT 0")
+        try:
+            with self.engine.connect() as conn:
+                self.lag = float(conn.execute(text(sql)).scalar() or 0)
+            self.healthy = self.lag <= self.max_lag
+        except Exception:
+            self.lag = None
+            self.healthy = False
+        self._checked_at = time.monotonic()
+
+
 # creating the engine
-engine = create_engine(settings.DATABASE_URL)
-# create the session 
+primary_stats = PoolStats()
+engine = build_engine(settings.DATABASE_URL, primary_stats)
+# create the session
 SessionLocal= sessionmaker(bind=engine)
 
+replica_stats = PoolStats()
+replica_engine = None
+replica_monitor = None
+ReadSessionLocal = SessionLocal
+if settings.DATABASE_REPLICA_URL:
+    replica_engine = build_engine(settings.DATABASE_REPLICA_URL, replica_stats)
+    replica_monitor = ReplicaMonitor(replica_engine, settings.DB_REPLICA_MAX_LAG, settings.DB_REPLICA_CHECK_INTERVAL)
+    ReadSessionLocal = sessionmaker(bind=replica_engine)
+
 def get_db():
     session = SessionLocal()
     try:
         yield session
     finally:
         session.close()
-Base=declarative_base()
\ No newline at end of file
+
+def read_session():
+    # read-only work goes to the replica unless it is unreachable or lagging, then to the primary
+    if replica_monitor is not None and replica_monitor.is_healthy():
+        return ReadSessionLocal()
+    return SessionLocal()
+
+def get_read_db():
+    session = read_session()
+    try:
+        yield session
+    finally:
+        session.close()
+
+def pool_stats():
+    stats = {"primary": {"status": engine.pool.status(), **primary_stats.snapshot()}}
+    if replica_engine is not None:
+        stats["replica"] = {
+            "status": replica_engine.pool.status(),
+            "healthy": replica_monitor.healthy,
+            "lag_seconds": replica_monitor.lag,
+            "fallbacks": replica_monitor.fallbacks,
+            **replica_stats.snapshot(),
+        }
+    return stats
+
+Base=declarative_base()
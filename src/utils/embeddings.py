@@ -0,0 +1,37 @@
+import math
+import re
+import zlib
+
+
+def load_embedder(model_name: str):
+    # local sentence-transformers model when installed; callers treat None as "no embeddings"
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        return None
+    model = SentenceTransformer(model_name)
+    return lambda text: model.encode(text, normalize_embeddings=True).tolist()
+
+
+def cosine(a, b) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+HASH_DIMENSIONS = 1 << 20
+STOPWORDS = frozenset(
+    "a an and are as at be by for from how i in is it of on or that the this to was what when where which who why with you".split()
+)
+
+
+def hash_features(text: str) -> dict:
+    # hashing vectorizer over unigrams and bigrams, sublinear tf, l2-normalised; stable across processes
+    words = [word for word in re.findall(r"\w+", text.lower()) if word not in STOPWORDS]
+    counts = {}
+    for gram in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+        feature = zlib.crc32(gram.encode()) % HASH_DIMENSIONS
+        counts[feature] = counts.get(feature, 0) + 1
+    weights = {feature: 1 + math.log(count) for feature, count in counts.items()}
+    norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+    return {feature: weight / norm for feature, weight in weights.items()} if norm else {}
@@ -0,0 +1,82 @@
+import hashlib
+from datetime import datetime
+
+from fastapi import HTTPException, Request, Response, status
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from src.users.models import DataVersionModel
+from src.utils.settings import settings
+
+
+def version_update(user_id: int):
+    return (
+        update(DataVersionModel)
+        .where(DataVersionModel.user_id == user_id)
+        .values(version=DataVersionModel.version + 1, updated_at=datetime.now())
+        .execution_options(synchronize_session=False)
+    )
+
+
+def version_query(user_id: int):
+    return select(DataVersionModel.version, DataVersionModel.updated_at).where(DataVersionModel.user_id == user_id)
+
+
+def format_version(row) -> str:
+    # updated_at keeps versions from a recreated database from matching old ETags
+    return f"{row.version}:{row.updated_at.isoformat()}" if row else "0"
+
+
+def bump_version(db: Session, user_id: int):
+    # call before commit, so the new version becomes visible together with the write it describes
+    if db.execute(version_update(user_id)).rowcount:
+        return
+    try:
+        # first write for this user; a concurrent first write may insert the row before us
+        with db.begin_nested():
+            db.add(DataVersionModel(user_id=user_id, version=1, updated_at=datetime.now()))
+    except IntegrityError:
+        db.execute(version_update(user_id))
+
+
+async def abump_version(db: AsyncSession, user_id: int):
+    if (await db.execute(version_update(user_id))).rowcount:
+        return
+    try:
+        async with db.begin_nested():
+            db.add(DataVersionModel(user_id=user_id, version=1, updated_at=datetime.now()))
+    except IntegrityError:
+        await db.execute(version_update(user_id))
+
+
+def current_version(db: Session, user_id: int) -> str:
+    return format_version(db.execute(version_query(user_id)).first())
+
+
+async def acurrent_version(db: AsyncSession, user_id: int) -> str:
+    return format_version((await db.execute(version_query(user_id))).first())
+
+
+def make_etag(request: Request, user_id: int, version: str) -> str:
+    # one ETag per user, data version and exact URL (path and query string)
+    query = "&".join(sorted(request.url.query.split("&")))
+    digest = hashlib.sha256(f"{user_id}|{version}|{request.url.path}?{query}".encode()).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match uses the weak comparison, so W/"x" matches "x"
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def check_not_modified(request: Request, response: Response, user_id: int, version: str):
+    # raises 304 before the route runs its query; otherwise tags the response the route will return
+    etag = make_etag(request, user_id, version)
+    headers = {"ETag": etag, "Cache-Control": settings.HTTP_CACHE_CONTROL, "Vary": "Authorization"}
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
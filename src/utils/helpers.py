@@ -0,0 +1,25 @@
+import base64
+from datetime import datetime
+
+from fastapi import HTTPException, status
+
+
+def encode_cursor(create_at: datetime, id: int) -> str:
+    raw = f"{create_at.isoformat()}|{id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        create_at, id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        return datetime.fromisoformat(create_at), int(id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def format_sse(data: str, event: str = None) -> str:
+    # every line of the payload needs its own data: field, a blank line ends the event
+    lines = [f"event: {event}"] if event else []
+    lines += [f"data: {line}" for line in data.split("\n")]
+    return "\n".join(lines) + "\n\n"
@@ -0,0 +1,99 @@
+import queue
+import threading
+import time
+
+# URLs starting with this are served by FakeRedis, in this process, without the redis package
+FAKE_SCHEME = "fake://"
+
+_fakes = {}
+_fakes_lock = threading.Lock()
+
+
+def connect(url: str):
+    # one FakeRedis per fake:// URL, so every component configured with the same URL shares it
+    if url.startswith(FAKE_SCHEME):
+        with _fakes_lock:
+            return _fakes.setdefault(url, FakeRedis())
+    import redis
+
+    return redis.Redis.from_url(url)
+
+
+class FakePubSub:
+    def __init__(self, server: "FakeRedis", ignore_subscribe_messages: bool):
+        self.server = server
+        self.ignore_subscribe_messages = ignore_subscribe_messages
+        self.messages = queue.Queue()
+        self.channels = set()
+
+    def subscribe(self, *channels):
+        for channel in channels:
+            self.channels.add(channel)
+            self.server.attach(channel, self)
+            if not self.ignore_subscribe_messages:
+                self.messages.put({"type": "subscribe", "channel": channel.encode(), "data": len(self.channels)})
+
+    def get_message(self, timeout: float = 0.0):
+        try:
+            return self.messages.get(timeout=timeout) if timeout else self.messages.get_nowait()
+        except queue.Empty:
+            return None
+
+    def close(self):
+        for channel in self.channels:
+            self.server.detach(channel, self)
+        self.channels.clear()
+
+
+class FakeRedis:
+    # The few redis-py calls the app makes (get, set with ex, delete, publish, pubsub), kept in
+    # memory. Values come back as bytes like redis-py's. Only processes that share the object see
+    # each other, so it stands in for a server in tests and single-process runs, not across workers.
+
+    def __init__(self):
+        self.values = {}
+        self.subscribers = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def encode(value) -> bytes:
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self.values.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self.values[key]
+                return None
+            return value
+
+    def set(self, key: str, value, ex: float = None):
+        with self._lock:
+            self.values[key] = (self.encode(value), time.monotonic() + ex if ex else None)
+        return True
+
+    def delete(self, *keys) -> int:
+        with self._lock:
+            return sum(self.values.pop(key, None) is not None for key in keys)
+
+    def publish(self, channel: str, message) -> int:
+        with self._lock:
+            subscribers = list(self.subscribers.get(channel, ()))
+        for subscriber in subscribers:
+            subscriber.messages.put({"type": "message", "channel": channel.encode(), "data": self.encode(message)})
+        return len(subscribers)
+
+    def pubsub(self, ignore_subscribe_messages: bool = False) -> FakePubSub:
+        return FakePubSub(self, ignore_subscribe_messages)
+
+    def attach(self, channel: str, subscriber: FakePubSub):
+        with self._lock:
+            self.subscribers.setdefault(channel, []).append(subscriber)
+
+    def detach(self, channel: str, subscriber: FakePubSub):
+        with self._lock:
+            if subscriber in self.subscribers.get(channel, ()):
+                self.subscribers[channel].remove(subscriber)
@@ -0,0 +1,48 @@
+import logging
+
+from sqlalchemy import inspect, text
+
+from src.jobs.queue import job_queue
+from src.notes import search
+from src.notes.content import upgrade_schema
+from src.utils.db import Base, engine
+
+# every model module has to be imported for create_all to see its tables
+from src.chatbot.models import ChatUsageModel  # noqa: F401
+from src.notes.models import NoteContentModel, NoteRevisionModel, NotesModel  # noqa: F401
+from src.subject.models import ArtifactPartModel, SubjectArtifactModel, SubjectModel  # noqa: F401
+from src.users.models import DataVersionModel, UserModel  # noqa: F401
+
+logger = logging.getLogger("smartnotes.schema")
+
+# columns added to existing tables after they were first created; create_all does not alter tables.
+# The Notes columns are upgraded by src.notes.content.upgrade_schema.
+UPGRADE_COLUMNS = {
+    "Subject": {"notes_version": "INTEGER NOT NULL DEFAULT 0"},
+    # NULL never matches a notes_version, so artifacts built before it are reported stale
+    "SubjectArtifacts": {"source_version": "INTEGER"},
+}
+
+
+def upgrade_columns(bind=engine):
+    for table, added in UPGRADE_COLUMNS.items():
+        columns = {column["name"] for column in inspect(bind).get_columns(table)}
+        with bind.begin() as conn:
+            for name, ddl in added.items():
+                if name not in columns:
+                    conn.execute(text(f'ALTER TABLE "{table}" ADD COLUMN {name} {ddl}'))
+
+
+def create_schema():
+    # idempotent: only missing tables, indexes and search triggers are created
+    Base.metadata.create_all(engine)
+    upgrade_columns(engine)
+    upgrade_schema(engine)
+    search.setup(engine)
+    job_queue.setup()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    create_schema()
+    logger.info("schema is up to date")
@@ -1,4 +1,5 @@
 from pydantic_settings import SettingsConfigDict,BaseSettings
+from typing import Optional
 
 class Settings(BaseSettings):
     model_config=SettingsConfigDict(env_file=".env",extra="ignore")
@@ -7,7 +8,147 @@ class Settings(BaseSettings):
     EXP_TIME:int
     ALGORITHM:str
     SECRET_KEY:str
-    GROQ_API_KEY:str
+    # without it the chatbot answers 503; everything else keeps working
+    GROQ_API_KEY:Optional[str]=None
+
+    # connection pool, see src/utils/db.py
+    DB_POOL_SIZE:int=5
+    DB_MAX_OVERFLOW:int=10
+    DB_POOL_TIMEOUT:int=30
+    DB_POOL_RECYCLE:int=1800
+    DB_POOL_PRE_PING:bool=True
+    DB_USE_NULL_POOL:bool=False
+    DATABASE_REPLICA_URL:Optional[str]=None
+    DB_REPLICA_MAX_LAG:float=5.0
+    DB_REPLICA_CHECK_INTERVAL:float=10.0
+
+    # create missing tables on startup; turn off where `python -m src.utils.schema` runs at deploy time
+    DB_CREATE_SCHEMA:bool=True
+
+    # serve the users/subjects/notes routers on AsyncSession instead of the threadpool
+    DB_ASYNC:bool=False
+    ASYNC_DATABASE_URL:Optional[str]=None
+
+    # resolved JWT principals, see src/users/auth.py
+    AUTH_CACHE_TTL:int=300
+    AUTH_CACHE_MAX_ENTRIES:int=10000
+
+    # password hashing pool, see src/users/hashing.py
+    HASH_WORKERS:int=2
+    HASH_MAX_PENDING:int=32
+    HASH_RETRY_AFTER:int=2
+
+    # conditional GETs and response compression, see src/utils/etags.py
+    HTTP_CACHE_CONTROL:str="private, no-cache"
+    HTTP_COMPRESSION_MIN_SIZE:int=1024
+
+    # note bodies, see src/notes/models.py: "auto" and "on" keep them compressed in NoteContents.
+    # PostgreSQL always keeps the plain column, which TOAST compresses and full-text search indexes;
+    # "on" fails at startup there
+    NOTE_CONTENT_TIER:str="auto"
+    # zstd needs the zstandard package and falls back to zlib without it
+    NOTE_CONTENT_CODEC:str="zstd"
+    NOTE_CONTENT_MIN_BYTES:int=256
+    # revision history kept per note: everything from the Nth newest snapshot on; 0 keeps it all
+    NOTE_KEEP_SNAPSHOTS:int=5
+
+    # cache invalidation between workers, see src/utils/bus.py: "memory" (one process), "sqlite"
+    # (processes sharing INVALIDATION_SQLITE_PATH on one host) or "redis" (pub/sub, any number of hosts)
+    INVALIDATION_BUS:str="memory"
+    # unset, the events file sits next to a SQLite DATABASE_URL, or in the temp directory
+    INVALIDATION_SQLITE_PATH:Optional[str]=None
+    INVALIDATION_POLL_INTERVAL:float=0.2
+    INVALIDATION_RETENTION:float=300.0
+    INVALIDATION_REDIS_URL:Optional[str]=None
+    INVALIDATION_CHANNEL:str="smartnotes:invalidate"
+
+    DASHBOARD_CACHE_TTL:int=300
+    DASHBOARD_CACHE_MAX_ENTRIES:int=10000
+
+    # instrumentation, see src/metrics
+    METRICS_ENABLED:bool=True
+    SLOW_QUERY_MS:int=200
+    N_PLUS_ONE_THRESHOLD:int=10
+    PROFILE_REQUESTS:bool=False
+    PROFILE_SAMPLE_RATE:float=0.0
+    PROFILE_DIR:str="profiles"
+
+    # chatbot response cache: "memory", "redis" or "none"
+    CHAT_CACHE_BACKEND:str="memory"
+    CHAT_CACHE_TTL:int=3600
+    CHAT_CACHE_MAX_ENTRIES:int=1024
+    CHAT_CACHE_MAX_BYTES:int=32*1024*1024
+    CHAT_CACHE_REDIS_URL:Optional[str]=None
+    CHAT_CACHE_SEMANTIC:bool=False
+    CHAT_CACHE_EMBEDDING_MODEL:str="all-MiniLM-L6-v2"
+    CHAT_CACHE_SIMILARITY:float=0.92
+
+    # outbound LLM calls, see src/chatbot/upstream.py; LLM_PROVIDER=fake answers locally
+    LLM_PROVIDER:str="groq"
+    LLM_FAKE_LATENCY:float=0.5
+    LLM_MAX_CONCURRENCY:int=8
+    LLM_RATE_LIMIT:float=0.5
+    LLM_BURST:int=5
+    LLM_MAX_WAITING:int=64
+    LLM_QUEUE_TIMEOUT:float=30.0
+    LLM_MAX_RETRIES:int=3
+    LLM_RETRY_BASE:float=0.5
+    LLM_RETRY_MAX:float=8.0
+    LLM_RETRY_AFTER:int=5
+
+    # background generation jobs, see src/jobs; JOBS_WORKERS=0 leaves them to `python -m src.jobs.worker`.
+    # unset, the queue's table lives in DATABASE_URL
+    JOBS_DATABASE_URL:Optional[str]=None
+    JOBS_WORKERS:int=2
+    JOBS_POLL_INTERVAL:float=1.0
+    JOBS_LEASE_SECONDS:int=120
+    JOBS_MAX_ATTEMPTS:int=3
+    JOBS_RETRY_DELAY:float=5.0
+    JOBS_USER_CONCURRENCY:int=1
+    JOBS_MAX_QUEUED_PER_USER:int=20
+
+    # chatbot conversation sessions, see src/chatbot/sessions.py: "memory" (per process, so several
+    # workers need sticky routing) or "redis" (shared)
+    CHAT_SESSION_BACKEND:str="memory"
+    CHAT_SESSION_REDIS_URL:Optional[str]=None
+    CHAT_SESSION_TTL:int=3600
+    CHAT_SESSION_MAX_ENTRIES:int=10000
+    CHAT_SESSION_MAX_BYTES:int=64*1024*1024
+    CHAT_HISTORY_TOKENS:int=800
+    CHAT_SUMMARY_TOKENS:int=200
+    CHAT_TURN_TOKENS:int=300
+
+    # POST /chatbot/generate/batch: topics per request and how many of them are generated at once
+    CHAT_BATCH_MAX_TOPICS:int=20
+    CHAT_BATCH_CONCURRENCY:int=8
+
+    # per-client LLM token budgets over sliding windows, see src/chatbot/usage.py; 0 turns a window off.
+    # Signed-in users are counted by their token's user id, anonymous visitors by IP address. Behind a
+    # reverse proxy, list its addresses or networks (comma separated) so X-Forwarded-For is used
+    CHAT_TOKENS_PER_HOUR:int=20000
+    CHAT_TOKENS_PER_DAY:int=100000
+    CHAT_ANON_TOKENS_PER_HOUR:int=4000
+    CHAT_ANON_TOKENS_PER_DAY:int=10000
+    CHAT_USAGE_FLUSH_INTERVAL:float=5.0
+    CHAT_USAGE_REFRESH:float=5.0
+    CHAT_USAGE_MAX_CLIENTS:int=100000
+    CHAT_TRUSTED_PROXIES:str=""
+
+    # retrieval over the signed-in user's notes, see src/chatbot/retrieval.py
+    RAG_ENABLED:bool=True
+    RAG_TOP_K:int=4
+    RAG_CONTEXT_TOKENS:int=600
+    RAG_CHUNK_TOKENS:int=160
+    RAG_MAX_USERS:int=256
+
+    # subject study artifacts (summary, flashcards, Q&A), see src/subject/artifacts.py: notes are cut
+    # into chunks of ARTIFACT_CHUNK_TOKENS, each chunk is condensed once, and the condensed chunks are
+    # merged ARTIFACT_REDUCE_FANOUT at a time until they fit in ARTIFACT_REDUCE_TOKENS
+    ARTIFACT_CHUNK_TOKENS:int=600
+    ARTIFACT_REDUCE_TOKENS:int=2400
+    ARTIFACT_REDUCE_FANOUT:int=8
+    ARTIFACT_CONCURRENCY:int=4
+    ARTIFACT_MAX_CHUNKS:int=400
 
 
 settings=Settings()
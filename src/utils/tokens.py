@@ -0,0 +1,8 @@
+import math
+
+# ~4 characters per token is close enough for English text with the Llama tokenizer
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
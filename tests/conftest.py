@@ -0,0 +1,83 @@
+import os
+import tempfile
+import uuid
+from pathlib import Path
+
+import pytest
+
+TMP = Path(tempfile.mkdtemp(prefix="smartnotes-tests-"))
+
+# the settings are read when src is first imported; set, not setdefault, so a developer's .env or
+# shell can never point the tests at a real database or provider
+os.environ.update(
+    {
+        "DATABASE_URL": f"sqlite:///{TMP / 'app.db'}",
+        # empty: the job queue shares DATABASE_URL
+        "JOBS_DATABASE_URL": "",
+        "EXP_TIME": "30",
+        "ALGORITHM": "HS256",
+        "SECRET_KEY": "test-secret-key-0123456789abcdef0123456789",
+        "GROQ_API_KEY": "test",
+        "DB_ASYNC": "false",
+        "LLM_PROVIDER": "fake",
+        "LLM_FAKE_LATENCY": "0",
+        "LLM_RATE_LIMIT": "0",
+        "JOBS_WORKERS": "0",
+        "HASH_WORKERS": "0",
+        "INVALIDATION_BUS": "memory",
+    }
+)
+
+
+def unique(prefix: str) -> str:
+    return f"{prefix}-{uuid.uuid4().hex[:10]}"
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+
+    import main
+
+    # entering the client runs the lifespan, which creates the schema
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def register(client):
+    def register(name: str = None) -> dict:
+        username = name or unique("user")
+        body = {"name": username, "username": username, "email": f"{username}@example.com", "password": "pw"}
+        assert client.post("/users/register", json=body).status_code == 201
+        token = client.post("/users/login", json={"username": username, "password": "pw"}).json()["token"]
+        return {"Authorization": f"Bearer {token}"}
+
+    return register
+
+
+@pytest.fixture
+def auth(register) -> dict:
+    return register()
+
+
+@pytest.fixture
+def make_subject(client):
+    # subject titles are unique across all users
+    def make_subject(headers: dict, title: str = None) -> int:
+        response = client.post("/subjects/create", json={"title": title or unique("subject")}, headers=headers)
+        assert response.status_code == 201
+        return response.json()["id"]
+
+    return make_subject
+
+
+@pytest.fixture
+def make_note(client):
+    def make_note(headers: dict, subject_id: int, title: str = "note", content: str = "body") -> dict:
+        body = {"title": title, "content": content, "subject_id": subject_id}
+        response = client.post("/notes/create", json=body, headers=headers)
+        assert response.status_code == 201
+        return response.json()
+
+    return make_note
@@ -0,0 +1,81 @@
+from src.subject import artifacts
+
+
+def build(client, headers, subject_id) -> dict:
+    response = client.post(f"/subjects/{subject_id}/artifacts/build", headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def stale(client, headers, subject_id) -> list:
+    response = client.get(f"/subjects/{subject_id}/artifacts", headers=headers)
+    assert response.status_code == 200
+    return [artifact["stale"] for artifact in response.json()["artifacts"]]
+
+
+def test_build_then_rebuild_reuses_every_step(client, auth, make_subject, make_note):
+    subject_id = make_subject(auth)
+    make_note(auth, subject_id, title="cells", content="Cells are the unit of life.")
+    make_note(auth, subject_id, title="atp", content="ATP stores energy in phosphate bonds.")
+
+    first = build(client, auth, subject_id)
+    assert [artifact["kind"] for artifact in first["artifacts"]] == list(artifacts.ARTIFACT_KINDS)
+    assert first["build"]["generated"] > 0 and first["chunks"] > 0
+    assert build(client, auth, subject_id)["build"] == {"generated": 0, "reused": first["build"]["generated"]}
+
+    stored = client.get(f"/subjects/{subject_id}/artifacts", headers=auth).json()
+    assert stored["chunks"] == first["chunks"]
+    assert [artifact["stale"] for artifact in stored["artifacts"]] == [False, False, False]
+
+
+def test_reads_mark_artifacts_stale_without_reading_the_notes(client, auth, make_subject, make_note, monkeypatch):
+    subject_id = make_subject(auth)
+    other_id = make_subject(auth)
+    note = make_note(auth, subject_id, content="Osmosis moves water across a membrane.")
+    make_note(auth, other_id, content="Diffusion spreads solutes out.")
+    build(client, auth, subject_id)
+    build(client, auth, other_id)
+
+    def unread(*args, **kwargs):
+        raise AssertionError("GET /artifacts read the notes")
+
+    monkeypatch.setattr(artifacts, "source_chunks", unread)
+    assert stale(client, auth, subject_id) == [False, False, False]
+
+    patch = {"base_revision": 1, "ops": [{"insert": "Edited. "}]}
+    assert client.patch(f"/notes/patch/{note['id']}", json=patch, headers=auth).status_code == 200
+    assert stale(client, auth, subject_id) == [True, True, True]
+    assert stale(client, auth, other_id) == [False, False, False]
+
+    # moving a note changes both subjects
+    monkeypatch.undo()
+    build(client, auth, subject_id)
+    moved = client.post("/notes/bulk_move", json={"subject_id": other_id, "note_ids": [note["id"]]}, headers=auth)
+    assert moved.json() == {"moved": 1}
+    assert stale(client, auth, subject_id) == [True, True, True]
+    assert stale(client, auth, other_id) == [True, True, True]
+
+    build(client, auth, other_id)
+    client.post("/notes/bulk_delete", json={"note_ids": [note["id"]]}, headers=auth)
+    assert stale(client, auth, other_id) == [True, True, True]
+
+
+def test_a_failed_build_does_not_leak_the_error(client, auth, make_subject, make_note, monkeypatch):
+    subject_id = make_subject(auth)
+    make_note(auth, subject_id)
+
+    async def broken(subject_id, current_user):
+        raise RuntimeError("connection to postgres://admin:secret@db failed")
+
+    monkeypatch.setattr(artifacts, "build_artifacts", broken)
+    response = client.post(f"/subjects/{subject_id}/artifacts/build", headers=auth)
+    assert response.status_code == 500
+    assert response.json() == {"detail": "Artifact build failed"}
+
+
+def test_artifacts_belong_to_the_subject_owner(client, auth, register, make_subject):
+    subject_id = make_subject(auth)
+    other = register()
+    assert client.get(f"/subjects/{subject_id}/artifacts", headers=other).status_code == 404
+    assert client.post(f"/subjects/{subject_id}/artifacts/build", headers=other).status_code == 404
+    assert client.post(f"/subjects/{subject_id}/artifacts/build", headers=auth).status_code == 400
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from src.notes import async_controller as notes
+from src.notes.dtos import DeltaOp, NotesPatch, NotesSchema
+from src.subject import async_controller as subjects
+from src.users.auth import Principal
+from src.utils.async_db import AsyncSessionLocal
+from src.utils.etags import acurrent_version
+
+
+@pytest.fixture
+def principal(client, auth) -> Principal:
+    user = client.get("/users/is_auth", headers=auth).json()
+    return Principal(id=user["id"], name=user["name"], username=user["username"], email=user["email"])
+
+
+def run(handler):
+    # one session per call, like one request on the async routers
+    async def call():
+        async with AsyncSessionLocal() as db:
+            return await handler(db)
+
+    return asyncio.run(call())
+
+
+def test_note_lifecycle_keeps_search_revisions_and_version_in_step(auth, principal, make_subject):
+    subject_id = make_subject(auth)
+    before = run(lambda db: acurrent_version(db, principal.id))
+
+    created = run(lambda db: notes.create_note(NotesSchema(title="Krebs", content="citric acid cycle", subject_id=subject_id), db, principal))
+    assert created.revision == 1
+    hits = run(lambda db: notes.search_notes("citric", 10, None, db, principal))
+    assert [hit["id"] for hit in hits] == [created.id]
+    after_create = run(lambda db: acurrent_version(db, principal.id))
+    assert after_create != before
+
+    updated = run(lambda db: notes.update_note(created.id, NotesSchema(title="Krebs", content="oxidative phosphorylation", subject_id=subject_id), db, principal))
+    assert updated.revision == 2
+    assert run(lambda db: notes.search_notes("citric", 10, None, db, principal)) == []
+
+    patch = NotesPatch(base_revision=2, ops=[DeltaOp(retain=10), DeltaOp(delete=15), DeltaOp(insert="decarboxylation")])
+    patched = run(lambda db: notes.patch_note(created.id, patch, db, principal))
+    assert patched["revision"] == 3
+    assert run(lambda db: notes.get_note_revision(created.id, 3, db, principal))["content"] == "oxidative decarboxylation"
+    assert run(lambda db: notes.get_note_revision(created.id, 1, db, principal))["content"] == "citric acid cycle"
+    assert [item.revision for item in run(lambda db: notes.list_note_revisions(created.id, 10, None, db, principal))] == [3, 2, 1]
+
+    run(lambda db: notes.delete_note(created.id, db, principal))
+    assert run(lambda db: notes.search_notes("decarboxylation", 10, None, db, principal)) == []
+    assert run(lambda db: acurrent_version(db, principal.id)) != after_create
+
+
+def test_subject_delete_removes_its_notes(client, auth, principal, make_subject, make_note):
+    subject_id = make_subject(auth)
+    note = make_note(auth, subject_id, title="glycolysis", content="pyruvate")
+
+    run(lambda db: subjects.delete_subject(subject_id, db, principal))
+
+    assert client.get(f"/notes/get_note/{note['id']}", headers=auth).status_code == 404
+    assert client.get("/notes/search", params={"q": "pyruvate"}, headers=auth).json() == []
@@ -0,0 +1,30 @@
+from src.users.auth import token_cache
+
+
+def token_of(headers: dict) -> str:
+    return headers["Authorization"].split(" ")[1]
+
+
+def test_principal_is_cached_after_the_first_request(client, auth):
+    assert token_cache.get(token_of(auth)) is None
+
+    first = client.get("/users/is_auth", headers=auth).json()
+
+    cached = token_cache.get(token_of(auth))
+    assert cached is not None and cached.id == first["id"]
+    assert client.get("/users/is_auth", headers=auth).json() == first
+
+
+def test_profile_update_evicts_the_cached_principal(client, auth):
+    client.get("/users/is_auth", headers=auth)
+    me = client.get("/users/is_auth", headers=auth).json()
+
+    body = {"name": "Renamed", "username": me["username"]}
+    assert client.put("/users/profile", json=body, headers=auth).status_code == 200
+
+    assert client.get("/users/is_auth", headers=auth).json()["name"] == "Renamed"
+
+
+def test_missing_and_invalid_tokens_are_rejected(client):
+    assert client.get("/users/is_auth").status_code == 401
+    assert client.get("/users/is_auth", headers={"Authorization": "Bearer nope"}).status_code == 401
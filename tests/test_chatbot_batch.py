@@ -0,0 +1,35 @@
+import json
+
+from tests.test_chatbot_stream import events
+
+
+def batch(client, headers=None, **body):
+    return client.post("/chatbot/generate/batch", json=body, headers=headers or {})
+
+
+def test_every_topic_gets_a_result_then_done(client):
+    topics = ["batch mitosis", "batch meiosis", "batch mitosis"]
+    response = batch(client, topics=topics + ["   "], user_name="Ada")
+    assert response.status_code == 200
+    parsed = events(response.text)
+
+    results = [json.loads(data) for event, data in parsed if event == "result"]
+    assert sorted(result["index"] for result in results) == [0, 1, 2]
+    assert all(result["topic"] == topics[result["index"]] and "error" not in result for result in results)
+    assert all(result["response"].startswith("Hi Ada!") for result in results)
+    assert parsed[-1] == ("done", json.dumps({"completed": 3, "failed": 0}))
+
+
+def test_answers_are_saved_to_the_subject_in_topic_order(client, auth, make_subject):
+    subject_id = make_subject(auth)
+    parsed = events(batch(client, auth, topics=["batch saved one", "batch saved two"], subject_id=subject_id).text)
+    saved = json.loads(next(data for event, data in parsed if event == "saved"))["note_ids"]
+    titles = [client.get(f"/notes/get_note/{note_id}", headers=auth).json()["title"] for note_id in saved]
+    assert titles == ["batch saved one", "batch saved two"]
+
+
+def test_batch_is_validated_before_streaming(client, auth, register, make_subject):
+    assert batch(client, topics=[]).status_code == 400
+    assert batch(client, topics=["t"] * 100).status_code == 400
+    assert batch(client, topics=["t"], subject_id=1).status_code == 401
+    assert batch(client, auth, topics=["t"], subject_id=make_subject(register())).status_code == 404
@@ -0,0 +1,36 @@
+def generate(client, query, user_name=None):
+    response = client.post("/chatbot/generate", json={"query": query, "user_name": user_name})
+    assert response.status_code == 200
+    return response.json()["response"]
+
+
+def stats(client, headers):
+    response = client.get("/chatbot/cache/stats", headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_normalized_questions_share_one_entry(client, auth):
+    generate(client, "What is a cache key?", "Ada")
+    before = stats(client, auth)
+
+    answer = generate(client, "  what IS a cache   key ", "Grace")
+
+    after = stats(client, auth)
+    assert after["hits"] == before["hits"] + 1
+    assert after["misses"] == before["misses"]
+    # personalised after the lookup, so the cached answer greets the new caller
+    assert answer.startswith("Hi Grace!")
+
+
+def test_different_questions_miss(client, auth):
+    before = stats(client, auth)
+    generate(client, "first distinct cache question")
+    generate(client, "second distinct cache question")
+    assert stats(client, auth)["misses"] == before["misses"] + 2
+
+
+def test_stats_routes_need_a_signed_in_user(client, auth):
+    for path in ("/chatbot/cache/stats", "/chatbot/sessions/stats"):
+        assert client.get(path).status_code == 401
+        assert client.get(path, headers=auth).status_code == 200
@@ -0,0 +1,112 @@
+import asyncio
+
+from src.chatbot import router
+from src.chatbot.sessions import ASSISTANT, STUDENT, ChatSession, RedisSessionStore, SessionStore
+from src.utils.redis_client import FakeRedis, connect
+from src.utils.settings import settings
+from tests.conftest import unique
+
+
+def ask(client, headers, session_id, query):
+    response = client.post("/chatbot/generate", json={"query": query, "session_id": session_id}, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_a_session_keeps_the_conversation(client, auth):
+    session_id = client.post("/chatbot/sessions", headers=auth).json()["session_id"]
+    assert ask(client, auth, session_id, "what is osmosis")["session_id"] == session_id
+    ask(client, auth, session_id, "and diffusion")
+
+    history = client.get(f"/chatbot/sessions/{session_id}", headers=auth).json()
+    assert [(turn["role"], turn["content"]) for turn in history["history"]][::2] == [
+        (STUDENT, "what is osmosis"),
+        (STUDENT, "and diffusion"),
+    ]
+    assert history["stats"]["turns"] == 4
+    assert history["stats"]["prompt_tokens_total"] > 0
+
+
+def test_sessions_belong_to_their_user(client, auth, register):
+    session_id = client.post("/chatbot/sessions", headers=auth).json()["session_id"]
+    other = register()
+    assert client.get(f"/chatbot/sessions/{session_id}", headers=other).status_code == 404
+    assert client.post("/chatbot/generate", json={"query": "q", "session_id": session_id}, headers=other).status_code == 404
+    assert client.delete(f"/chatbot/sessions/{session_id}", headers=auth).status_code == 204
+    assert client.get(f"/chatbot/sessions/{session_id}", headers=auth).status_code == 404
+
+
+def test_compaction_folds_old_turns_into_a_bounded_summary(monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_HISTORY_TOKENS", 40)
+    monkeypatch.setattr(settings, "CHAT_TURN_TOKENS", 20)
+    store = SessionStore(max_entries=10, ttl=60, max_bytes=1 << 20)
+    session = store.create(user_id=1)
+    for index in range(6):
+        store.record(session, f"question {index} " + "word " * 10, f"answer {index} " + "word " * 10, prompt_tokens=10)
+
+    async def summarize(previous, transcript):
+        return f"{previous} {transcript.count(STUDENT + ':')} questions".strip()
+
+    asyncio.run(store.compact(session, summarize))
+    assert session.summarized_turns > 0
+    assert session.summary.endswith("questions")
+    assert session.history_tokens() <= settings.CHAT_HISTORY_TOKENS // 2
+    assert session.turns[-1][0] == ASSISTANT
+    assert session.history_text().startswith("Summary of earlier conversation:")
+
+
+def test_compaction_falls_back_to_the_questions_when_the_model_fails(monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_HISTORY_TOKENS", 20)
+    session = ChatSession("s", None)
+    store = SessionStore(max_entries=10, ttl=60, max_bytes=1 << 20)
+    for index in range(4):
+        store.record(session, f"topic {index} " + "x " * 20, "reply " * 20, prompt_tokens=1)
+
+    async def broken(previous, transcript):
+        raise RuntimeError("model unavailable")
+
+    asyncio.run(store.compact(session, broken))
+    assert "Earlier the student asked about: topic 0" in session.summary
+
+
+class OffLoopRedis(FakeRedis):
+    # fails a call made on the event loop's thread, where a real round trip would block every request
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def check(self):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self.calls += 1
+            return
+        raise AssertionError("Redis was called on the event loop")
+
+    def get(self, key):
+        self.check()
+        return super().get(key)
+
+    def set(self, key, value, ex=None):
+        self.check()
+        return super().set(key, value, ex=ex)
+
+
+def test_chat_routes_use_a_redis_store_off_the_event_loop(client, auth, monkeypatch):
+    server = OffLoopRedis()
+    monkeypatch.setattr(router, "session_store", RedisSessionStore(server, ttl=60, max_bytes=1 << 20))
+    session_id = client.post("/chatbot/sessions", headers=auth).json()["session_id"]
+
+    ask(client, auth, session_id, unique("redis topic"))
+    stream = client.post("/chatbot/generate/stream", json={"query": unique("redis stream"), "session_id": session_id}, headers=auth)
+    assert stream.status_code == 200
+
+    history = client.get(f"/chatbot/sessions/{session_id}", headers=auth).json()
+    assert history["stats"]["turns"] == 4
+    assert server.calls >= 5
+
+
+def test_fake_redis_url_backs_the_session_store():
+    store = RedisSessionStore(connect(f"fake://{unique('sessions')}"), ttl=60, max_bytes=1 << 20)
+    session = store.create(user_id=None)
+    assert store.get(session.id, None).id == session.id
@@ -0,0 +1,26 @@
+def events(text: str):
+    parsed = []
+    for block in text.strip().split("\n\n"):
+        lines = block.split("\n")
+        event = next((line[len("event: "):] for line in lines if line.startswith("event: ")), "message")
+        data = "\n".join(line[len("data: "):] for line in lines if line.startswith("data: "))
+        parsed.append((event, data))
+    return parsed
+
+
+def test_stream_sends_the_answer_then_done(client):
+    response = client.post("/chatbot/generate/stream", json={"query": "stream topic one", "user_name": "Ada"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    parsed = events(response.text)
+    assert parsed[-1] == ("done", "")
+    text = "".join(data for event, data in parsed if event == "message")
+    assert text.startswith("Hi Ada!") and "# stream topic one" in text
+
+
+def test_stream_matches_the_non_streaming_answer(client):
+    streamed = events(client.post("/chatbot/generate/stream", json={"query": "stream topic two"}).text)
+    generated = client.post("/chatbot/generate", json={"query": "stream topic two"}).json()["response"]
+
+    assert "".join(data for event, data in streamed if event == "message") == generated
@@ -0,0 +1,86 @@
+import pytest
+from fastapi import HTTPException
+from langchain_core.messages import AIMessage, AIMessageChunk
+from starlette.requests import Request
+
+from src.chatbot import router
+from src.chatbot.usage import UsageMeter, client_address, usage_meter, user_client
+from src.utils.settings import settings
+from tests.conftest import unique
+
+REPORTED = {"input_tokens": 321, "output_tokens": 54, "total_tokens": 375}
+
+
+def user_id(client, headers) -> int:
+    return client.get("/users/is_auth", headers=headers).json()["id"]
+
+
+def test_generate_answers_429_once_the_budget_is_spent(client, auth):
+    caller = user_client(user_id(client, auth))
+    usage_meter.record(caller, settings.CHAT_TOKENS_PER_HOUR, 0)
+
+    response = client.post("/chatbot/generate", json={"query": "over budget"}, headers=auth)
+    assert response.status_code == 429
+    assert 0 < int(response.headers["Retry-After"]) <= 3600 + 60
+
+    usage = client.get("/chatbot/usage", headers=auth).json()
+    hour = next(window for window in usage["windows"] if window["seconds"] == 3600)
+    assert hour["remaining"] == 0 and hour["retry_after"] > 0
+
+
+def test_budget_is_shared_by_every_worker(client, auth):
+    # two meters over one database stand in for two worker processes
+    caller = user_client(user_id(client, auth))
+    first = UsageMeter(max_clients=100, flush_interval=60, refresh=0)
+    second = UsageMeter(max_clients=100, flush_interval=60, refresh=0)
+    first.check(caller)
+    second.check(caller)
+
+    first.record(caller, settings.CHAT_TOKENS_PER_HOUR // 2, 0)
+    second.record(caller, settings.CHAT_TOKENS_PER_HOUR // 2, 0)
+    # each worker alone is under budget until the other's counts are flushed
+    first.check(caller)
+    second.flush()
+    first.flush()
+    for meter in (first, second):
+        with pytest.raises(HTTPException) as rejected:
+            meter.check(caller)
+        assert rejected.value.status_code == 429
+
+
+
+class ReportingChain:
+    # stands in for a chat model that reports its token usage
+    async def ainvoke(self, inputs):
+        return AIMessage(content="answer", usage_metadata=REPORTED)
+
+    async def astream(self, inputs):
+        yield AIMessageChunk(content="ans")
+        yield AIMessageChunk(content="wer")
+        yield AIMessageChunk(content="", usage_metadata=REPORTED)
+
+
+def test_the_providers_reported_usage_is_charged(client, auth, monkeypatch):
+    charged = []
+    monkeypatch.setattr(router, "notes_chain", ReportingChain)
+    monkeypatch.setattr(usage_meter, "record", lambda caller, prompt, completion: charged.append((prompt, completion)))
+
+    response = client.post("/chatbot/generate", json={"query": unique("reported")}, headers=auth)
+    assert response.json()["response"].endswith("answer")
+    streamed = client.post("/chatbot/generate/stream", json={"query": unique("reported")}, headers=auth)
+    assert streamed.status_code == 200
+    assert charged == [(321, 54), (321, 54)]
+
+
+def request_from(host: str, forwarded: str = None) -> Request:
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "client": (host, 5000), "headers": headers})
+
+
+def test_forwarded_for_is_only_believed_from_a_trusted_proxy(monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_TRUSTED_PROXIES", "10.0.0.0/8, 192.168.1.1")
+    assert client_address(request_from("203.0.113.9", "198.51.100.1")) == "203.0.113.9"
+    assert client_address(request_from("10.1.2.3", "198.51.100.1")) == "198.51.100.1"
+    # a caller's own X-Forwarded-For entries come before the hops our proxies appended
+    assert client_address(request_from("10.1.2.3", "1.2.3.4, 198.51.100.1, 192.168.1.1")) == "198.51.100.1"
+    assert client_address(request_from("10.1.2.3")) == "10.1.2.3"
@@ -0,0 +1,78 @@
+from src.dashboard.controller import summary_cache
+from src.utils.constents import DASHBOARD_RECENT_NOTES
+from src.utils.db import SessionLocal
+from src.utils.etags import bump_version, current_version
+
+
+def summary_key(client, headers) -> tuple:
+    user_id = client.get("/users/is_auth", headers=headers).json()["id"]
+    with SessionLocal() as db:
+        return user_id, DASHBOARD_RECENT_NOTES, current_version(db, user_id)
+
+
+def doctor(key):
+    cached = summary_cache.get(key)
+    summary_cache.set(key, {**cached, "totals": {**cached["totals"], "notes": 99}}, group=key[0])
+
+
+def summary(client, headers, **params) -> dict:
+    response = client.get("/dashboard/summary", params=params, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_summary_aggregates_per_subject(client, auth, make_subject, make_note):
+    first = make_subject(auth)
+    empty = make_subject(auth)
+    make_note(auth, first, title="a", content="12345")
+    make_note(auth, first, title="b", content="123")
+
+    result = summary(client, auth)
+    by_id = {subject["id"]: subject for subject in result["subjects"]}
+    assert by_id[first]["note_count"] == 2
+    assert by_id[first]["content_length"] == 8
+    assert by_id[empty]["note_count"] == 0
+    assert by_id[empty]["last_note_at"] is None
+    assert result["totals"] == {"subjects": 2, "notes": 2, "content_length": 8}
+    assert [note["title"] for note in result["recent_notes"]] == ["b", "a"]
+    assert [note["title"] for note in summary(client, auth, recent=1)["recent_notes"]] == ["b"]
+
+
+def test_summary_is_cached_until_the_user_writes(client, auth, register, make_subject, make_note):
+    subject_id = make_subject(auth)
+    make_note(auth, subject_id)
+    assert summary(client, auth)["totals"]["notes"] == 1
+
+    # a doctored cache entry is served as is...
+    doctor(summary_key(client, auth))
+    assert summary(client, auth)["totals"]["notes"] == 99
+
+    # ...until one of the user's own writes drops it
+    other = register()
+    make_note(other, make_subject(other))
+    assert summary(client, auth)["totals"]["notes"] == 99
+    make_note(auth, subject_id)
+    assert summary(client, auth)["totals"]["notes"] == 2
+
+
+
+def test_summary_is_keyed_by_the_data_version(client, auth, make_subject, make_note):
+    make_note(auth, make_subject(auth))
+    assert summary(client, auth)["totals"]["notes"] == 1
+    key = summary_key(client, auth)
+    doctor(key)
+
+    # a write whose invalidation never reached this process (another worker, or one that landed
+    # while the summary was being built) still moves the key
+    with SessionLocal() as db:
+        bump_version(db, key[0])
+        db.commit()
+    assert summary(client, auth)["totals"]["notes"] == 1
+    assert summary_cache.get(key)["totals"]["notes"] == 99
+
+    summary_cache.invalidate_group(key[0])
+    assert summary_cache.get(key) is None
+    assert summary_cache.get(summary_key(client, auth)) is None
+
+def test_summary_requires_auth(client):
+    assert client.get("/dashboard/summary").status_code == 401
@@ -0,0 +1,43 @@
+from sqlalchemy import create_engine, text
+
+from src.utils import db
+from src.utils.db import PoolStats, ReplicaMonitor, timed_pool
+
+
+def test_timed_pool_records_checkouts():
+    stats = PoolStats()
+    engine = create_engine("sqlite://", poolclass=timed_pool(stats), pool_size=1, max_overflow=0)
+    for _ in range(3):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+    snapshot = stats.snapshot()
+    assert snapshot["checkouts"] == 3 and snapshot["timeouts"] == 0
+
+
+def test_replica_is_used_while_its_lag_is_acceptable(monkeypatch):
+    monitor = ReplicaMonitor(create_engine("sqlite://"), max_lag=5, interval=0)
+    monkeypatch.setitem(ReplicaMonitor.LAG_SQL, "sqlite", "SELECT 1")
+    assert monitor.is_healthy() and monitor.lag == 1
+
+    monkeypatch.setitem(ReplicaMonitor.LAG_SQL, "sqlite", "SELECT 30")
+    assert not monitor.is_healthy()
+    assert monitor.fallbacks == 1
+
+
+def test_unreachable_replica_falls_back_to_the_primary(monkeypatch):
+    monitor = ReplicaMonitor(create_engine("sqlite:////nonexistent/dir/replica.db"), max_lag=5, interval=0)
+    replica_session = object()
+    monkeypatch.setattr(db, "replica_monitor", monitor)
+    monkeypatch.setattr(db, "ReadSessionLocal", lambda: replica_session)
+
+    session = db.read_session()
+
+    assert session is not replica_session and session.get_bind() is db.engine
+    assert monitor.lag is None
+    session.close()
+
+
+def test_health_route_reports_the_primary_pool(client, auth):
+    assert client.get("/health/db").status_code == 401
+    assert "primary" in client.get("/health/db", headers=auth).json()
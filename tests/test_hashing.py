@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from src.users.hashing import HashingPool, hash_in_worker, verify_in_worker
+from tests.conftest import unique
+
+
+def test_hash_round_trip_on_a_process_pool():
+    pool = HashingPool(workers=1, max_pending=4)
+    try:
+        hashed = asyncio.run(pool.run("hash_password", hash_in_worker, "secret"))
+        assert asyncio.run(pool.run("verify_password", verify_in_worker, "secret", hashed))[0] is True
+        assert asyncio.run(pool.run("verify_password", verify_in_worker, "wrong", hashed))[0] is False
+    finally:
+        pool.shutdown()
+    assert pool.pending == 0
+
+
+def test_full_queue_sheds_with_503():
+    pool = HashingPool(workers=0, max_pending=1)
+
+    async def overload():
+        first = asyncio.ensure_future(pool.run("hash_password", hash_in_worker, "one"))
+        await asyncio.sleep(0)
+        try:
+            with pytest.raises(HTTPException) as shed:
+                await pool.run("hash_password", hash_in_worker, "two")
+        finally:
+            await first
+        return shed.value
+
+    error = asyncio.run(overload())
+    assert error.status_code == 503
+    assert "Retry-After" in error.headers
+    assert pool.pending == 0
+
+
+def test_login_checks_the_password(client, register):
+    username = unique("hash")
+    register(username)
+    ok = client.post("/users/login", json={"username": username, "password": "pw"})
+    assert ok.status_code == 200 and ok.json()["token"]
+    assert client.post("/users/login", json={"username": username, "password": "nope"}).status_code == 401
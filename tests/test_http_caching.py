@@ -0,0 +1,47 @@
+from tests.conftest import unique
+
+
+def test_unchanged_reads_answer_304(client, auth, make_subject, make_note):
+    note = make_note(auth, make_subject(auth))
+    for path in (f"/notes/get_note/{note['id']}", "/subjects/get", "/notes/list"):
+        first = client.get(path, headers=auth)
+        etag = first.headers["ETag"]
+        assert first.status_code == 200
+        assert "Authorization" in first.headers["Vary"]
+
+        again = client.get(path, headers={**auth, "If-None-Match": f'W/{etag}, "other"'})
+        assert again.status_code == 304
+        assert again.headers["ETag"] == etag
+        assert again.content == b""
+
+
+def test_writes_and_query_strings_change_the_etag(client, auth, register, make_subject, make_note):
+    subject_id = make_subject(auth)
+    etag = client.get("/notes/list", headers=auth).headers["ETag"]
+    assert client.get("/notes/list", params={"subject_id": subject_id}, headers=auth).headers["ETag"] != etag
+
+    # another user's write leaves this user's version alone
+    other = register()
+    make_note(other, make_subject(other))
+    assert client.get("/notes/list", headers={**auth, "If-None-Match": etag}).status_code == 304
+
+    make_note(auth, subject_id)
+    changed = client.get("/notes/list", headers={**auth, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+    etag = changed.headers["ETag"]
+    client.put(f"/subjects/update/{subject_id}", json={"title": unique("renamed")}, headers=auth)
+    assert client.get("/notes/list", headers={**auth, "If-None-Match": etag}).status_code == 200
+
+
+def test_users_never_share_an_etag(client, register):
+    first, second = register(), register()
+    assert client.get("/subjects/get", headers=first).headers["ETag"] != client.get("/subjects/get", headers=second).headers["ETag"]
+
+
+def test_large_responses_are_compressed(client, auth, make_subject, make_note):
+    subject_id = make_subject(auth)
+    make_note(auth, subject_id, content="compressible " * 400)
+    response = client.get("/notes/list", params={"view": "full"}, headers={**auth, "Accept-Encoding": "br, gzip"})
+    assert response.headers["Content-Encoding"] in ("br", "gzip")
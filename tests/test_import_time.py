@@ -0,0 +1,10 @@
+import statistics
+
+from benchmarks.import_time import BUDGET_MS, LAZY_MODULES, probe
+
+
+def test_import_main_stays_within_budget_and_lazy():
+    # fresh interpreters, no GROQ_API_KEY and a database that cannot be opened, as in benchmarks/import_time.py
+    runs = [probe() for _ in range(3)]
+    assert statistics.median(run["ms"] for run in runs) <= BUDGET_MS
+    assert not set(LAZY_MODULES) & set(runs[-1]["modules"])
@@ -0,0 +1,113 @@
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from src.chatbot.sessions import RedisSessionStore
+from src.utils import bus as bus_module
+from src.utils.bus import DATA_CHANGED, PollingBus, RedisBus, SQLiteBus, sqlite_bus_path
+from src.utils.redis_client import FakeRedis, connect
+from src.utils.settings import settings
+from tests.conftest import TMP, unique
+
+
+def listen(bus) -> list:
+    received = []
+    bus.subscribe(DATA_CHANGED, lambda data, local: received.append((data, local)))
+    return received
+
+
+def wait_for(received: list, count: int):
+    deadline = time.monotonic() + 5
+    while len(received) < count and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return received
+
+
+def test_polling_bus_backends_must_implement_write_and_poll():
+    with pytest.raises(TypeError):
+        PollingBus(0.1)
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "redis"])
+def test_an_event_reaches_the_other_workers_once(backend):
+    if backend == "sqlite":
+        path = str(TMP / f"{unique('bus')}.db")
+        workers = [SQLiteBus(path, interval=0.02, retention=60) for _ in range(2)]
+    else:
+        server = FakeRedis()
+        workers = [RedisBus(server, unique("channel")) for _ in range(2)]
+        workers[1].channel = workers[0].channel
+    publisher, other = workers
+    sent, received = listen(publisher), listen(other)
+    for worker in workers:
+        worker.start()
+    try:
+        if backend == "redis":
+            # pub/sub only delivers to subscribers, and the receive thread subscribes on its first poll
+            deadline = time.monotonic() + 5
+            while not server.subscribers.get(other.channel) and time.monotonic() < deadline:
+                time.sleep(0.02)
+        publisher.publish(DATA_CHANGED, user_id=7, notes=True)
+        assert wait_for(received, 1) == [({"user_id": 7, "notes": True}, False)]
+        time.sleep(0.1)
+        # the publisher handled it locally and ignored its own copy
+        assert sent == [({"user_id": 7, "notes": True}, True)]
+    finally:
+        for worker in workers:
+            worker.stop()
+
+
+def test_the_sqlite_bus_file_defaults_to_beside_the_database(monkeypatch):
+    monkeypatch.setattr(settings, "INVALIDATION_SQLITE_PATH", None)
+    assert sqlite_bus_path() == str((TMP / "app-invalidation.db").resolve())
+    monkeypatch.setattr(settings, "DATABASE_URL", "postgresql://db/smartnotes")
+    assert sqlite_bus_path().endswith("smartnotes-invalidation.db")
+    monkeypatch.setattr(settings, "INVALIDATION_SQLITE_PATH", "/var/run/bus.db")
+    assert sqlite_bus_path() == "/var/run/bus.db"
+
+
+def test_fake_redis_urls_share_one_stand_in(monkeypatch):
+    url = f"fake://{unique('redis')}"
+    assert connect(url) is connect(url)
+    monkeypatch.setattr(settings, "INVALIDATION_BUS", "redis")
+    monkeypatch.setattr(settings, "INVALIDATION_REDIS_URL", url)
+    built = bus_module.build_bus()
+    assert isinstance(built, RedisBus) and built.client is connect(url)
+
+
+def test_redis_sessions_are_shared_between_workers():
+    server = FakeRedis()
+    first = RedisSessionStore(server, ttl=60, max_bytes=1 << 20)
+    second = RedisSessionStore(server, ttl=60, max_bytes=1 << 20)
+
+    session = first.create(user_id=3)
+    first.record(session, "what is osmosis", "water crossing a membrane", prompt_tokens=12)
+    loaded = second.get(session.id, 3)
+    assert loaded.turns == session.turns
+    assert loaded.stats() == session.stats()
+
+    second.record(loaded, "and diffusion", "solutes spreading out", prompt_tokens=20)
+    assert len(first.get(session.id, 3).turns) == 4
+    with pytest.raises(HTTPException):
+        first.get(session.id, None)
+    second.delete(session.id, 3)
+    with pytest.raises(HTTPException):
+        first.get(session.id, 3)
+
+
+def test_a_redis_backend_without_a_url_is_a_startup_error(monkeypatch):
+    from src.chatbot import cache, sessions
+
+    monkeypatch.setattr(settings, "INVALIDATION_BUS", "redis")
+    monkeypatch.setattr(settings, "INVALIDATION_REDIS_URL", None)
+    with pytest.raises(RuntimeError, match="INVALIDATION_REDIS_URL"):
+        bus_module.build_bus()
+    monkeypatch.setattr(settings, "CHAT_CACHE_BACKEND", "redis")
+    monkeypatch.setattr(settings, "CHAT_CACHE_REDIS_URL", None)
+    with pytest.raises(RuntimeError, match="CHAT_CACHE_REDIS_URL"):
+        cache.build_response_cache("v1")
+    monkeypatch.setattr(settings, "CHAT_SESSION_BACKEND", "redis")
+    monkeypatch.setattr(settings, "CHAT_SESSION_REDIS_URL", None)
+    with pytest.raises(RuntimeError, match="CHAT_SESSION_REDIS_URL"):
+        sessions.build_session_store()
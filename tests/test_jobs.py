@@ -0,0 +1,132 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from src.jobs.models import CANCELLED, DONE, FAILED, QUEUED, RUNNING, JobModel
+from src.jobs.queue import JobQueue, job_queue
+from src.jobs import controller
+from src.jobs.worker import JobWorkers
+from src.utils.settings import settings
+from tests.conftest import TMP, unique
+
+
+def fresh_queue() -> JobQueue:
+    queue = JobQueue(f"sqlite:///{TMP / (unique('jobs') + '.db')}")
+    queue.setup()
+    return queue
+
+
+def test_claims_follow_priority_and_the_per_user_cap(monkeypatch):
+    monkeypatch.setattr(settings, "JOBS_USER_CONCURRENCY", 1)
+    queue = fresh_queue()
+    low = queue.enqueue(1, {"query": "low"}, priority=0)
+    high = queue.enqueue(1, {"query": "high"}, priority=9)
+    other = queue.enqueue(2, {"query": "other user"}, priority=0)
+
+    assert queue.claim("a").id == high.id
+    # user 1 is at its cap, so its remaining job waits behind user 2's
+    assert queue.claim("b").id == other.id
+    assert queue.claim("c") is None
+    assert queue.complete(high.id, "a", "done")
+    assert queue.claim("c").id == low.id
+
+
+def test_the_per_user_cap_holds_between_two_claimers(monkeypatch):
+    monkeypatch.setattr(settings, "JOBS_USER_CONCURRENCY", 1)
+    first = fresh_queue()
+    # a second engine on the same file stands in for another worker process
+    second = JobQueue(first.engine.url.render_as_string(hide_password=False))
+    jobs = [first.enqueue(1, {"query": f"q{index}"}).id for index in range(3)]
+    raced = []
+
+    @event.listens_for(first.engine, "before_cursor_execute")
+    def race(conn, cursor, statement, parameters, context, executemany):
+        # the other worker claims between our candidate SELECT and our UPDATE
+        if statement.startswith("UPDATE") and not raced:
+            raced.append(second.claim("second"))
+
+    assert first.claim("first") is None
+    assert raced[0].id in jobs
+    with first.Session() as db:
+        assert db.query(JobModel).filter(JobModel.status == RUNNING).count() == 1
+
+
+def test_an_expired_lease_is_reclaimed_and_the_old_owner_is_fenced_off():
+    queue = fresh_queue()
+    job = queue.enqueue(1, {"query": "q"})
+    assert queue.claim("dead-worker").id == job.id
+    with queue.Session() as db:
+        db.query(JobModel).filter(JobModel.id == job.id).update({"lease_until": datetime.now() - timedelta(seconds=1)})
+        db.commit()
+
+    reclaimed = queue.claim("live-worker")
+    assert (reclaimed.id, reclaimed.attempts) == (job.id, 2)
+    assert not queue.complete(job.id, "dead-worker", "late")
+    assert queue.complete(job.id, "live-worker", "on time")
+    assert queue.get(job.id, 1).result == "on time"
+
+
+def test_failures_retry_with_backoff_until_attempts_run_out(monkeypatch):
+    monkeypatch.setattr(settings, "JOBS_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(settings, "JOBS_RETRY_DELAY", 0)
+    queue = fresh_queue()
+    job = queue.enqueue(1, {"query": "q"})
+
+    queue.claim("w")
+    queue.fail(job.id, "w", "transient", retry=True)
+    assert queue.get(job.id, 1).status == QUEUED
+    queue.claim("w")
+    queue.fail(job.id, "w", "transient", retry=True)
+    failed = queue.get(job.id, 1)
+    assert (failed.status, failed.error) == (FAILED, "transient")
+
+
+def test_job_api_enqueues_runs_and_saves_the_answer(client, auth, make_subject):
+    subject_id = make_subject(auth)
+    response = client.post(
+        "/chatbot/jobs", json={"query": "explain osmosis", "subject_id": subject_id, "title": "Osmosis", "priority": 9}, headers=auth
+    )
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+    assert client.get(f"/chatbot/jobs/{job_id}", headers=auth).json()["status"] == QUEUED
+
+    # JOBS_WORKERS=0 in the tests: run the job here, the way a worker would; top priority, so it
+    # is claimed ahead of anything other tests left queued
+    job = job_queue.claim("test-worker")
+    assert job.id == job_id and job.status == RUNNING
+    asyncio.run(JobWorkers(job_queue, 0, 0).process(job, "test-worker"))
+
+    done = client.get(f"/chatbot/jobs/{job_id}", headers=auth).json()
+    assert done["status"] == DONE and done["result"]
+    note = client.get(f"/notes/get_note/{done['note_id']}", headers=auth).json()
+    assert (note["title"], note["subject_id"]) == ("Osmosis", subject_id)
+    assert client.delete(f"/chatbot/jobs/{job_id}", headers=auth).status_code == 409
+
+
+def test_a_job_cancelled_while_running_saves_no_note(client, auth, make_subject, monkeypatch):
+    subject_id = make_subject(auth)
+    job_id = client.post("/chatbot/jobs", json={"query": "q", "subject_id": subject_id, "priority": 9}, headers=auth).json()["id"]
+    job = job_queue.claim("test-worker")
+    assert job.id == job_id
+
+    async def cancelled_meanwhile(query, user_name, context, client):
+        job_queue.cancel(job_id, job.user_id)
+        return "answer"
+
+    saved = []
+    monkeypatch.setattr(controller, "generate_notes", cancelled_meanwhile)
+    monkeypatch.setattr(controller, "save_note", lambda *args: saved.append(args))
+    asyncio.run(JobWorkers(job_queue, 0, 0).process(job, "test-worker"))
+
+    assert saved == []
+    cancelled = client.get(f"/chatbot/jobs/{job_id}", headers=auth).json()
+    assert (cancelled["status"], cancelled["note_id"]) == (CANCELLED, None)
+
+
+def test_jobs_are_private_and_cancellable(client, auth, register):
+    job_id = client.post("/chatbot/jobs", json={"query": "q"}, headers=auth).json()["id"]
+    assert client.get(f"/chatbot/jobs/{job_id}", headers=register()).status_code == 404
+    cancelled = client.delete(f"/chatbot/jobs/{job_id}", headers=auth)
+    assert cancelled.status_code == 200 and cancelled.json()["status"] == "cancelled"
+    assert [item["id"] for item in client.get("/chatbot/jobs", headers=auth).json()["items"]] == [job_id]
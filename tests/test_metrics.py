@@ -0,0 +1,43 @@
+import re
+
+from src.metrics.registry import Registry
+
+
+def sample(text: str, name: str, **labels) -> float:
+    # value of one series in the exposition text, 0 when it has not been written yet
+    for line in text.splitlines():
+        match = re.fullmatch(rf"{re.escape(name)}(?:\{{(.*)\}})? (\S+)", line)
+        if match and dict(re.findall(r'(\w+)="([^"]*)"', match.group(1) or "")) == labels:
+            return float(match.group(2))
+    return 0.0
+
+
+def test_registry_renders_counters_and_histograms():
+    registry = Registry()
+    requests = registry.counter("requests_total", "Requests")
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    requests.inc(route='/a"b')
+    requests.inc(2, route='/a"b')
+    latency.observe(0.5)
+    latency.observe(5)
+
+    text = registry.render()
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{route="/a\\"b"} 3.0' in text
+    assert 'latency_seconds_bucket{le="0.1"} 0' in text
+    assert 'latency_seconds_bucket{le="1.0"} 1' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 2' in text
+    assert "latency_seconds_sum 5.5" in text
+    assert "latency_seconds_count 2" in text
+
+
+def test_requests_are_counted_by_route_template(client, auth, make_subject, make_note):
+    note = make_note(auth, make_subject(auth))
+    labels = {"method": "GET", "route": "/notes/get_note/{id}", "status": "200"}
+    before = sample(client.get("/metrics").text, "http_requests_total", **labels)
+
+    assert client.get(f"/notes/get_note/{note['id']}", headers=auth).status_code == 200
+    text = client.get("/metrics").text
+    assert sample(text, "http_requests_total", **labels) == before + 1
+    assert sample(text, "db_queries_per_request_count", route="/notes/get_note/{id}") >= 1
+    assert sample(text, "cache_hits_total", cache="auth") >= 1
@@ -0,0 +1,126 @@
+from sqlalchemy import text
+
+from src.notes import content
+from src.notes.models import NoteContentModel, NoteRevisionModel, NotesModel
+from src.utils.compression import digest
+from src.utils.db import SessionLocal
+from tests.conftest import unique
+
+LONG = "Mitochondria make ATP by oxidative phosphorylation. " * 40
+
+
+def stored(body: str):
+    with SessionLocal() as db:
+        return db.get(NoteContentModel, digest(body))
+
+
+def hash_of(note_id: int):
+    with SessionLocal() as db:
+        return db.get(NotesModel, note_id).content_hash
+
+
+def test_bodies_round_trip_through_the_content_tier(client, auth, make_subject, make_note):
+    subject_id = make_subject(auth)
+    short = unique("short body")
+    big = make_note(auth, subject_id, content=LONG)
+    small = make_note(auth, subject_id, content=short)
+
+    assert stored(LONG).codec != "raw"
+    assert len(stored(LONG).data) < len(LONG)
+    assert stored(short).codec == "raw"
+    assert client.get(f"/notes/get_note/{big['id']}", headers=auth).json()["content"] == LONG
+    assert client.get(f"/notes/get_note/{small['id']}", headers=auth).json()["content"] == short
+
+
+def test_identical_bodies_are_stored_once(auth, register, make_subject, make_note):
+    body = unique("the same answer") + LONG
+    first = make_note(auth, make_subject(auth), content=body)
+    other = register()
+    second = make_note(other, make_subject(other), content=body)
+
+    assert hash_of(first["id"]) == hash_of(second["id"]) == digest(body)
+
+
+def test_edits_and_deletes_release_the_bodies_they_leave_unused(client, auth, make_subject, make_note):
+    subject_id = make_subject(auth)
+    shared = unique("shared")
+    keeper = make_note(auth, subject_id, content=shared)
+    note = make_note(auth, subject_id, content=shared)
+
+    # still used by keeper
+    put = {"title": "note", "content": unique("put"), "subject_id": subject_id}
+    assert client.put(f"/notes/update/{note['id']}", json=put, headers=auth).status_code == 201
+    assert stored(shared) is not None
+
+    patch = {"base_revision": 2, "ops": [{"insert": "patched "}]}
+    assert client.patch(f"/notes/patch/{note['id']}", json=patch, headers=auth).status_code == 200
+    # the revision 2 snapshot still points at it
+    assert stored(put["content"]) is not None
+
+    assert client.delete(f"/notes/delete/{note['id']}", headers=auth).status_code == 204
+    assert stored("patched " + put["content"]) is None
+    assert stored(put["content"]) is None
+
+    response = client.post("/notes/bulk_delete", json={"note_ids": [keeper["id"]]}, headers=auth)
+    assert response.json() == {"deleted": 1}
+    assert stored(shared) is None
+
+
+def test_snapshots_share_the_note_body(client, auth, make_subject, make_note):
+    body = unique("snapshot") + LONG
+    note = make_note(auth, make_subject(auth), content=body)
+    with SessionLocal() as db:
+        row = db.query(NoteRevisionModel).filter(NoteRevisionModel.note_id == note["id"]).one()
+        assert (row.content_hash, row.data) == (digest(body), "")
+    assert client.get(f"/notes/revisions/{note['id']}/1", headers=auth).json()["content"] == body
+    assert client.get(f"/notes/revisions/{note['id']}", headers=auth).json()[0]["size"] == len(body)
+
+
+def test_restore_and_migrate_move_snapshots_with_their_notes(client, auth, make_subject, make_note):
+    body = unique("moved") + LONG
+    note = make_note(auth, make_subject(auth), content=body)
+
+    def placed():
+        with SessionLocal() as db:
+            row = db.query(NoteRevisionModel).filter(NoteRevisionModel.note_id == note["id"]).one()
+            return row.content_hash, row.data
+
+    try:
+        assert content.move_bodies(False, batch_size=100) >= 1
+        assert placed() == (None, body)
+        assert content.vacuum() >= 1
+        assert stored(body) is None
+        assert client.get(f"/notes/revisions/{note['id']}/1", headers=auth).json()["content"] == body
+    finally:
+        content.move_bodies(True, batch_size=100)
+    assert placed() == (digest(body), "")
+    assert content.stats()["plain_snapshots"] == 0
+
+
+def test_vacuum_drops_only_unreferenced_bodies(auth, make_subject, make_note):
+    body = unique("kept")
+    make_note(auth, make_subject(auth), content=body)
+    orphan = unique("orphan")
+    with SessionLocal() as db:
+        db.add(NoteContentModel(hash=digest(orphan), codec="raw", data=orphan.encode(), size=len(orphan)))
+        db.commit()
+
+    assert content.vacuum(batch_size=1) >= 1
+    assert stored(orphan) is None
+    assert stored(body) is not None
+
+
+def test_search_index_reads_the_bodies_it_does_not_store(client, auth, make_subject, make_note):
+    subject_id = make_subject(auth)
+    word = unique("chloroplast").replace("-", "")
+    note = make_note(auth, subject_id, content=f"{word} {LONG}")
+    put = {"title": "note", "content": f"edited {word}", "subject_id": subject_id}
+    client.put(f"/notes/update/{note['id']}", json=put, headers=auth)
+
+    hits = client.get("/notes/search", params={"q": word}, headers=auth).json()
+    assert [hit["id"] for hit in hits] == [note["id"]]
+    with SessionLocal() as db:
+        sql = db.execute(text("SELECT sql FROM sqlite_master WHERE name = 'notes_fts'")).scalar()
+        assert "content='notes_fts_source'" in sql.replace('"', "'")
+        # raises if the index and the bodies it was built from disagree
+        db.execute(text("INSERT INTO notes_fts(notes_fts, rank) VALUES ('integrity-check', 1)"))
@@ -0,0 +1,92 @@
+import pytest
+
+from src.notes.revisions import DELTA, SNAPSHOT, apply_delta
+from src.utils.constents import NOTE_SNAPSHOT_EVERY
+
+
+def test_apply_delta():
+    assert apply_delta("hello world", [{"retain": 6}, {"delete": 5}, {"insert": "there"}]) == "hello there"
+    assert apply_delta("tail kept", [{"insert": ">> "}]) == ">> tail kept"
+    # offsets count characters, not bytes
+    assert apply_delta("naïve café", [{"retain": 2}, {"delete": 1}, {"insert": "i"}]) == "naive café"
+    with pytest.raises(ValueError):
+        apply_delta("short", [{"retain": 10}])
+    with pytest.raises(ValueError):
+        apply_delta("short", [{"retain": 1, "insert": "x"}])
+
+
+def patch(client, headers, note_id, base, ops, **extra):
+    return client.patch(f"/notes/patch/{note_id}", json={"base_revision": base, "ops": ops, **extra}, headers=headers)
+
+
+def test_patches_are_stored_as_deltas_and_replay_to_every_revision(client, auth, make_subject, make_note):
+    body = "line\n" * 200
+    note = make_note(auth, make_subject(auth), content=body)
+    versions = {1: body}
+    for revision in range(2, NOTE_SNAPSHOT_EVERY + 3):
+        response = patch(client, auth, note["id"], revision - 1, [{"insert": f"edit {revision}\n"}])
+        assert response.status_code == 200
+        assert response.json()["revision"] == revision
+        body = f"edit {revision}\n" + body
+        versions[revision] = body
+
+    listed = client.get(f"/notes/revisions/{note['id']}", params={"limit": 50}, headers=auth).json()
+    kinds = {item["revision"]: item["kind"] for item in listed}
+    assert kinds[1] == SNAPSHOT and kinds[2] == DELTA
+    assert kinds[NOTE_SNAPSHOT_EVERY] == SNAPSHOT
+    assert max(item["size"] for item in listed if item["kind"] == DELTA) < 50
+
+    for revision, content in versions.items():
+        stored = client.get(f"/notes/revisions/{note['id']}/{revision}", headers=auth).json()
+        assert stored["content"] == content
+    assert client.get(f"/notes/get_note/{note['id']}", headers=auth).json()["content"] == body
+
+
+def test_stale_or_invalid_patches_are_rejected(client, auth, make_subject, make_note):
+    note = make_note(auth, make_subject(auth), content="original")
+    assert patch(client, auth, note["id"], 1, [{"retain": 8}, {"insert": "!"}], title="renamed").status_code == 200
+    # a client still holding revision 1 has to reload first
+    assert patch(client, auth, note["id"], 1, [{"insert": "x"}]).status_code == 409
+    assert patch(client, auth, note["id"], 2, [{"retain": 100}]).status_code == 400
+    assert client.get(f"/notes/revisions/{note['id']}/9", headers=auth).status_code == 404
+
+    latest = client.get(f"/notes/revisions/{note['id']}/2", headers=auth).json()
+    assert (latest["title"], latest["content"]) == ("renamed", "original!")
+
+
+def test_a_full_update_is_a_new_revision(client, auth, make_subject, make_note):
+    subject_id = make_subject(auth)
+    note = make_note(auth, subject_id, content="v1")
+    body = {"title": "note", "content": "v2", "subject_id": subject_id}
+    assert client.put(f"/notes/update/{note['id']}", json=body, headers=auth).json()["revision"] == 2
+    assert patch(client, auth, note["id"], 2, [{"insert": "v3 "}]).json()["revision"] == 3
+    assert client.get(f"/notes/revisions/{note['id']}/1", headers=auth).json()["content"] == "v1"
+
+
+def test_history_keeps_only_the_newest_snapshots(client, auth, make_subject, make_note, monkeypatch):
+    from src.notes import revisions
+    from src.notes.models import NoteContentModel
+    from src.utils.compression import digest
+    from src.utils.db import SessionLocal
+    from src.utils.settings import settings
+
+    monkeypatch.setattr(revisions, "NOTE_SNAPSHOT_EVERY", 3)
+    monkeypatch.setattr(settings, "NOTE_KEEP_SNAPSHOTS", 2)
+    body = "line\n" * 100
+    note = make_note(auth, make_subject(auth), content=body)
+    versions = {1: body}
+    for revision in range(2, 15):
+        body = versions[revision] = f"edit {revision}\n" + body
+        assert patch(client, auth, note["id"], revision - 1, [{"insert": f"edit {revision}\n"}]).status_code == 200
+
+    listed = client.get(f"/notes/revisions/{note['id']}", params={"limit": 50}, headers=auth).json()
+    # snapshots at 12 and 9 are kept, with the deltas after them
+    assert [item["revision"] for item in listed] == list(range(14, 8, -1))
+    assert listed[-1]["kind"] == SNAPSHOT
+    assert client.get(f"/notes/revisions/{note['id']}/8", headers=auth).status_code == 404
+    assert client.get(f"/notes/revisions/{note['id']}/14", headers=auth).json()["content"] == body
+    assert client.get(f"/notes/revisions/{note['id']}/10", headers=auth).json()["content"] == versions[10]
+    # the pruned snapshots' bodies went with them
+    with SessionLocal() as db:
+        assert db.get(NoteContentModel, digest(versions[6])) is None
+        assert db.get(NoteContentModel, digest(versions[9])) is not None
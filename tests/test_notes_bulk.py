@@ -0,0 +1,139 @@
+import io
+import json
+import zipfile
+
+from tests.conftest import unique
+
+
+def ndjson(*records) -> bytes:
+    return b"".join(json.dumps(record).encode() + b"\n" for record in records)
+
+
+def export(client, headers, **params):
+    response = client.get("/notes/export", params=params, headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_ndjson_import_reports_bad_lines_and_foreign_subjects(client, auth, register, make_subject):
+    subject_id = make_subject(auth)
+    foreign_subject = make_subject(register())
+    body = ndjson(
+        {"title": "one", "content": "first", "subject_id": subject_id},
+        {"title": "two", "content": "second", "subject_id": subject_id},
+        {"title": "stolen", "content": "x", "subject_id": foreign_subject},
+    ) + b"not json\n\n" + json.dumps({"title": "last", "content": "no newline", "subject_id": subject_id}).encode()
+
+    response = client.post(
+        "/notes/bulk_import", content=body, headers={**auth, "Content-Type": "application/x-ndjson"}
+    )
+    assert response.status_code == 200
+    report = response.json()
+    assert report["imported"] == 3
+    assert report["failed"] == 2
+    assert {error["item"] for error in report["errors"]} == {"3", "4"}
+
+    exported = export(client, auth, subject_id=subject_id)
+    assert [(note["title"], note["content"]) for note in exported] == [
+        ("one", "first"),
+        ("two", "second"),
+        ("last", "no newline"),
+    ]
+
+
+def test_imported_notes_are_searchable(client, auth, make_subject):
+    subject_id = make_subject(auth)
+    word = unique("bulkword").replace("-", "")
+    body = ndjson({"title": "indexed", "content": f"contains {word}", "subject_id": subject_id})
+    client.post("/notes/bulk_import", content=body, headers={**auth, "Content-Type": "application/x-ndjson"})
+
+    hits = client.get("/notes/search", params={"q": word}, headers=auth).json()
+    assert [hit["title"] for hit in hits] == ["indexed"]
+
+
+def test_imported_notes_start_at_revision_one(client, auth, make_subject):
+    subject_id = make_subject(auth)
+    content = unique("imported") + " body " * 100
+    body = ndjson({"title": "history", "content": content, "subject_id": subject_id})
+    client.post("/notes/bulk_import", content=body, headers={**auth, "Content-Type": "application/x-ndjson"})
+    (note,) = export(client, auth, subject_id=subject_id)
+
+    assert client.get(f"/notes/get_note/{note['id']}", headers=auth).json()["revision"] == 1
+    assert client.get(f"/notes/revisions/{note['id']}/1", headers=auth).json()["content"] == content
+    patch = {"base_revision": 1, "ops": [{"insert": "edited "}]}
+    assert client.patch(f"/notes/patch/{note['id']}", json=patch, headers=auth).json()["revision"] == 2
+    assert client.get(f"/notes/revisions/{note['id']}/1", headers=auth).json()["content"] == content
+
+
+def test_zip_import_places_notes_by_folder(client, auth, make_subject):
+    title = unique("biology")
+    subject_id = make_subject(auth, title)
+    fallback_id = make_subject(auth)
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr(f"{title}/cells.md", "# Cells")
+        zf.writestr("loose.md", "top level")
+        zf.writestr(f"{title}/image.png", b"\x89PNG")
+    response = client.post(
+        "/notes/bulk_import",
+        params={"subject_id": fallback_id},
+        content=archive.getvalue(),
+        headers={**auth, "Content-Type": "application/zip"},
+    )
+    assert response.status_code == 200
+    assert response.json()["imported"] == 2
+
+    assert [note["title"] for note in export(client, auth, subject_id=subject_id)] == ["cells"]
+    assert [note["title"] for note in export(client, auth, subject_id=fallback_id)] == ["loose"]
+
+
+def test_zip_import_rejects_a_broken_archive(client, auth):
+    response = client.post(
+        "/notes/bulk_import", content=b"not a zip", headers={**auth, "Content-Type": "application/zip"}
+    )
+    assert response.status_code == 400
+
+
+def test_export_only_streams_own_notes(client, auth, register, make_subject, make_note):
+    other = register()
+    make_note(other, make_subject(other), title="private")
+    subject_id = make_subject(auth)
+    make_note(auth, subject_id, title="mine", content="hello")
+
+    exported = export(client, auth)
+    assert [note["title"] for note in exported] == ["mine"]
+    assert set(exported[0]) == {"id", "title", "content", "subject_id", "create_at"}
+
+
+def test_bulk_move_counts_only_notes_that_moved(client, auth, register, make_subject, make_note):
+    source = make_subject(auth)
+    target = make_subject(auth)
+    moved = [make_note(auth, source)["id"] for _ in range(3)]
+    already = make_note(auth, target)["id"]
+    other = register()
+    foreign = make_note(other, make_subject(other))["id"]
+
+    body = {"subject_id": target, "note_ids": moved[:2] + [already, foreign]}
+    assert client.post("/notes/bulk_move", json=body, headers=auth).json() == {"moved": 2}
+    body = {"subject_id": target, "from_subject_id": source}
+    assert client.post("/notes/bulk_move", json=body, headers=auth).json() == {"moved": 1}
+    assert len(export(client, auth, subject_id=target)) == 4
+    assert client.post("/notes/bulk_move", json={"subject_id": target}, headers=auth).status_code == 400
+
+
+def test_bulk_delete_counts_and_scopes_to_the_owner(client, auth, register, make_subject, make_note):
+    subject_id = make_subject(auth)
+    keep = make_subject(auth)
+    notes = [make_note(auth, subject_id)["id"] for _ in range(3)]
+    make_note(auth, keep, title="kept")
+    other = register()
+    foreign = make_note(other, make_subject(other))["id"]
+
+    response = client.post("/notes/bulk_delete", json={"note_ids": [notes[0], foreign]}, headers=auth)
+    assert response.json() == {"deleted": 1}
+    assert client.post("/notes/bulk_delete", json={"subject_id": subject_id}, headers=auth).json() == {"deleted": 2}
+    assert export(client, auth, subject_id=subject_id) == []
+    assert [note["title"] for note in export(client, auth)] == ["kept"]
+    assert client.get(f"/notes/get_note/{foreign}", headers=other).status_code == 200
+    assert client.post("/notes/bulk_delete", json={}, headers=auth).status_code == 400
@@ -0,0 +1,45 @@
+def walk(client, headers, **params):
+    pages, cursor = [], None
+    while True:
+        query = {**params, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/notes/list", params=query, headers=headers).json()
+        pages.append(page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+def test_pages_cover_every_note_once_newest_first(client, auth, make_subject, make_note):
+    subject_id = make_subject(auth)
+    ids = [make_note(auth, subject_id, title=f"n{index}")["id"] for index in range(7)]
+
+    pages = walk(client, auth, limit=3)
+
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert [item["id"] for page in pages for item in page] == ids[::-1]
+
+
+def test_filters_by_subject_and_owner(client, auth, register, make_subject, make_note):
+    first, second = make_subject(auth), make_subject(auth)
+    make_note(auth, first)
+    kept = make_note(auth, second)["id"]
+    other = register()
+    make_note(other, make_subject(other))
+
+    assert [item["id"] for item in client.get("/notes/list", params={"subject_id": second}, headers=auth).json()["items"]] == [kept]
+    assert len(client.get("/notes/list", headers=auth).json()["items"]) == 2
+
+
+def test_summary_view_returns_preview_and_full_view_the_body(client, auth, make_subject, make_note):
+    content = "x" * 500
+    make_note(auth, make_subject(auth), content=content)
+
+    summary = client.get("/notes/list", headers=auth).json()["items"][0]
+    full = client.get("/notes/list", params={"view": "full"}, headers=auth).json()["items"][0]
+
+    assert "content" not in summary and content.startswith(summary["preview"])
+    assert full["content"] == content
+
+
+def test_invalid_cursor_is_rejected(client, auth):
+    assert client.get("/notes/list", params={"cursor": "not-a-cursor"}, headers=auth).status_code == 400
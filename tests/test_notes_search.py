@@ -0,0 +1,75 @@
+import pytest
+
+from src.notes.models import content_tier_enabled
+from src.notes.search import get_backend
+from src.utils.settings import settings
+
+
+def search(client, headers, q, **params):
+    response = client.get("/notes/search", params={"q": q, **params}, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_title_matches_rank_above_body_matches(client, auth, make_subject, make_note):
+    subject_id = make_subject(auth)
+    body_hit = make_note(auth, subject_id, title="Cells", content="Photosynthesis happens in chloroplasts.")["id"]
+    title_hit = make_note(auth, subject_id, title="Photosynthesis", content="Light and dark reactions.")["id"]
+    make_note(auth, subject_id, title="Unrelated", content="Newton's laws of motion.")
+
+    results = search(client, auth, "photosynthesis")
+
+    assert [result["id"] for result in results] == [title_hit, body_hit]
+    assert results[0]["score"] > results[1]["score"]
+    assert "<mark>" in results[0]["title"]
+
+
+def test_prefix_terms_and_snippets(client, auth, make_subject, make_note):
+    note_id = make_note(auth, make_subject(auth), title="Chemistry", content="Covalent bonds share electrons.")["id"]
+
+    (result,) = search(client, auth, "coval electr")
+
+    assert result["id"] == note_id
+    assert "<mark>Covalent</mark>" in result["snippet"]
+
+
+def test_results_are_scoped_to_the_user_and_subject(client, auth, register, make_subject, make_note):
+    first, second = make_subject(auth), make_subject(auth)
+    make_note(auth, first, content="mitochondria powerhouse")
+    kept = make_note(auth, second, content="mitochondria again")["id"]
+    other = register()
+    make_note(other, make_subject(other), content="mitochondria elsewhere")
+
+    assert len(search(client, auth, "mitochondria")) == 2
+    assert [result["id"] for result in search(client, auth, "mitochondria", subject_id=second)] == [kept]
+
+
+def test_terms_do_not_match_the_owner_column(client, auth, make_subject, make_note):
+    make_note(auth, make_subject(auth), content="ribosome")
+    user_id = client.get("/users/is_auth", headers=auth).json()["id"]
+    assert search(client, auth, f"u{user_id}") == []
+
+
+def test_index_follows_updates_and_deletes(client, auth, make_subject, make_note):
+    subject_id = make_subject(auth)
+    note_id = make_note(auth, subject_id, title="Draft", content="osmosis")["id"]
+
+    body = {"title": "Draft", "content": "diffusion", "subject_id": subject_id}
+    client.put(f"/notes/update/{note_id}", json=body, headers=auth)
+    assert search(client, auth, "osmosis") == []
+    assert [result["id"] for result in search(client, auth, "diffusion")] == [note_id]
+
+    client.delete(f"/notes/delete/{note_id}", headers=auth)
+    assert search(client, auth, "diffusion") == []
+
+
+def test_query_without_terms_returns_nothing(client, auth):
+    assert search(client, auth, "!!!") == []
+
+
+def test_postgres_keeps_bodies_in_the_column_it_searches(monkeypatch):
+    monkeypatch.setattr(settings, "NOTE_CONTENT_TIER", "on")
+    assert not content_tier_enabled("postgresql")
+    assert content_tier_enabled("sqlite")
+    with pytest.raises(RuntimeError, match="NOTE_CONTENT_TIER=on"):
+        get_backend("postgresql")
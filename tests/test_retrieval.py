@@ -0,0 +1,63 @@
+from src.chatbot.retrieval import UserIndex, build_context, chunk_text, retrieval_index
+from src.utils.tokens import CHARS_PER_TOKEN
+
+
+def user_id(client, headers) -> int:
+    return client.get("/users/is_auth", headers=headers).json()["id"]
+
+
+def test_chunks_respect_the_token_budget():
+    text = "\n\n".join(["Short paragraph."] * 3 + ["A sentence that runs on. " * 40] + ["x" * 2000])
+    chunks = chunk_text(text, 50)
+    # short paragraphs are packed together, the long one is split at sentences
+    assert chunks[0].startswith("Short paragraph.\n\nShort paragraph.\n\nShort paragraph.\n\nA sentence")
+    assert len(chunks) > 3
+    assert all(len(chunk) <= 50 * CHARS_PER_TOKEN for chunk in chunks)
+    assert chunk_text("", 50) == []
+
+
+def test_query_ranks_matching_chunks_first():
+    index = UserIndex()
+    index.add_note(1, "Photosynthesis", "Chlorophyll absorbs light in the chloroplast.")
+    index.add_note(2, "Mitosis", "Chromosomes line up during metaphase.")
+    index.add_note(3, "Respiration", "Mitochondria produce ATP.")
+    assert [hit[1] for hit in index.query("what happens in metaphase to chromosomes", 2)][0] == 2
+
+    index.remove_note(2)
+    assert 2 not in [hit[1] for hit in index.query("metaphase chromosomes", 2)]
+    index.add_note(1, "Photosynthesis", "Metaphase chromosomes, filed under the wrong note.")
+    assert [hit[1] for hit in index.query("metaphase chromosomes", 1)] == [1]
+
+
+
+
+def test_rewriting_a_note_replaces_its_postings():
+    index = UserIndex()
+    index.add_note(2, "Respiration", "Mitochondria produce ATP.")
+    index.add_note(1, "Draft", "Version 0 of the draft.")
+    sizes = (len(index.postings), sum(len(posting) for posting in index.postings.values()))
+    for version in range(1, 50):
+        index.add_note(1, "Draft", f"Version {version} of the draft.")
+    index.add_note(1, "Draft", "Version 0 of the draft.")
+    assert (len(index.postings), sum(len(posting) for posting in index.postings.values())) == sizes
+
+    index.remove_note(1)
+    assert {chunk_id for posting in index.postings.values() for chunk_id in posting} == set(index.chunks)
+def test_context_follows_the_users_own_writes(client, auth, register, make_subject, make_note):
+    other = register()
+    make_note(other, make_subject(other), title="Other", content="The krebs cycle belongs to someone else.")
+    subject_id = make_subject(auth)
+    note = make_note(auth, subject_id, title="Krebs", content="The krebs cycle runs in the mitochondrial matrix.")
+    owner = user_id(client, auth)
+
+    context = build_context(owner, "where does the krebs cycle run")
+    assert context.startswith("### Krebs\n")
+    assert "someone else" not in context
+
+    # the loaded index is updated in place by the write paths
+    body = {"title": "Krebs", "content": "Glycolysis happens in the cytosol.", "subject_id": subject_id}
+    client.put(f"/notes/update/{note['id']}", json=body, headers=auth)
+    assert retrieval_index.loaded(owner) is not None
+    assert "cytosol" in build_context(owner, "where does glycolysis happen")
+    client.delete(f"/notes/delete/{note['id']}", headers=auth)
+    assert build_context(owner, "where does glycolysis happen") == ""
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from src.chatbot import upstream
+from src.chatbot.upstream import SingleFlight, UpstreamLimiter
+from src.utils.settings import settings
+
+
+def test_identical_calls_share_one_upstream_call():
+    flight = SingleFlight()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def together():
+        return await asyncio.gather(*(flight.do("key", fetch) for _ in range(5)))
+
+    assert asyncio.run(together()) == ["answer"] * 5
+    assert calls == 1
+    assert flight.get("key") is None
+
+
+def test_limiter_caps_concurrency_and_sheds_a_full_queue():
+    limiter = UpstreamLimiter(max_concurrency=2, rate=0, burst=1, max_waiting=3, queue_timeout=1)
+    peak = 0
+
+    async def work():
+        nonlocal peak
+        async with limiter.slot():
+            peak = max(peak, limiter.active)
+            await asyncio.sleep(0.02)
+
+    async def flood():
+        return await asyncio.gather(*(work() for _ in range(6)), return_exceptions=True)
+
+    results = asyncio.run(flood())
+    shed = [result for result in results if isinstance(result, HTTPException)]
+    assert peak == 2
+    assert len(shed) == 3
+    assert all(error.status_code == 503 and "Retry-After" in error.headers for error in shed)
+    assert limiter.waiting == 0 and limiter.active == 0
+
+
+def test_limiter_times_out_queued_callers():
+    limiter = UpstreamLimiter(max_concurrency=1, rate=0, burst=1, max_waiting=5, queue_timeout=0.01)
+
+    async def scenario():
+        async with limiter.slot():
+            with pytest.raises(HTTPException) as timed_out:
+                async with limiter.slot():
+                    pass
+        return timed_out.value
+
+    assert asyncio.run(scenario()).status_code == 503
+
+
+def test_transient_errors_are_retried(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_MAX_RETRIES", 2)
+    monkeypatch.setattr(settings, "LLM_RETRY_BASE", 0)
+    attempts = 0
+
+    async def flaky():
+        nonlocal attempts
+        attempts += 1
+        if attempts < 3:
+            raise ConnectionError("reset")
+        return "ok"
+
+    assert asyncio.run(upstream.call(flaky)) == "ok"
+    assert attempts == 3
+
+    async def broken():
+        raise ValueError("not transient")
+
+    with pytest.raises(ValueError):
+        asyncio.run(upstream.call(broken))